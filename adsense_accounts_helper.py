@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 """
 AdSense账户列表获取助手 - 修复版本
-使用googleapiclient.discovery而不是google.adsense_v2
+使用随附的离线发现文档构建服务，而不是google.adsense_v2
 """
 
 import os
 import sys
 import json
-from googleapiclient.discovery import build
 from google.auth import default
 
+from mcp_adsense_ultimate.discovery import build_adsense_service
+
 def get_adsense_accounts(project_id=None):
     """
     获取AdSense账户列表
@@ -47,7 +48,7 @@ def get_adsense_accounts(project_id=None):
             }
         
         # 创建AdSense服务
-        service = build("adsense", "v2", credentials=credentials)
+        service = build_adsense_service(credentials=credentials)
         
         # 获取账户列表
         print("\n📊 获取AdSense账户列表...")
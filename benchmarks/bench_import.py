@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+启动基准测试 - 导入耗时与 initialize 响应时间
+
+每轮在全新的子进程中以 `python -X importtime -m mcp_adsense_ultimate` 启动服务器
+（MCP_ADSENSE_PREWARM=0，不做后台预热），通过stdin发送 initialize 和 tools/list，测量：
+    interpreter   空解释器启动耗时（python -c pass），作为本机基线
+    initialize    从启动进程到收到 initialize 响应
+    tools_list    从启动进程到收到 tools/list 响应
+    import        -X importtime 报告的 mcp_adsense_ultimate 累计导入耗时
+    heavy         握手期间导入的Google客户端库、HTTP库、pyarrow和asyncio模块（应为空）
+
+结果取中位数；initialize 同时给出扣除解释器基线后的值，便于在不同机器间比较。
+--json 输出机器可读的结果；--max-import-ms 或 --check 在导入超出阈值、或握手期间导入了重型依赖时以非零状态退出。
+
+用法:
+    python benchmarks/bench_import.py [--runs 5] [--top 10] [--json] [--max-import-ms 150] [--check]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_PACKAGES = ("google", "googleapiclient", "google_auth_httplib2", "httplib2", "requests", "urllib3",
+                  "pyarrow", "asyncio")
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+INITIALIZE = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}
+TOOLS_LIST = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+
+
+def interpreter_startup() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - start
+
+
+def run_server() -> dict:
+    """启动一次服务器，返回各阶段耗时和 -X importtime 的记录"""
+    env = dict(os.environ, MCP_ADSENSE_PREWARM="0", PYTHONPATH=REPO_ROOT)
+    env.pop("GOOGLE_ADSENSE_ACCOUNT_ID", None)
+    stderr_lines = []
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-m", "mcp_adsense_ultimate"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=REPO_ROOT
+    )
+    # importtime输出量较大，单独的线程读取stderr以免管道写满阻塞子进程
+    drain = threading.Thread(target=lambda: stderr_lines.extend(process.stderr.read().decode().splitlines()))
+    drain.start()
+
+    def round_trip(message: dict) -> float:
+        process.stdin.write((json.dumps(message) + "\n").encode())
+        process.stdin.flush()
+        response = json.loads(process.stdout.readline())
+        if response.get("id") != message["id"] or "result" not in response:
+            raise RuntimeError(f"意外的响应: {response}")
+        return time.perf_counter() - start
+
+    initialize = round_trip(INITIALIZE)
+    tools_list = round_trip(TOOLS_LIST)
+    process.stdin.close()
+    process.wait(timeout=30)
+    drain.join()
+
+    modules = []
+    for line in stderr_lines:
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            modules.append({
+                "name": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": len(match.group(3)) // 2
+            })
+    package = next((m for m in modules if m["name"] == "mcp_adsense_ultimate"), None)
+    heavy = sorted({m["name"] for m in modules if m["name"].split(".")[0] in HEAVY_PACKAGES})
+    return {
+        "initialize": initialize,
+        "tools_list": tools_list,
+        "import": (package["cumulative_us"] / 1e6) if package else None,
+        "modules": modules,
+        "heavy": heavy
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="列出自身导入耗时最长的N个模块")
+    parser.add_argument("--json", action="store_true", help="输出JSON")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="mcp_adsense_ultimate导入耗时上限（毫秒）")
+    parser.add_argument("--check", action="store_true", help="握手期间导入了重型依赖时以非零状态退出")
+    args = parser.parse_args()
+
+    baselines = [interpreter_startup() for _ in range(args.runs)]
+    runs = [run_server() for _ in range(args.runs)]
+
+    def median_ms(values):
+        values = [value for value in values if value is not None]
+        return round(statistics.median(values) * 1000, 2) if values else None
+
+    interpreter = median_ms(baselines)
+    result = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "interpreter_ms": interpreter,
+        "initialize_ms": median_ms(run["initialize"] for run in runs),
+        "tools_list_ms": median_ms(run["tools_list"] for run in runs),
+        "import_ms": median_ms(run["import"] for run in runs),
+        "heavy_modules": sorted({name for run in runs for name in run["heavy"]}),
+    }
+    result["initialize_over_interpreter_ms"] = round(result["initialize_ms"] - interpreter, 2)
+    slowest = {}
+    for run in runs:
+        for module in run["modules"]:
+            slowest.setdefault(module["name"], []).append(module["self_us"])
+    result["slowest_modules"] = [
+        {"name": name, "self_ms": round(statistics.median(samples) / 1000, 2)}
+        for name, samples in sorted(slowest.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+    ]
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"Python {result['python']}，{args.runs} 轮中位数（毫秒）")
+        print(f"  解释器启动          {interpreter:>8.1f}")
+        print(f"  包导入（importtime）{result['import_ms']:>8.1f}")
+        print(f"  initialize响应      {result['initialize_ms']:>8.1f}  （扣除解释器 {result['initialize_over_interpreter_ms']:.1f}）")
+        print(f"  tools/list响应      {result['tools_list_ms']:>8.1f}")
+        print(f"  握手期间的重型依赖  {', '.join(result['heavy_modules']) or '无'}")
+        print("  自身导入耗时最长的模块:")
+        for module in result["slowest_modules"]:
+            print(f"    {module['self_ms']:>8.2f}  {module['name']}")
+
+    failures = []
+    if args.max_import_ms is not None and result["import_ms"] is not None and result["import_ms"] > args.max_import_ms:
+        failures.append(f"导入耗时 {result['import_ms']}ms 超过上限 {args.max_import_ms}ms")
+    if args.check and result["heavy_modules"]:
+        failures.append(f"握手期间导入了重型依赖: {', '.join(result['heavy_modules'])}")
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
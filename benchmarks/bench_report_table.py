@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+报告行转换基准测试 - 对比逐单元格字典转换与列式 ReportTable
+
+使用合成的 reports.generate 响应（3个维度 + 4个指标），分别测量：
+    legacy       原有的逐单元格 {"value", "label"} 字典转换
+    table        构建 ReportTable
+    table+rows   构建 ReportTable 并输出原有的嵌套字典行
+    table+cols   构建 ReportTable 并输出列式结果
+以及各自的峰值内存（tracemalloc）。
+
+用法:
+    python benchmarks/bench_report_table.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_adsense_ultimate.report_table import ReportTable  # noqa: E402
+
+DIMENSIONS = ["DATE", "COUNTRY_CODE", "AD_UNIT_ID"]
+METRICS = ["ESTIMATED_EARNINGS", "PAGE_VIEWS", "CLICKS", "IMPRESSIONS_CTR"]
+HEADERS = (
+    [{"name": name, "type": "DIMENSION"} for name in DIMENSIONS]
+    + [
+        {"name": "ESTIMATED_EARNINGS", "type": "METRIC_CURRENCY", "currencyCode": "USD"},
+        {"name": "PAGE_VIEWS", "type": "METRIC_TALLY"},
+        {"name": "CLICKS", "type": "METRIC_TALLY"},
+        {"name": "IMPRESSIONS_CTR", "type": "METRIC_RATIO"},
+    ]
+)
+
+
+def make_response(n: int) -> dict:
+    rng = random.Random(n)
+    countries = ["US", "GB", "DE", "FR", "JP", "CN", "IN", "BR", "CA", "AU"]
+    rows = []
+    for i in range(n):
+        rows.append({"cells": [
+            {"value": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}"},
+            {"value": countries[i % len(countries)]},
+            {"value": f"ca-pub-1:{i % 200}", "label": f"Ad unit {i % 200}"},
+            {"value": f"{rng.random() * 10:.2f}"},
+            {"value": str(rng.randint(0, 10000))},
+            {"value": str(rng.randint(0, 100))},
+            {"value": f"{rng.random() / 10:.4f}"},
+        ]})
+    return {"headers": HEADERS, "rows": rows}
+
+
+def legacy_rows(reports: dict) -> list:
+    """原 get_reports 中的逐单元格转换"""
+    dimensions, metrics = DIMENSIONS, METRICS
+    rows = []
+    for row in reports.get("rows", []):
+        row_data = {}
+        for i, cell in enumerate(row.get("cells", [])):
+            dim_index = i if i < len(dimensions) else None
+            metric_index = i - len(dimensions) if i >= len(dimensions) else None
+            if dim_index is not None:
+                row_data[dimensions[dim_index]] = {"value": cell.get("value"), "label": cell.get("label")}
+            elif metric_index is not None:
+                row_data[metrics[metric_index]] = {"value": cell.get("value"), "label": cell.get("label")}
+        rows.append(row_data)
+    return rows
+
+
+def measure(func, reports):
+    # 计时与内存分开测量，tracemalloc会显著拖慢执行
+    start = time.perf_counter()
+    result = func(reports)
+    elapsed = time.perf_counter() - start
+    del result
+
+    tracemalloc.start()
+    result = func(reports)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    cases = {
+        "legacy": legacy_rows,
+        "table": ReportTable.from_response,
+        "table+rows": lambda r: ReportTable.from_response(r).to_rows(),
+        "table+cols": lambda r: ReportTable.from_response(r).to_columnar(),
+    }
+
+    print(f"{'rows':>9}  {'case':<12}{'time (s)':>10}{'peak MB':>10}")
+    for n in args.sizes:
+        reports = make_response(n)
+        for name, func in cases.items():
+            elapsed, peak = measure(func, reports)
+            print(f"{n:>9}  {name:<12}{elapsed:>10.3f}{peak / 1024 / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
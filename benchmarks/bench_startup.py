@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+启动基准测试 - 对比首次 tools/call 之前的服务构建耗时
+
+每种模式都在全新的子进程中运行：导入服务器模块、创建服务器实例、处理 initialize，
+然后构建首次 tools/call 所需的AdSense服务对象（不包含实际的API往返）。
+
+    legacy         googleapiclient.discovery.build('adsense', 'v2')
+    bundled-cold   随附发现文档 + build_from_document，marshal缓存为空
+    bundled-warm   随附发现文档 + build_from_document，marshal缓存已存在
+
+用法:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = r"""
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {repo_root!r})
+from mcp_adsense_ultimate.server import MCPAdSenseEnhancedUltimateServer
+t_import = time.perf_counter()
+server = MCPAdSenseEnhancedUltimateServer()
+server.handle_initialize({{}})
+t_init = time.perf_counter()
+if {mode!r} == "legacy":
+    from googleapiclient.discovery import build
+    server.service_pool._service_builder = lambda c: build("adsense", "v2", credentials=c)
+server._get_adsense_service()
+t_service = time.perf_counter()
+print(json.dumps({{
+    "import": t_import - t0,
+    "initialize": t_init - t_import,
+    "service": t_service - t_init,
+    "total": t_service - t0,
+}}))
+"""
+
+
+def run_child(mode: str, env: dict) -> dict:
+    script = CHILD_SCRIPT.format(repo_root=REPO_ROOT, mode=mode)
+    out = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        creds_path = os.path.join(tmp, "creds.json")
+        with open(creds_path, "w") as f:
+            json.dump({
+                "type": "authorized_user",
+                "client_id": "bench",
+                "client_secret": "bench",
+                "refresh_token": "bench"
+            }, f)
+
+        env = dict(os.environ)
+        env["GOOGLE_APPLICATION_CREDENTIALS"] = creds_path
+        env["MCP_ADSENSE_CACHE_DIR"] = os.path.join(tmp, "cache")
+
+        results = {"legacy": [], "bundled-cold": [], "bundled-warm": []}
+        for _ in range(args.runs):
+            results["legacy"].append(run_child("legacy", env))
+            cold_env = dict(env, MCP_ADSENSE_CACHE_DIR=tempfile.mkdtemp(dir=tmp))
+            results["bundled-cold"].append(run_child("bundled", cold_env))
+            results["bundled-warm"].append(run_child("bundled", env))
+
+    print(f"{'mode':<14}{'import':>10}{'initialize':>12}{'service':>10}{'total':>10}   (median ms, {args.runs} runs)")
+    for mode, samples in results.items():
+        row = {key: statistics.median(s[key] for s in samples) * 1000 for key in samples[0]}
+        print(f"{mode:<14}{row['import']:>10.1f}{row['initialize']:>12.2f}{row['service']:>10.1f}{row['total']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
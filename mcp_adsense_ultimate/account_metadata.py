@@ -0,0 +1,140 @@
+"""
+账户元数据缓存 - 按账户缓存广告客户端列表、默认广告客户端、时区和币种
+
+元数据分为三部分分别加载和缓存：
+    ad_clients  adclients.list 的结果及默认的 ca-pub- 广告客户端
+    account     accounts.get 中的显示名称和时区
+    currency    报告中使用的币种（accounts.get不包含币种，需要一次报告请求），
+                只在明确需要时加载，获取报告时也会顺带记录响应headers中的币种
+每部分按账户独立过期（TTL），同一账户的并发请求只触发一次加载。
+加载失败也会缓存一小段时间（failure_ttl），期间直接抛出同一错误，不反复请求API。
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+SECTIONS = ("ad_clients", "account", "currency")
+# 预加载的部分（币种需要一次报告请求，不预加载）
+WARM_SECTIONS = ("ad_clients", "account")
+
+
+class AccountMetadataCache:
+    """按账户缓存的元数据"""
+
+    def __init__(self, loaders: Dict[str, Callable[[str], Dict[str, Any]]], ttl: Optional[int] = None,
+                 failure_ttl: Optional[int] = None):
+        """
+        Args:
+            loaders: 各部分的加载函数，section -> loader(账户ID)，返回该部分的字段
+            ttl: 缓存秒数，默认读取MCP_ADSENSE_METADATA_TTL（默认3600）
+            failure_ttl: 加载失败的缓存秒数，默认读取MCP_ADSENSE_METADATA_FAILURE_TTL（默认60）
+        """
+        self.loaders = loaders
+        self.ttl = ttl if ttl is not None else int(os.getenv("MCP_ADSENSE_METADATA_TTL", "3600"))
+        self.failure_ttl = failure_ttl if failure_ttl is not None else int(
+            os.getenv("MCP_ADSENSE_METADATA_FAILURE_TTL", "60"))
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._failures: Dict[Tuple[str, str], Tuple[float, Exception]] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "load_failures": 0, "failure_hits": 0,
+                       "invalidations": 0}
+
+    def get(self, account: str, section: str, refresh: bool = False) -> Dict[str, Any]:
+        """返回账户某一部分的元数据，未缓存、已过期或refresh时重新加载"""
+        key = (account, section)
+        if not refresh:
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # 等待期间其他线程可能已完成加载
+            if not refresh:
+                cached = self._lookup(key, count=False)
+                if cached is not None:
+                    return cached
+            with self._lock:
+                self._stats["misses"] += 1
+            try:
+                data = self.loaders[section](account)
+            except Exception as e:
+                with self._lock:
+                    self._stats["load_failures"] += 1
+                    self._failures[key] = (time.time(), e)
+                raise
+            with self._lock:
+                self._stats["loads"] += 1
+                self._entries[key] = (time.time(), data)
+                self._failures.pop(key, None)
+            return dict(data)
+
+    def _lookup(self, key: Tuple[str, str], count: bool = True) -> Optional[Dict[str, Any]]:
+        """返回未过期的缓存；没有可用缓存且最近加载失败过时抛出该错误"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[0] >= self.ttl:
+                failure = self._failures.get(key)
+                if failure is not None:
+                    if now - failure[0] < self.failure_ttl:
+                        self._stats["failure_hits"] += 1
+                        raise failure[1]
+                    del self._failures[key]
+                return None
+            if count:
+                self._stats["hits"] += 1
+            return dict(entry[1])
+
+    def seed(self, account: str, section: str, data: Dict[str, Any]) -> None:
+        """记录从其他请求中顺带得到的元数据"""
+        with self._lock:
+            self._entries[(account, section)] = (time.time(), dict(data))
+            self._failures.pop((account, section), None)
+
+    def get_all(self, account: str, refresh: bool = False) -> Dict[str, Any]:
+        """返回账户的全部元数据"""
+        metadata = {"account": account}
+        for section in SECTIONS:
+            metadata.update(self.get(account, section, refresh))
+        return metadata
+
+    def invalidate(self, account: Optional[str] = None, section: Optional[str] = None) -> int:
+        """使缓存失效，不指定账户时清空全部，返回失效的条目数"""
+        with self._lock:
+            keys = [key for key in self._entries
+                    if (account is None or key[0] == account) and (section is None or key[1] == section)]
+            for key in keys:
+                del self._entries[key]
+            self._stats["invalidations"] += len(keys)
+            for key in [key for key in self._failures
+                        if (account is None or key[0] == account) and (section is None or key[1] == section)]:
+                del self._failures[key]
+        return len(keys)
+
+    def warm_up(self, accounts: Iterable[str], executor: Executor) -> None:
+        """在后台预先加载账户的广告客户端和时区，失败只记录日志"""
+        def load(account):
+            try:
+                for section in WARM_SECTIONS:
+                    self.get(account, section)
+            except Exception as e:
+                print(f"⚠️ 预加载账户 {account} 元数据失败: {str(e)}", file=sys.stderr)
+
+        for account in accounts:
+            executor.submit(load, account)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中、加载统计和已缓存的账户"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["accounts"] = sorted({account for account, _ in self._entries})
+        stats["ttl"] = self.ttl
+        stats["failure_ttl"] = self.failure_ttl
+        return stats
@@ -0,0 +1,238 @@
+"""
+asyncio JSON-RPC调度器 - `mcp-adsense-ultimate --async` 的stdio主循环
+
+stdin/stdout 作为异步流读写，每个 tools/call 是一个协程：
+阻塞的AdSense API调用在专用线程池中执行，协程只在等待结果时占用一个任务对象，
+因此可以同时接收数百个进行中的请求，而实际占用的线程数由 max_workers 决定（默认256）。
+响应按JSON-RPC id乱序写回；支持 notifications/cancelled 取消排队中的请求，
+执行中的请求被取消时丢弃其响应（与线程调度器相同）。
+
+工具处理函数仍是同步的，与stdio和--http模式共用（execute_request），没有改写为协程：
+google-api-python-client 没有异步客户端，为此引入异步HTTP库并重写发现文档的请求构建、
+CallGuard重试和分页会使三种模式各维护一套实现。线程池中的线程大部分时间阻塞在网络I/O上，
+同时进行的API请求数实际由HTTP连接池（MCP_ADSENSE_HTTP_POOL_SIZE）和CallGuard的QPS限制
+（MCP_ADSENSE_API_QPS）决定，而不是线程数。
+
+stdin/stdout 不是管道、套接字或终端时（例如重定向到普通文件），改为在线程中逐行读取和同步写出。
+"""
+
+import asyncio
+import os
+import stat
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, IO, Optional
+
+from .dispatcher import (DEFAULT_ASYNC_MAX_QUEUE, DEFAULT_ASYNC_MAX_WORKERS, execute_request, parse_message,
+                         respond, serialize_response)
+
+# 单条JSON-RPC消息的最大长度
+_LINE_LIMIT = 16 * 1024 * 1024
+
+
+def _is_stream_fd(stream: IO[str], *modes: Callable[[int], bool]) -> bool:
+    try:
+        mode = os.fstat(stream.fileno()).st_mode
+    except (AttributeError, OSError, ValueError):
+        return False
+    return any(check(mode) for check in modes)
+
+
+def _shares_stderr(stream: IO[str]) -> bool:
+    """输出流与stderr是否为同一文件（设置非阻塞会影响stderr的写入）"""
+    try:
+        out, err = os.fstat(stream.fileno()), os.fstat(sys.stderr.fileno())
+    except (AttributeError, OSError, ValueError):
+        return True
+    return (out.st_dev, out.st_ino) == (err.st_dev, err.st_ino)
+
+
+class AsyncJSONRPCDispatcher:
+    """基于asyncio的MCP JSON-RPC调度器"""
+
+    def __init__(self, server: Any, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, output: IO[str] = None):
+        """
+        Args:
+            server: MCPAdSenseEnhancedUltimateServer 实例
+            max_workers: 执行API调用的最大线程数
+            max_queue: 等待线程的最大请求数，进行中的请求达到 max_workers + max_queue 时暂停读取（背压）
+            output: 响应输出流，默认 sys.stdout
+        """
+        self.server = server
+        self.max_workers = max_workers or int(os.getenv("MCP_ADSENSE_MAX_WORKERS", DEFAULT_ASYNC_MAX_WORKERS))
+        self.max_queue = max_queue or int(os.getenv("MCP_ADSENSE_MAX_QUEUE", DEFAULT_ASYNC_MAX_QUEUE))
+        self.output = output or sys.stdout
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="adsense-async")
+        self._state_lock = threading.Lock()
+        self._tasks: Dict[Any, asyncio.Task] = {}
+        self._futures: Dict[Any, Future] = {}
+        self._cancelled = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._stats = {
+            "queue_depth": 0,
+            "peak_queue_depth": 0,
+            "in_flight": 0,
+            "completed": 0,
+            "cancelled": 0
+        }
+        server.dispatcher = self
+
+    def serve(self, input_stream: IO[str] = None) -> None:
+        """在新的事件循环中读取输入直到EOF，然后等待所有进行中的请求完成"""
+        asyncio.run(self.serve_async(input_stream))
+
+    async def serve_async(self, input_stream: IO[str] = None) -> None:
+        input_stream = input_stream or sys.stdin
+        self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+        self._write_lock = asyncio.Lock()
+        readline = await self._open_reader(input_stream)
+        self._writer = await self._open_writer(self.output)
+        try:
+            while True:
+                line = await readline()
+                if not line:
+                    break
+                await self.handle_line(line)
+            if self._tasks:
+                await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        finally:
+            self._executor.shutdown(wait=True)
+            if self._writer is not None:
+                self._writer.close()
+
+    async def _open_reader(self, stream: IO[str]) -> Callable[[], Awaitable[str]]:
+        """返回逐行读取的协程函数，EOF时返回空字符串"""
+        loop = asyncio.get_running_loop()
+        if _is_stream_fd(stream, stat.S_ISFIFO, stat.S_ISSOCK, stat.S_ISCHR):
+            reader = asyncio.StreamReader(limit=_LINE_LIMIT)
+            try:
+                await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), stream)
+            except (NotImplementedError, OSError, ValueError):
+                pass
+            else:
+                async def read_stream() -> str:
+                    return (await reader.readline()).decode("utf-8")
+                return read_stream
+
+        async def read_in_thread() -> str:
+            return await loop.run_in_executor(None, stream.readline)
+        return read_in_thread
+
+    async def _open_writer(self, stream: IO[str]) -> Optional[asyncio.StreamWriter]:
+        """输出为独立的管道或套接字时使用异步写流，否则返回None（同步写出）"""
+        if not _is_stream_fd(stream, stat.S_ISFIFO, stat.S_ISSOCK) or _shares_stderr(stream):
+            return None
+        loop = asyncio.get_running_loop()
+        stream.flush()
+        try:
+            transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, stream)
+        except (NotImplementedError, OSError, ValueError):
+            return None
+        return asyncio.StreamWriter(transport, protocol, None, loop)
+
+    async def handle_line(self, line: str) -> None:
+        """处理一行JSON-RPC消息"""
+        request = parse_message(line)
+        if request is None:
+            return
+
+        method = request.get("method")
+        params = request.get("params") or {}
+
+        if method == "notifications/cancelled":
+            self.cancel(params.get("requestId"))
+            return
+        # 其他通知不需要响应
+        if "id" not in request:
+            return
+
+        if method == "tools/call":
+            await self._submit(request)
+        else:
+            await self._write(respond(self.server, request, method))
+
+    async def _submit(self, request: Dict[str, Any]) -> None:
+        """将 tools/call 提交到线程池并创建等待结果的任务；进行中的请求达到上限时等待空位"""
+        await self._slots.acquire()
+        request_id = request.get("id")
+        with self._state_lock:
+            self._stats["queue_depth"] += 1
+            self._stats["peak_queue_depth"] = max(self._stats["peak_queue_depth"],
+                                                  self._stats["queue_depth"])
+        future = self._executor.submit(self._call, request)
+        task = asyncio.get_running_loop().create_task(self._run(future))
+        self._futures[request_id] = future
+        self._tasks[request_id] = task
+        task.add_done_callback(lambda t: self._finish(request_id, t))
+
+    async def _run(self, future: Future) -> None:
+        """等待线程池中的执行结果（含序列化），然后写回响应"""
+        data = await asyncio.wrap_future(future)
+        # 已被客户端取消的请求不再发送响应
+        if data is not None:
+            await self._write(data)
+
+    def _call(self, request: Dict[str, Any]) -> Optional[str]:
+        request_id = request.get("id")
+        with self._state_lock:
+            self._stats["queue_depth"] -= 1
+            self._stats["in_flight"] += 1
+        try:
+            response = execute_request(self.server, request)
+        finally:
+            with self._state_lock:
+                self._stats["in_flight"] -= 1
+                cancelled = request_id in self._cancelled
+        if cancelled:
+            return None
+        return serialize_response(self.server, response, (request.get("params") or {}).get("name"))
+
+    def _finish(self, request_id: Any, task: asyncio.Task) -> None:
+        """任务完成或被取消后释放位置"""
+        if self._tasks.get(request_id) is task:
+            del self._tasks[request_id]
+            del self._futures[request_id]
+        with self._state_lock:
+            self._cancelled.discard(request_id)
+            # 只有尚未开始执行的请求会被真正取消
+            if task.cancelled():
+                self._stats["queue_depth"] -= 1
+                self._stats["cancelled"] += 1
+            else:
+                self._stats["completed"] += 1
+        self._slots.release()
+
+    def cancel(self, request_id: Any) -> bool:
+        """取消请求：排队中的直接移除，执行中的丢弃其响应"""
+        future = self._futures.get(request_id)
+        if future is None:
+            return False
+        with self._state_lock:
+            self._cancelled.add(request_id)
+        return future.cancel()
+
+    async def _write(self, data: str) -> None:
+        """写出一行响应；异步写流按锁串行写入并等待缓冲区排空"""
+        payload = (data + "\n").encode("utf-8")
+        async with self._write_lock:
+            if self._writer is not None:
+                self._writer.write(payload)
+                await self._writer.drain()
+            else:
+                self.output.write(data + "\n")
+                self.output.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回队列深度、执行中请求数等指标"""
+        with self._state_lock:
+            stats = dict(self._stats)
+        stats["max_workers"] = self.max_workers
+        stats["max_queue"] = self.max_queue
+        stats["mode"] = "async"
+        return stats
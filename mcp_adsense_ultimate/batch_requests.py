@@ -0,0 +1,71 @@
+"""
+批量HTTP请求 - 通过 googleapiclient 的 new_batch_http_request 合并多个get请求
+
+请求按块发送，每块一次HTTP往返；每个请求的结果或错误按输入顺序映射回对应的ID。
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# AdSense API单个批量请求最多可包含1000个子请求，默认使用更小的块以控制单次响应体积
+DEFAULT_BATCH_SIZE = 50
+
+
+def execute_batch(service: Any, requests: List[Tuple[str, Any]], batch_size: Optional[int] = None,
+                  execute: Callable[[Any], Any] = None) -> Tuple[Dict[str, Any], Dict[str, str], int]:
+    """分块执行批量请求
+
+    Args:
+        service: AdSense服务对象
+        requests: [(ID, HttpRequest)]，ID用于映射结果
+        batch_size: 每个批量请求包含的子请求数，默认读取MCP_ADSENSE_BATCH_SIZE（默认50）
+        execute: 执行批量请求的函数，默认直接调用 batch.execute()
+
+    Returns:
+        (ID -> 响应, ID -> 错误信息, 批量请求次数)
+    """
+    batch_size = batch_size or int(os.getenv("MCP_ADSENSE_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+    execute = execute or (lambda batch: batch.execute())
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    batches = 0
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = str(exception)
+        else:
+            results[request_id] = response
+
+    for offset in range(0, len(requests), batch_size):
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, request in requests[offset:offset + batch_size]:
+            batch.add(request, request_id=request_id)
+        execute(batch)
+        batches += 1
+    return results, errors, batches
+
+
+def batch_get(service: Any, ids: List[str], build_request: Callable[[str], Any],
+              describe: Callable[[Dict[str, Any]], Dict[str, Any]], id_field: str,
+              batch_size: Optional[int] = None, execute: Callable[[Any], Any] = None) -> Dict[str, Any]:
+    """批量获取多个资源，返回 {"items", "errors", "total", "batches"}，items和errors均保持输入顺序
+
+    Args:
+        ids: 资源ID列表（重复的ID只请求一次）
+        build_request: 根据ID构造未执行的get请求
+        describe: 将API响应转换为结果中的一项
+        id_field: 结果和错误中记录输入ID的字段名
+        execute: 执行批量请求的函数，见 execute_batch
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    results, errors, batches = execute_batch(
+        service, [(resource_id, build_request(resource_id)) for resource_id in unique_ids], batch_size, execute
+    )
+    return {
+        "items": [{id_field: resource_id, **describe(results[resource_id])}
+                  for resource_id in unique_ids if resource_id in results],
+        "errors": [{id_field: resource_id, "error": errors[resource_id]}
+                   for resource_id in unique_ids if resource_id in errors],
+        "total": len(results),
+        "batches": batches
+    }
@@ -0,0 +1,123 @@
+"""
+批量创建/更新/删除 - 按QPS预算并发执行一组资源变更
+
+规格可以直接以列表传入，也可以从CSV或JSON文件读取。批量创建是幂等的：
+已存在相同displayName的资源（通过缓存的列表结果判断）和规格中重复的名称都会被跳过。
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .rate_limit import TokenBucket
+
+BULK_ACTIONS = ("bulk_create", "bulk_patch", "bulk_delete")
+DEFAULT_QPS = 5.0
+
+
+def load_specs(specs: Optional[List[Dict[str, Any]]] = None,
+               specs_file: Optional[str] = None) -> List[Dict[str, Any]]:
+    """读取规格列表：specs优先，否则读取CSV（首行为字段名）或JSON（列表或 {"specs": [...]}）文件"""
+    if specs:
+        return [dict(spec) for spec in specs]
+    if not specs_file:
+        raise ValueError("批量操作需要提供specs或specs_file")
+
+    with open(os.path.expanduser(specs_file), "r", encoding="utf-8-sig", newline="") as f:
+        if specs_file.lower().endswith(".csv"):
+            # 空单元格视为未提供该字段
+            return [{key: value for key, value in row.items() if value not in (None, "")}
+                    for row in csv.DictReader(f)]
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("specs", [])
+    if not isinstance(data, list):
+        raise ValueError("JSON规格文件必须是对象列表，或包含specs列表的对象")
+    return [dict(spec) for spec in data]
+
+
+class ListingCache:
+    """按父资源缓存 displayName -> 资源 的映射，用于判断批量创建的资源是否已存在"""
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else int(os.getenv("MCP_ADSENSE_LISTING_CACHE_TTL", "300"))
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, Dict[str, Dict[str, Any]]]] = {}
+
+    def get(self, key: str, loader: Callable[[], List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """返回缓存的映射，不存在或已过期时调用loader重新列出"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                return dict(entry[1])
+        names = {item.get("displayName"): item for item in loader() if item.get("displayName")}
+        with self._lock:
+            self._entries[key] = (time.monotonic(), names)
+        return dict(names)
+
+    def add(self, key: str, item: Dict[str, Any]) -> None:
+        """记录新创建的资源"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and item.get("displayName"):
+                entry[1][item["displayName"]] = item
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """使指定父资源（或全部）的缓存失效"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+def run_bulk(executor: Executor, specs: List[Dict[str, Any]],
+             operation: Callable[[Dict[str, Any]], Dict[str, Any]],
+             qps: Optional[float] = None, precomputed: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """在QPS预算内并发执行operation(spec)
+
+    operation返回该项的结果（包含status等字段），抛出异常时该项记为failed。
+    precomputed为 规格序号 -> 结果，这些项（例如幂等跳过的项）不执行也不消耗QPS预算。
+
+    Returns:
+        {"results": 按输入顺序的逐项结果, "summary": 汇总（耗时、吞吐量等）}
+    """
+    bucket = TokenBucket(qps or float(os.getenv("MCP_ADSENSE_BULK_QPS", DEFAULT_QPS)))
+    start = time.perf_counter()
+
+    def run(index_spec):
+        index, spec = index_spec
+        if precomputed and index in precomputed:
+            return {"index": index, **precomputed[index]}
+        bucket.acquire()
+        item_start = time.perf_counter()
+        try:
+            result = {"index": index, **operation(spec)}
+        except Exception as e:
+            result = {"index": index, "status": "failed", "spec": spec, "error": str(e)}
+        result["elapsed_ms"] = round((time.perf_counter() - item_start) * 1000, 1)
+        return result
+
+    results = list(executor.map(run, enumerate(specs)))
+    wall_clock = time.perf_counter() - start
+
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    executed = len(results) - len(precomputed or {})
+    return {
+        "results": results,
+        "summary": {
+            "total": len(results),
+            "statuses": counts,
+            "failed": counts.get("failed", 0),
+            "wall_clock_s": round(wall_clock, 3),
+            "throughput_per_s": round(executed / wall_clock, 2) if wall_clock > 0 else None,
+            "qps_budget": bucket.rate,
+            "rate_limited_s": round(bucket.waited_seconds, 3)
+        }
+    }
@@ -0,0 +1,293 @@
+"""
+AdSense API调用保护 - 所有请求共享的限流、重试和熔断
+
+    限流   每个账户（无法识别账户时按项目）一个令牌桶；收到429时速率减半，
+           之后每次成功调用缓慢回升到配置的上限（AIMD）
+    重试   429、5xx、限额类403和网络错误按指数退避加随机抖动重试，
+           响应带Retry-After时至少等待其指定的时间
+    熔断   连续多次调用在重试后仍失败时打开熔断器，冷却期内直接失败，
+           冷却结束后放行一个试探请求，成功则恢复
+
+服务对象通过 request_builder 构建后，所有 request.execute() 都会经过这里，
+request.execute(num_retries=N) 中的N作为该次调用的最大重试次数。
+googleapiclient在首次构建服务对象或处理API错误时才导入。
+"""
+
+import functools
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, TypeVar
+
+from .rate_limit import TokenBucket
+
+if TYPE_CHECKING:
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import HttpRequest
+
+T = TypeVar("T")
+
+PROJECT_KEY = "project"
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# 403响应中表示限额/速率超限（而非权限问题）的原因
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded", "RATE_LIMIT_EXCEEDED")
+_ACCOUNT_PATTERN = re.compile(r"/accounts/([^/?]+)")
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开期间的调用直接失败"""
+
+
+def account_key(uri: str) -> str:
+    """从请求URI中提取账户ID作为限流键，无法识别时使用项目级的键"""
+    match = _ACCOUNT_PATTERN.search(uri or "")
+    return match.group(1) if match else PROJECT_KEY
+
+
+_managed_request_class = None
+
+
+def _managed_request() -> type:
+    """execute() 经过 CallGuard 的 HttpRequest 子类（首次使用时定义）"""
+    global _managed_request_class
+    if _managed_request_class is None:
+        from googleapiclient.http import HttpRequest
+
+        class _ManagedHttpRequest(HttpRequest):
+            def __init__(self, *args: Any, guard: "CallGuard" = None, **kwargs: Any):
+                super().__init__(*args, **kwargs)
+                self._guard = guard
+
+            def execute(self, http: Any = None, num_retries: int = 0) -> Any:
+                return self._guard.call(
+                    lambda: HttpRequest.execute(self, http=http),
+                    key=account_key(self.uri),
+                    num_retries=num_retries or None
+                )
+
+            def execute_stream(self, chunk_size: int = 64 * 1024, num_retries: int = 0) -> Any:
+                """执行请求并返回 (响应, 响应体分块迭代器)，限流、重试和熔断覆盖到收到响应头为止
+
+                HTTP客户端不支持流式读取（httplib2）时响应体整体读入，迭代器只产生一块。
+                """
+                from googleapiclient.errors import HttpError
+
+                http = self.http
+                if not hasattr(http, "stream"):
+                    def buffered() -> Any:
+                        resp, content = http.request(self.uri, method=self.method, body=self.body,
+                                                     headers=self.headers)
+                        if resp.status >= 300:
+                            raise HttpError(resp, content, uri=self.uri)
+                        return resp, iter([content])
+                    opener = buffered
+                else:
+                    def opener() -> Any:
+                        resp, chunks = http.stream(self.uri, method=self.method, body=self.body,
+                                                   headers=self.headers, chunk_size=chunk_size)
+                        if resp.status >= 300:
+                            raise HttpError(resp, b"".join(chunks), uri=self.uri)
+                        return resp, chunks
+                return self._guard.call(opener, key=account_key(self.uri), num_retries=num_retries or None)
+
+        _managed_request_class = _ManagedHttpRequest
+    return _managed_request_class
+
+
+class CallGuard:
+    """API调用的限流、重试与熔断"""
+
+    def __init__(self, qps: Optional[float] = None, min_qps: Optional[float] = None,
+                 max_retries: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, breaker_threshold: Optional[int] = None,
+                 breaker_cooldown: Optional[float] = None, sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            qps: 每个账户的速率上限，默认读取MCP_ADSENSE_API_QPS（默认10）
+            min_qps: 收到429后速率下调的下限
+            max_retries: 默认最大重试次数，默认读取MCP_ADSENSE_API_MAX_RETRIES（默认4）
+            base_delay: 退避的基础秒数
+            max_delay: 单次退避的最大秒数
+            breaker_threshold: 连续失败多少次后打开熔断器，默认读取MCP_ADSENSE_BREAKER_THRESHOLD（默认5）
+            breaker_cooldown: 熔断器打开后的冷却秒数，默认读取MCP_ADSENSE_BREAKER_COOLDOWN（默认30）
+            sleep: 等待函数
+        """
+        self.qps = qps or float(os.getenv("MCP_ADSENSE_API_QPS", "10"))
+        self.min_qps = min_qps or max(0.1, self.qps / 20)
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("MCP_ADSENSE_API_MAX_RETRIES", "4"))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("MCP_ADSENSE_RETRY_BASE_DELAY", "0.5"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("MCP_ADSENSE_RETRY_MAX_DELAY", "32"))
+        self.breaker_threshold = breaker_threshold or int(os.getenv("MCP_ADSENSE_BREAKER_THRESHOLD", "5"))
+        self.breaker_cooldown = breaker_cooldown if breaker_cooldown is not None else float(
+            os.getenv("MCP_ADSENSE_BREAKER_COOLDOWN", "30"))
+        self._sleep = sleep
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._stats = {
+            "calls": 0,
+            "retries": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "transport_errors": 0,
+            "failures": 0,
+            "short_circuited": 0,
+            "breaker_opens": 0,
+            "backoff_seconds": 0.0
+        }
+
+    @property
+    def request_builder(self) -> Callable[..., "HttpRequest"]:
+        """传给 build_from_document 的 requestBuilder"""
+        return functools.partial(_managed_request(), guard=self)
+
+    def execute(self, request: Any, num_retries: Optional[int] = None) -> Any:
+        """执行未经托管的请求对象（例如批量请求）"""
+        return self.call(request.execute, key=account_key(getattr(request, "uri", "")), num_retries=num_retries)
+
+    def call(self, func: Callable[[], T], key: str = PROJECT_KEY, num_retries: Optional[int] = None) -> T:
+        """在限流、重试和熔断保护下执行func"""
+        from googleapiclient.errors import HttpError
+
+        retries = self.max_retries if num_retries is None else num_retries
+        bucket = self._bucket(key)
+        self._before_call()
+        with self._lock:
+            self._stats["calls"] += 1
+
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                result = func()
+            except HttpError as e:
+                status = e.resp.status
+                throttled = status == 429 or (status == 403 and self._is_rate_limit(e))
+                if not throttled and status not in RETRYABLE_STATUSES:
+                    # 客户端错误说明API本身可用
+                    self._record_success(key, adjust_rate=False)
+                    raise
+                with self._lock:
+                    self._stats["throttled" if throttled else "server_errors"] += 1
+                if throttled:
+                    self._slow_down(key)
+                if attempt >= retries:
+                    self._record_failure()
+                    raise
+                delay = max(self._backoff(attempt), self._retry_after(e) or 0.0)
+            except OSError:
+                with self._lock:
+                    self._stats["transport_errors"] += 1
+                if attempt >= retries:
+                    self._record_failure()
+                    raise
+                delay = self._backoff(attempt)
+            except Exception:
+                # 与API可用性无关的错误不影响熔断状态，但要释放试探机会
+                with self._lock:
+                    self._trial_in_flight = False
+                raise
+            else:
+                self._record_success(key)
+                return result
+
+            attempt += 1
+            with self._lock:
+                self._stats["retries"] += 1
+                self._stats["backoff_seconds"] += delay
+            self._sleep(delay)
+
+    def _bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.qps)
+            return bucket
+
+    def _backoff(self, attempt: int) -> float:
+        """指数退避加完全随机抖动"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(error: "HttpError") -> Optional[float]:
+        """解析Retry-After响应头（秒数或HTTP日期）"""
+        value = error.resp.get("retry-after") if hasattr(error.resp, "get") else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _is_rate_limit(error: "HttpError") -> bool:
+        content = error.content.decode("utf-8", "replace") if isinstance(error.content, bytes) else str(error.content)
+        return any(reason in content for reason in _RATE_LIMIT_REASONS)
+
+    def _slow_down(self, key: str) -> None:
+        """收到限流响应后将该键的速率减半"""
+        bucket = self._bucket(key)
+        bucket.set_rate(max(self.min_qps, bucket.rate / 2))
+
+    def _before_call(self) -> None:
+        """熔断器打开时直接失败；冷却结束后只放行一个试探请求"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.breaker_cooldown and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self._stats["short_circuited"] += 1
+        raise CircuitOpenError(
+            f"AdSense API连续{self.breaker_threshold}次调用失败，熔断器已打开，请在{self.breaker_cooldown:g}秒冷却后重试"
+        )
+
+    def _record_success(self, key: str, adjust_rate: bool = True) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+        if adjust_rate:
+            # 成功后缓慢回升速率
+            bucket = self._bucket(key)
+            if bucket.rate < self.qps:
+                bucket.set_rate(min(self.qps, bucket.rate + self.qps / 50))
+
+    def _record_failure(self) -> None:
+        with self._lock:
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            # 试探请求失败，或关闭状态下连续失败达到阈值时（重新）打开熔断器
+            if self._trial_in_flight or (self._opened_at is None
+                                         and self._consecutive_failures >= self.breaker_threshold):
+                self._stats["breaker_opens"] += 1
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """返回重试、限流、熔断统计及各限流键的当前速率"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["backoff_seconds"] = round(stats["backoff_seconds"], 3)
+            if self._opened_at is None:
+                state = "closed"
+            elif self._trial_in_flight or time.monotonic() - self._opened_at >= self.breaker_cooldown:
+                state = "half_open"
+            else:
+                state = "open"
+            stats["breaker"] = {"state": state, "consecutive_failures": self._consecutive_failures}
+            stats["limiters"] = {
+                key: {"qps": round(bucket.rate, 3), "waited_seconds": round(bucket.waited_seconds, 3)}
+                for key, bucket in self._buckets.items()
+            }
+        return stats
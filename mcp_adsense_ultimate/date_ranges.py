@@ -0,0 +1,66 @@
+"""
+报告日期范围解析 - 将AdSense预定义的dateRange枚举和自定义日期换算为具体日期
+
+AdSense按账户时区（accounts.get 返回的 timeZone）计算报告日期，
+因此“今天”取账户时区中的当前日期；时区未知时使用本机日期。
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python 3.8没有zoneinfo
+    ZoneInfo = None
+
+DATE_RANGES = ("TODAY", "YESTERDAY", "MONTH_TO_DATE", "YEAR_TO_DATE", "LAST_7_DAYS", "LAST_30_DAYS")
+
+
+def parse_date(value: str) -> date:
+    """解析 YYYY-MM-DD 格式的日期"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError(f"日期格式错误: {value}，应为YYYY-MM-DD") from None
+
+
+def today_in(time_zone: Optional[str] = None) -> date:
+    """指定时区（IANA名称，例如 America/Los_Angeles）中的今天；时区未知或无法加载时使用本机日期"""
+    if time_zone and ZoneInfo is not None:
+        try:
+            return datetime.now(ZoneInfo(time_zone)).date()
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return date.today()
+
+
+def resolve_date_range(date_range: Optional[str] = None, start_date: Optional[str] = None,
+                       end_date: Optional[str] = None, today: Optional[date] = None) -> Tuple[date, date]:
+    """返回报告请求覆盖的 (开始日期, 结束日期)，两端均包含
+
+    参数不合法（未知的dateRange、缺少或无法解析的自定义日期、开始晚于结束）时抛出ValueError。
+    """
+    if not date_range or date_range == "CUSTOM":
+        if not start_date or not end_date:
+            raise ValueError("必须提供start_date和end_date，或使用date_range参数")
+        start, end = parse_date(start_date), parse_date(end_date)
+        if start > end:
+            raise ValueError(f"开始日期 {start_date} 晚于结束日期 {end_date}")
+        return start, end
+
+    today = today or date.today()
+    if date_range == "TODAY":
+        return today, today
+    if date_range == "YESTERDAY":
+        yesterday = today - timedelta(days=1)
+        return yesterday, yesterday
+    if date_range == "MONTH_TO_DATE":
+        return today.replace(day=1), today
+    if date_range == "YEAR_TO_DATE":
+        return today.replace(month=1, day=1), today
+    # LAST_N_DAYS 不包含今天
+    if date_range == "LAST_7_DAYS":
+        return today - timedelta(days=7), today - timedelta(days=1)
+    if date_range == "LAST_30_DAYS":
+        return today - timedelta(days=30), today - timedelta(days=1)
+    raise ValueError(f"不支持的日期范围: {date_range}，可选: {', '.join(DATE_RANGES)}")
@@ -0,0 +1,88 @@
+"""
+AdSense API v2 离线发现文档 - 零网络构建服务对象
+
+包内随附固定版本的AdSense v2发现文档（config/adsense_v2_discovery.json），
+通过 build_from_document 构建客户端。解析后的文档以 marshal 格式缓存到磁盘，
+冷启动时直接反序列化，避免重复的JSON解析。googleapiclient在首次构建服务对象时才导入。
+"""
+
+import json
+import marshal
+import os
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+DISCOVERY_DOCUMENT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "config", "adsense_v2_discovery.json"
+)
+
+_lock = threading.Lock()
+_marshalled_document: Optional[bytes] = None
+
+
+def _get_cache_path(stat: os.stat_result) -> str:
+    """marshal缓存文件路径，文件名包含文档版本和Python版本，任一变化都会使缓存失效"""
+    cache_dir = os.getenv("MCP_ADSENSE_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "mcp-adsense-ultimate"
+    )
+    name = "adsense_v2_discovery.{}.{}.py{}{}.m{}.marshal".format(
+        stat.st_mtime_ns, stat.st_size, sys.version_info[0], sys.version_info[1], marshal.version
+    )
+    return os.path.join(cache_dir, name)
+
+
+def _load_marshalled_document() -> bytes:
+    """读取marshal缓存，不存在时解析JSON并写入缓存"""
+    stat = os.stat(DISCOVERY_DOCUMENT_PATH)
+    cache_path = _get_cache_path(stat)
+
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+        marshal.loads(data)  # 校验缓存完整性
+        return data
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with open(DISCOVERY_DOCUMENT_PATH, "r", encoding="utf-8") as f:
+        data = marshal.dumps(json.load(f))
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        # 缓存目录不可写时仅影响下次冷启动速度
+        print(f"⚠️ 无法写入发现文档缓存: {str(e)}", file=sys.stderr)
+
+    return data
+
+
+def load_discovery_document() -> Dict[str, Any]:
+    """返回AdSense v2发现文档的全新副本
+
+    build_from_document 会就地修改文档中的方法描述，因此每次构建都反序列化一份新的副本，
+    marshal反序列化远快于JSON解析。
+    """
+    global _marshalled_document
+    if _marshalled_document is None:
+        with _lock:
+            if _marshalled_document is None:
+                _marshalled_document = _load_marshalled_document()
+    return marshal.loads(_marshalled_document)
+
+
+def build_adsense_service(credentials: Any = None, http: Any = None, request_builder: Any = None) -> Any:
+    """使用随附的发现文档构建AdSense v2服务对象，不发起任何网络请求
+
+    Args:
+        request_builder: 自定义的HttpRequest构造器，例如 CallGuard.request_builder
+    """
+    from googleapiclient.discovery import build_from_document
+
+    kwargs = {"requestBuilder": request_builder} if request_builder is not None else {}
+    return build_from_document(load_discovery_document(), credentials=credentials, http=http, **kwargs)
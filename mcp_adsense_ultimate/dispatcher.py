@@ -0,0 +1,216 @@
+"""
+并发JSON-RPC调度器 - stdio主循环
+
+持续读取请求，在有界线程池中执行 tools/call，响应按JSON-RPC id乱序写回，
+所有输出通过同一把锁串行写入；支持 notifications/cancelled 取消排队中的请求。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, IO, Optional
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_QUEUE = 64
+# --async 模式（async_dispatcher）的默认值，定义在这里以便命令行帮助不必导入asyncio；
+# 线程大部分时间阻塞在网络I/O上，真正的并发由HTTP连接池和CallGuard的QPS限制
+DEFAULT_ASYNC_MAX_WORKERS = 256
+DEFAULT_ASYNC_MAX_QUEUE = 1024
+
+
+def parse_message(line: str) -> Optional[Dict[str, Any]]:
+    """解析一行JSON-RPC消息，无法解析或不是对象时返回None"""
+    try:
+        request = json.loads(line.strip())
+    except json.JSONDecodeError:
+        return None
+    return request if isinstance(request, dict) else None
+
+
+def execute_request(server: Any, request: Dict[str, Any]) -> Dict[str, Any]:
+    """执行单个JSON-RPC请求并构造响应"""
+    request_id = request.get("id")
+    method = request.get("method")
+    params = request.get("params") or {}
+    try:
+        if method == "initialize":
+            result = server.handle_initialize(params)
+        elif method == "tools/list":
+            result = server.handle_tools_list()
+        elif method == "tools/call":
+            result = server.handle_tools_call(
+                params.get("name"),
+                params.get("arguments", {})
+            )
+        else:
+            result = {"error": f"Unknown method: {method}"}
+
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": result
+        }
+    except Exception as e:
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {"code": -32603, "message": str(e)}
+        }
+
+
+def serialize_response(server: Any, response: Dict[str, Any], tool: Optional[str] = None) -> str:
+    """序列化响应为一行JSON并记录输出大小和耗时"""
+    start = time.perf_counter()
+    data = server.serializer.dumps_message(response)
+    server.serializer.record_wire(tool, len(data.encode("utf-8")), time.perf_counter() - start)
+    return data
+
+
+def respond(server: Any, request: Dict[str, Any], tool: Optional[str] = None) -> str:
+    """执行请求并返回序列化后的响应；tools/list直接拼接服务器预先序列化的工具列表"""
+    if request.get("method") == "tools/list" and hasattr(server, "tools_list_json"):
+        start = time.perf_counter()
+        data = '{"jsonrpc":"2.0","id":%s,"result":%s}' % (
+            server.serializer.dumps_message(request.get("id")), server.tools_list_json()
+        )
+        server.serializer.record_wire(tool, len(data.encode("utf-8")), time.perf_counter() - start)
+        return data
+    return serialize_response(server, execute_request(server, request), tool)
+
+
+class JSONRPCDispatcher:
+    """MCP JSON-RPC 并发调度器"""
+
+    def __init__(self, server: Any, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, output: IO[str] = None):
+        """
+        Args:
+            server: MCPAdSenseEnhancedUltimateServer 实例
+            max_workers: 并发执行 tools/call 的最大线程数
+            max_queue: 等待执行的最大请求数，超过后暂停读取新请求（背压）
+            output: 响应输出流，默认 sys.stdout
+        """
+        self.server = server
+        self.max_workers = max_workers or int(os.getenv("MCP_ADSENSE_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        self.max_queue = max_queue or int(os.getenv("MCP_ADSENSE_MAX_QUEUE", DEFAULT_MAX_QUEUE))
+        self.output = output or sys.stdout
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="adsense-worker")
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._write_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._pending: Dict[Any, Future] = {}
+        self._cancelled = set()
+        self._stats = {
+            "queue_depth": 0,
+            "peak_queue_depth": 0,
+            "in_flight": 0,
+            "completed": 0,
+            "cancelled": 0
+        }
+        server.dispatcher = self
+
+    def serve(self, input_stream: IO[str] = None) -> None:
+        """读取输入直到EOF，然后等待所有进行中的请求完成"""
+        input_stream = input_stream or sys.stdin
+        try:
+            while True:
+                line = input_stream.readline()
+                if not line:
+                    break
+                self.handle_line(line)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def handle_line(self, line: str) -> None:
+        """处理一行JSON-RPC消息"""
+        request = parse_message(line)
+        if request is None:
+            return
+
+        method = request.get("method")
+        params = request.get("params") or {}
+
+        if method == "notifications/cancelled":
+            self.cancel(params.get("requestId"))
+            return
+        # 其他通知不需要响应
+        if "id" not in request:
+            return
+
+        if method == "tools/call":
+            self._submit(request)
+        else:
+            self._write(respond(self.server, request, method))
+
+    def _submit(self, request: Dict[str, Any]) -> None:
+        """将 tools/call 提交到线程池"""
+        self._slots.acquire()
+        request_id = request.get("id")
+        with self._state_lock:
+            self._stats["queue_depth"] += 1
+            self._stats["peak_queue_depth"] = max(self._stats["peak_queue_depth"],
+                                                  self._stats["queue_depth"])
+            future = self._executor.submit(self._run, request)
+            self._pending[request_id] = future
+        future.add_done_callback(lambda f: self._finish(request_id, f))
+
+    def _run(self, request: Dict[str, Any]) -> None:
+        """在工作线程中执行请求并写回响应"""
+        request_id = request.get("id")
+        with self._state_lock:
+            self._stats["queue_depth"] -= 1
+            self._stats["in_flight"] += 1
+        try:
+            response = self._execute(request)
+        finally:
+            with self._state_lock:
+                self._stats["in_flight"] -= 1
+                cancelled = request_id in self._cancelled
+        # 已被客户端取消的请求不再发送响应
+        if not cancelled:
+            self._write(serialize_response(self.server, response, (request.get("params") or {}).get("name")))
+
+    def _finish(self, request_id: Any, future: Future) -> None:
+        """请求完成或被取消后释放队列位置"""
+        with self._state_lock:
+            if self._pending.get(request_id) is future:
+                del self._pending[request_id]
+            self._cancelled.discard(request_id)
+            if future.cancelled():
+                self._stats["queue_depth"] -= 1
+                self._stats["cancelled"] += 1
+            else:
+                self._stats["completed"] += 1
+        self._slots.release()
+
+    def cancel(self, request_id: Any) -> bool:
+        """取消请求：排队中的直接移除，执行中的丢弃其响应"""
+        with self._state_lock:
+            future = self._pending.get(request_id)
+            if future is None:
+                return False
+            self._cancelled.add(request_id)
+        return future.cancel()
+
+    def _execute(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个JSON-RPC请求并构造响应"""
+        return execute_request(self.server, request)
+
+    def _write(self, data: str) -> None:
+        """通过单一锁写出响应，保证每条消息独占一行"""
+        with self._write_lock:
+            self.output.write(data + "\n")
+            self.output.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回队列深度、执行中请求数等指标"""
+        with self._state_lock:
+            stats = dict(self._stats)
+        stats["max_workers"] = self.max_workers
+        stats["max_queue"] = self.max_queue
+        return stats
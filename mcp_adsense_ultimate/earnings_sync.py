@@ -0,0 +1,330 @@
+"""
+收入数据增量同步 - 在本地SQLite事实表中维护按日期和维度汇总的报告数据
+
+每个同步规格（账户 + 维度组合 + 指标组合）对应事实表中的一组行，主键为日期和维度值。
+每次同步只拉取最终水位线之后的日期：AdSense会修订最近几天的数据，
+因此水位线停在结束日期之前restatement_days天，这几天在下次同步时重新拉取并整体替换。
+覆盖请求日期范围的规格可以直接在本地回答 get_reports 查询；
+只接受最终数据时，本地只回答最终水位线之前的日期，之后的日期由调用方向API获取。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .report_sharding import make_sort_key
+
+DEFAULT_BACKFILL_DAYS = 90
+DEFAULT_RESTATEMENT_DAYS = 3
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sync_specs ("
+    "spec_id TEXT PRIMARY KEY, account TEXT NOT NULL, dimensions TEXT NOT NULL, metrics TEXT NOT NULL, "
+    "headers TEXT, first_date TEXT NOT NULL, synced_through TEXT NOT NULL, finalized_through TEXT NOT NULL, "
+    "last_sync_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS earnings_facts ("
+    "spec_id TEXT NOT NULL, date TEXT NOT NULL, dim_key TEXT NOT NULL, cells TEXT NOT NULL, "
+    "PRIMARY KEY (spec_id, date, dim_key))"
+)
+
+
+class EarningsStore:
+    """本地收入事实表及其同步水位线"""
+
+    def __init__(self, db_path: Optional[str] = None, restatement_days: Optional[int] = None,
+                 backfill_days: Optional[int] = None):
+        """
+        Args:
+            db_path: SQLite文件路径，默认读取MCP_ADSENSE_SYNC_DB，未设置时放在缓存目录下
+            restatement_days: 每次同步重新拉取的最近天数，默认读取MCP_ADSENSE_SYNC_RESTATEMENT_DAYS（默认3）
+            backfill_days: 首次同步且未指定开始日期时回填的天数，默认读取MCP_ADSENSE_SYNC_BACKFILL_DAYS（默认90）
+        """
+        self.db_path = db_path or os.getenv("MCP_ADSENSE_SYNC_DB") or os.path.join(
+            os.getenv("MCP_ADSENSE_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "mcp-adsense-ultimate"),
+            "earnings.sqlite3"
+        )
+        self.restatement_days = restatement_days if restatement_days is not None else int(
+            os.getenv("MCP_ADSENSE_SYNC_RESTATEMENT_DAYS", DEFAULT_RESTATEMENT_DAYS))
+        self.backfill_days = backfill_days if backfill_days is not None else int(
+            os.getenv("MCP_ADSENSE_SYNC_BACKFILL_DAYS", DEFAULT_BACKFILL_DAYS))
+
+        self._lock = threading.Lock()
+        self._db = None
+        # 是否存在同步规格：None表示尚未检查；数据库文件不存在时不创建，按无规格处理
+        self._has_specs: Optional[bool] = None
+        self._stats = {
+            "syncs": 0,
+            "rows_written": 0,
+            "local_hits": 0,
+            "local_misses": 0
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库并建表（调用方持有锁）"""
+        if self._db is None:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+        return self._db
+
+    def _has_any_spec(self) -> bool:
+        """是否存在同步规格（调用方持有锁）；从未同步过时不打开也不创建数据库"""
+        if self._has_specs is None:
+            if self._db is None and self.db_path != ":memory:" and not os.path.exists(self.db_path):
+                return False
+            self._has_specs = self._connect().execute("SELECT 1 FROM sync_specs LIMIT 1").fetchone() is not None
+        return self._has_specs
+
+    @staticmethod
+    def make_spec_id(account: str, dimensions: List[str], metrics: List[str]) -> str:
+        """同步规格ID：维度和指标排序后参与计算，顺序不同的相同组合共用一份数据"""
+        canonical = json.dumps([account, sorted(dimensions), sorted(metrics)], separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+    def sync(self, account: str, dimensions: List[str], metrics: List[str],
+             fetch: Callable[[Tuple[date, date]], Dict[str, Any]],
+             start: Optional[date] = None, today: Optional[date] = None) -> Dict[str, Any]:
+        """增量同步一个规格
+
+        Args:
+            account: 账户ID（不含accounts/前缀）
+            dimensions: 维度列表，必须包含DATE
+            metrics: 指标列表
+            fetch: 拉取 (开始日期, 结束日期) 报告的函数，返回 reports.generate 结构的响应
+            start: 数据起始日期；首次同步默认回填backfill_days天，早于已有数据时补齐之前的日期
+            today: 同步的结束日期，默认今天
+        """
+        if "DATE" not in dimensions:
+            raise ValueError("同步的dimensions必须包含DATE，事实表按日期维护水位线")
+        today = today or date.today()
+        spec_id = self.make_spec_id(account, dimensions, metrics)
+
+        with self._lock:
+            spec = self._load_spec(spec_id)
+
+        if spec is None:
+            first_date = start or today - timedelta(days=self.backfill_days)
+            spans = [(first_date, today)]
+            headers, finalized = None, None
+        else:
+            first_date = date.fromisoformat(spec["first_date"])
+            finalized = date.fromisoformat(spec["finalized_through"])
+            headers = spec["headers"]
+            spans = []
+            if start and start < first_date:
+                spans.append((start, first_date - timedelta(days=1)))
+                first_date = start
+            spans.append((finalized + timedelta(days=1), today))
+        spans = [(span_start, span_end) for span_start, span_end in spans if span_start <= span_end]
+        if finalized is None and first_date > today:
+            raise ValueError(f"开始日期 {first_date} 晚于今天 {today}")
+
+        # 先完成所有API请求再写库，避免拉取失败时留下部分替换的数据
+        responses = [(span, fetch(span)) for span in spans]
+
+        rows_written = 0
+        with self._lock:
+            db = self._connect()
+            with db:
+                for (span_start, span_end), response in responses:
+                    # 单元格按规格首次同步时的列顺序存储，后续响应的列顺序可能不同
+                    response_names = [header.get("name") for header in response.get("headers") or []]
+                    headers = headers or response.get("headers")
+                    names = [header.get("name") for header in headers or []]
+                    order = [response_names.index(name) for name in names] if response_names else []
+                    date_index = names.index("DATE") if "DATE" in names else None
+                    dim_indexes = [i for i, header in enumerate(headers or [])
+                                   if header.get("type") == "DIMENSION" and i != date_index]
+                    first, last = span_start.isoformat(), span_end.isoformat()
+                    db.execute(
+                        "DELETE FROM earnings_facts WHERE spec_id = ? AND date BETWEEN ? AND ?",
+                        (spec_id, first, last)
+                    )
+                    records = []
+                    for row in response.get("rows", []):
+                        cells = row.get("cells", [])
+                        if len(cells) != len(response_names):
+                            continue
+                        cells = [cells[i] for i in order]
+                        day = cells[date_index].get("value")
+                        if not first <= day <= last:
+                            continue
+                        dim_key = json.dumps([cells[i].get("value") for i in dim_indexes],
+                                             ensure_ascii=False, separators=(",", ":"))
+                        records.append((spec_id, day, dim_key,
+                                        json.dumps(cells, ensure_ascii=False, separators=(",", ":"))))
+                    db.executemany(
+                        "INSERT OR REPLACE INTO earnings_facts (spec_id, date, dim_key, cells) VALUES (?, ?, ?, ?)",
+                        records
+                    )
+                    rows_written += len(records)
+
+                synced_through = max([today] + ([date.fromisoformat(spec["synced_through"])] if spec else []))
+                new_finalized = today - timedelta(days=self.restatement_days)
+                if finalized is not None:
+                    new_finalized = max(new_finalized, finalized)
+                new_finalized = max(new_finalized, first_date - timedelta(days=1))
+                db.execute(
+                    "INSERT OR REPLACE INTO sync_specs (spec_id, account, dimensions, metrics, headers, first_date, "
+                    "synced_through, finalized_through, last_sync_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (spec_id, account, json.dumps(spec["dimensions"] if spec else dimensions),
+                     json.dumps(spec["metrics"] if spec else metrics),
+                     json.dumps(headers) if headers else None, first_date.isoformat(),
+                     synced_through.isoformat(), new_finalized.isoformat(), time.time())
+                )
+            self._has_specs = True
+            self._stats["syncs"] += 1
+            self._stats["rows_written"] += rows_written
+            spec = self._load_spec(spec_id)
+
+        spec["fetched_ranges"] = [[span_start.isoformat(), span_end.isoformat()] for span_start, span_end in spans]
+        spec["rows_written"] = rows_written
+        return spec
+
+    def _load_spec(self, spec_id: str) -> Optional[Dict[str, Any]]:
+        """读取同步规格（调用方持有锁）"""
+        row = self._connect().execute(
+            "SELECT spec_id, account, dimensions, metrics, headers, first_date, synced_through, "
+            "finalized_through, last_sync_at FROM sync_specs WHERE spec_id = ?", (spec_id,)
+        ).fetchone()
+        return self._spec_from_row(row) if row else None
+
+    @staticmethod
+    def _spec_from_row(row: tuple) -> Dict[str, Any]:
+        spec_id, account, dimensions, metrics, headers, first_date, synced_through, finalized_through, last_sync_at = row
+        return {
+            "spec_id": spec_id,
+            "account": account,
+            "dimensions": json.loads(dimensions),
+            "metrics": json.loads(metrics),
+            "headers": json.loads(headers) if headers else None,
+            "first_date": first_date,
+            "synced_through": synced_through,
+            "finalized_through": finalized_through,
+            "last_sync_at": last_sync_at
+        }
+
+    def find_spec(self, account: str, dimensions: List[str], metrics: List[str],
+                  start: date, end: date, final_only: bool = False) -> Optional[Dict[str, Any]]:
+        """查找维度组合完全相同、指标包含所需指标且日期范围已同步的规格
+
+        final_only为True时只要求开始日期已最终确定（finalized_through >= start），
+        优先返回最终水位线最靠后的规格。
+        """
+        if final_only:
+            condition, bound, order = "finalized_through >= ?", start, "finalized_through DESC, last_sync_at DESC"
+        else:
+            condition, bound, order = "synced_through >= ?", end, "last_sync_at DESC"
+        with self._lock:
+            if not self._has_any_spec():
+                return None
+            rows = self._connect().execute(
+                "SELECT spec_id, account, dimensions, metrics, headers, first_date, synced_through, "
+                f"finalized_through, last_sync_at FROM sync_specs WHERE account = ? AND first_date <= ? "
+                f"AND {condition} ORDER BY {order}",
+                (account, start.isoformat(), bound.isoformat())
+            ).fetchall()
+        for row in rows:
+            spec = self._spec_from_row(row)
+            if (spec["headers"] and set(spec["dimensions"]) == set(dimensions)
+                    and set(metrics) <= set(spec["metrics"])):
+                return spec
+        return None
+
+    def query(self, account: str, dimensions: List[str], metrics: List[str], start: date, end: date,
+              order_by: Optional[List[str]] = None, limit: Optional[int] = None,
+              final_only: bool = False) -> Optional[Dict[str, Any]]:
+        """在本地回答报告查询，返回 reports.generate 结构的响应；日期范围未被覆盖时返回None
+
+        final_only为True时只返回 [start, min(end, finalized_through)] 的最终数据，
+        实际覆盖的结束日期记录在 syncSpec.local_through 中；未覆盖到end时不应用limit，
+        由调用方与之后日期的API数据归并后再截断。
+        """
+        spec = self.find_spec(account, dimensions, metrics, start, end, final_only)
+        if spec is None:
+            with self._lock:
+                self._stats["local_misses"] += 1
+            return None
+        through = min(end, date.fromisoformat(spec["finalized_through"])) if final_only else end
+
+        names = [header.get("name") for header in spec["headers"]]
+        indexes = [names.index(name) for name in dimensions + metrics]
+        headers = [spec["headers"][i] for i in indexes]
+
+        with self._lock:
+            cursor = self._connect().execute(
+                "SELECT cells FROM earnings_facts WHERE spec_id = ? AND date BETWEEN ? AND ? ORDER BY date, dim_key",
+                (spec["spec_id"], start.isoformat(), through.isoformat())
+            )
+            stored = cursor.fetchall()
+            self._stats["local_hits"] += 1
+
+        rows = []
+        for (cells,) in stored:
+            cells = json.loads(cells)
+            rows.append({"cells": [cells[i] for i in indexes]})
+        if order_by:
+            key, descending = make_sort_key(headers, order_by[0])
+            rows.sort(key=key, reverse=descending)
+        total_matched = len(rows)
+        if limit and through == end:
+            rows = rows[:limit]
+
+        sync_spec = {key: spec[key] for key in ("spec_id", "synced_through", "finalized_through", "last_sync_at")}
+        sync_spec["local_through"] = through.isoformat()
+        return {
+            "headers": headers,
+            "rows": rows,
+            "totalMatchedRows": str(total_matched),
+            "syncSpec": sync_spec
+        }
+
+    def status(self, account: Optional[str] = None) -> List[Dict[str, Any]]:
+        """列出同步规格及其水位线和行数"""
+        with self._lock:
+            if not self._has_any_spec():
+                return []
+            db = self._connect()
+            sql = ("SELECT spec_id, account, dimensions, metrics, headers, first_date, synced_through, "
+                   "finalized_through, last_sync_at FROM sync_specs")
+            rows = db.execute(sql + " WHERE account = ?", (account,)).fetchall() if account else db.execute(sql).fetchall()
+            specs = []
+            for row in rows:
+                spec = self._spec_from_row(row)
+                spec.pop("headers")
+                spec["row_count"] = db.execute(
+                    "SELECT COUNT(*) FROM earnings_facts WHERE spec_id = ?", (spec["spec_id"],)
+                ).fetchone()[0]
+                specs.append(spec)
+        return specs
+
+    def delete(self, spec_id: str, account: Optional[str] = None) -> bool:
+        """删除一个同步规格及其事实数据；指定account时只删除属于该账户的规格"""
+        with self._lock:
+            if not self._has_any_spec():
+                return False
+            db = self._connect()
+            if account is not None and db.execute(
+                    "SELECT 1 FROM sync_specs WHERE spec_id = ? AND account = ?", (spec_id, account)).fetchone() is None:
+                return False
+            with db:
+                db.execute("DELETE FROM earnings_facts WHERE spec_id = ?", (spec_id,))
+                deleted = db.execute("DELETE FROM sync_specs WHERE spec_id = ?", (spec_id,)).rowcount
+            self._has_specs = None
+        return bool(deleted)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回同步次数、写入行数和本地命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["db_path"] = self.db_path
+        stats["restatement_days"] = self.restatement_days
+        return stats
@@ -0,0 +1,68 @@
+"""
+多账户并发调用 - 在有界线程池中对多个账户执行同一工具并合并结果
+
+每个账户的调用互不影响：单个账户失败只记录在errors中，不会使整批调用失败。
+合并后的结果按账户的输入顺序排列，每条记录都带有account列。
+"""
+
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ALL_ACCOUNTS = "*"
+
+# 支持跨账户调用的列表操作：(工具名, action) -> 结果中的列表字段
+FAN_OUT_LIST_ACTIONS = {
+    ("manage_accounts", "list_alerts"): "alerts",
+    ("manage_ad_units", "list"): "ad_units",
+    ("manage_policy_issues", "list"): "policy_issues"
+}
+
+ACCOUNT_COLUMN = "account"
+
+
+def run_fan_out(executor: Executor, accounts: List[str],
+                func: Callable[[str], Any]) -> Tuple[List[Tuple[str, Any]], List[Dict[str, str]]]:
+    """并发执行 func(account)，返回 ([(账户, 结果)], [{"account", "error"}])，两者均保持账户顺序"""
+    futures = [(account, executor.submit(func, account)) for account in accounts]
+    results, errors = [], []
+    for account, future in futures:
+        try:
+            results.append((account, future.result()))
+        except Exception as e:
+            errors.append({"account": account, "error": str(e)})
+    return results, errors
+
+
+def add_account_column(account: str, response: Dict[str, Any],
+                       names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """在报告响应最前面加入account维度列；names指定时按该列顺序重排其余列"""
+    headers = response.get("headers") or []
+    rows = response.get("rows", [])
+    if names:
+        current = [header.get("name") for header in headers]
+        if current != names:
+            order = [current.index(name) for name in names]
+            headers = [headers[i] for i in order]
+            rows = [{"cells": [row.get("cells", [])[i] for i in order]} for row in rows]
+
+    account_cell = {"value": account}
+    return {
+        "headers": [{"name": ACCOUNT_COLUMN, "type": "DIMENSION"}] + list(headers),
+        "rows": [{"cells": [account_cell] + row.get("cells", [])} for row in rows],
+        "totalMatchedRows": response.get("totalMatchedRows", str(len(rows)))
+    }
+
+
+def merge_list_payloads(items_key: str, results: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """合并各账户列表操作的结果，每一项加入account字段"""
+    items = []
+    truncated = False
+    for account, payload in results:
+        for item in payload.get(items_key, []):
+            items.append({ACCOUNT_COLUMN: account, **item})
+        truncated = truncated or bool(payload.get("truncated"))
+    return {
+        items_key: items,
+        "total": len(items),
+        "truncated": truncated
+    }
@@ -0,0 +1,692 @@
+"""
+HTTP/SSE调度器 - `mcp-adsense-ultimate --http` 的长驻服务模式
+
+一个进程通过HTTP同时服务多个MCP客户端，所有会话共享同一个服务器实例
+（服务对象池、报告缓存、库存索引、账户元数据和本地同步数据），客户端不再各自启动冷进程。
+
+    Streamable HTTP   POST /mcp 发送JSON-RPC消息（可为数组），响应为 application/json；
+                      initialize 的响应头 Mcp-Session-Id 给出会话ID，之后的请求须携带该头；
+                      DELETE /mcp 结束会话；GET /mcp 返回405（服务器不主动推送消息）
+    HTTP+SSE          GET /sse 打开事件流，首个 endpoint 事件给出 /messages?session_id=... ，
+                      POST 到该地址的请求返回202，响应以 message 事件从事件流推送
+    GET /healthz      存活检查，只返回会话数和请求计数（不需要令牌，因此不包含会话详情和配置）
+
+账户范围：MCP_ADSENSE_HTTP_TOKENS（JSON对象：令牌 -> 账户列表，"*"表示不限账户）在服务器端把令牌绑定到账户，
+使用绑定了账户的令牌创建的会话只能访问这些账户，这是客户端无法绕过的隔离。
+创建会话时还可通过 X-AdSense-Account 请求头或 account 查询参数指定一个或多个账户（逗号分隔），
+在令牌允许的范围内进一步缩小会话的账户（超出范围时返回403），第一个账户作为该会话的默认账户；
+未传account_id的工具调用使用默认账户，
+指定其他账户（account_id、account_ids，或任何参数中形如 accounts/<账户ID> 的资源名）的调用被拒绝；
+跨会话的操作（get_server_stats、清空共享的报告缓存、列出凭据可访问的全部账户）只允许未限定账户的会话使用。
+令牌不限账户（MCP_ADSENSE_HTTP_TOKEN、"*"）或未启用令牌时，请求头指定的账户只是客户端自选的默认范围，
+客户端省略请求头即可得到未限定账户的会话（与stdio模式相同），不能用于隔离持有同一令牌的客户端。
+会话只能由创建它的令牌继续使用。
+
+文件参数：output_file 和 specs_file 读写的是服务器进程的文件系统。HTTP模式下只有设置了
+MCP_ADSENSE_HTTP_FILE_ROOT 时才接受，路径按该目录解析且不能超出该目录；未设置时带文件参数的调用被拒绝。
+
+tools/call 在有界线程池中执行（所有会话共享），notifications/cancelled 取消本会话排队中的请求。
+设置 MCP_ADSENSE_HTTP_TOKEN 或 MCP_ADSENSE_HTTP_TOKENS 后，所有请求须携带 Authorization: Bearer <token>。
+为防止DNS重绑定，带Origin头的请求只接受本机（localhost、127.0.0.1、::1）和
+MCP_ADSENSE_HTTP_ALLOWED_ORIGINS（逗号分隔的Origin或主机名）中的来源，其余返回403；
+不带Origin头的请求（非浏览器客户端）不受影响。
+会话空闲超过 MCP_ADSENSE_HTTP_SESSION_TTL 秒（默认3600）后过期。
+"""
+
+import json
+import os
+import queue
+import re
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .dispatcher import DEFAULT_MAX_QUEUE, DEFAULT_MAX_WORKERS, respond, serialize_response
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+SESSION_HEADER = "Mcp-Session-Id"
+ACCOUNT_HEADER = "X-AdSense-Account"
+# SSE事件流在没有消息时发送注释行保持连接的间隔（秒）
+_KEEPALIVE_SECONDS = 15.0
+# 请求体的最大长度
+_BODY_LIMIT = 16 * 1024 * 1024
+
+# 读写服务器文件系统的工具参数
+FILE_ARGUMENTS = ("output_file", "specs_file")
+# 只允许未限定账户的会话使用的工具：工具名 -> (受限的操作, 默认操作)，受限的操作为None表示整个工具
+UNSCOPED_ONLY = {
+    "get_server_stats": (None, None),
+    "manage_report_cache": (("clear",), "stats"),
+    "manage_accounts": (("list",), "list")
+}
+_ACCOUNT_IN_NAME = re.compile(r"accounts/([^/?#\s]+)")
+# 始终允许的Origin主机
+LOCAL_ORIGIN_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def _error_response(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def _normalize_account(account_id: str) -> str:
+    account_id = account_id.strip()
+    return account_id[len("accounts/"):] if account_id.startswith("accounts/") else account_id
+
+
+def _embedded_accounts(value: Any) -> List[str]:
+    """参数值（含嵌套的列表和对象）中以 accounts/<账户ID> 形式出现的账户"""
+    if isinstance(value, str):
+        return _ACCOUNT_IN_NAME.findall(value)
+    if isinstance(value, dict):
+        return [account for item in value.values() for account in _embedded_accounts(item)]
+    if isinstance(value, list):
+        return [account for item in value for account in _embedded_accounts(item)]
+    return []
+
+
+def confine_paths(arguments: Dict[str, Any], root: Optional[str]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """将文件参数限定在root目录内并替换为绝对路径；root为None时拒绝文件参数"""
+    names = [name for name in FILE_ARGUMENTS if arguments.get(name)]
+    if not names:
+        return arguments, None
+    if not root:
+        return arguments, f"HTTP模式下不接受 {', '.join(names)} 参数（设置MCP_ADSENSE_HTTP_FILE_ROOT后可在该目录内读写）"
+    arguments = dict(arguments)
+    root = os.path.realpath(root)
+    for name in names:
+        value = arguments[name]
+        if not isinstance(value, str):
+            return arguments, f"参数 {name} 应为string类型"
+        path = os.path.realpath(os.path.join(root, value.lstrip("/\\")))
+        if os.path.commonpath([root, path]) != root or path == root:
+            return arguments, f"参数 {name} 的路径超出了允许的目录: {value}"
+        arguments[name] = path
+    return arguments, None
+
+
+class Session:
+    """一个MCP客户端会话"""
+
+    def __init__(self, session_id: str, accounts: List[str], token: Optional[str] = None):
+        self.id = session_id
+        self.accounts = accounts
+        # 创建会话的令牌，之后的请求须使用同一令牌
+        self.token = token
+        self.created = self.last_seen = time.monotonic()
+        self.requests = 0
+        self.pending: Dict[Any, Future] = {}
+        # HTTP+SSE会话的事件队列；Streamable HTTP会话为None
+        self.events: Optional["queue.Queue[Optional[str]]"] = None
+        self.closed = False
+
+    def scope(self, name: str, arguments: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """将工具参数限定在会话的账户范围内，返回 (参数, 错误信息)"""
+        if not self.accounts:
+            return arguments, None
+        if name in UNSCOPED_ONLY:
+            actions, default_action = UNSCOPED_ONLY[name]
+            if actions is None or (arguments.get("action") or default_action) in actions:
+                return arguments, "限定账户的会话不能执行跨账户或跨会话的操作"
+        arguments = dict(arguments)
+        account_ids = arguments.get("account_ids")
+        requested = []
+        if arguments.get("account_id"):
+            requested.append(arguments["account_id"])
+        else:
+            arguments["account_id"] = self.accounts[0]
+        if isinstance(account_ids, list):
+            requested.extend(account_ids)
+        elif account_ids:
+            requested.append(account_ids)
+        # 资源名（例如已保存报告的完整name、批量规格中的name）中的账户
+        requested.extend(f"accounts/{account}" for account in _embedded_accounts(arguments))
+        outside = [account for account in requested
+                   if not isinstance(account, str) or _normalize_account(account) not in self.accounts]
+        if outside:
+            outside = list(dict.fromkeys(str(account) for account in outside))
+            return arguments, f"账户不在本会话的范围内: {', '.join(outside)}"
+        return arguments, None
+
+    def describe(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "accounts": self.accounts,
+            "transport": "sse" if self.events is not None else "streamable_http",
+            "requests": self.requests,
+            "pending": len(self.pending),
+            "age_seconds": round(now - self.created, 1),
+            "idle_seconds": round(now - self.last_seen, 1)
+        }
+
+
+class HTTPDispatcher:
+    """基于HTTP的MCP JSON-RPC调度器，多个会话共享同一个服务器实例"""
+
+    def __init__(self, server: Any, host: Optional[str] = None, port: Optional[int] = None,
+                 max_workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 token: Optional[str] = None, session_ttl: Optional[float] = None,
+                 file_root: Optional[str] = None, allowed_origins: Optional[List[str]] = None,
+                 tokens: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            server: MCPAdSenseEnhancedUltimateServer 实例
+            host: 监听地址，默认读取MCP_ADSENSE_HTTP_HOST（默认127.0.0.1）
+            port: 监听端口，默认读取MCP_ADSENSE_HTTP_PORT（默认8765），0表示任意空闲端口
+            max_workers: 并发执行tools/call的最大线程数（所有会话共享）
+            max_queue: 等待执行的最大请求数，超过后新的tools/call返回错误
+            token: 不限账户的访问令牌，默认读取MCP_ADSENSE_HTTP_TOKEN
+            session_ttl: 会话空闲过期秒数，默认读取MCP_ADSENSE_HTTP_SESSION_TTL（默认3600）
+            file_root: output_file/specs_file 允许读写的目录，默认读取MCP_ADSENSE_HTTP_FILE_ROOT，为空时拒绝文件参数
+            allowed_origins: 除本机外允许的Origin或主机名，默认读取MCP_ADSENSE_HTTP_ALLOWED_ORIGINS（逗号分隔）
+            tokens: 令牌 -> 绑定的账户列表（"*"表示不限账户），默认读取MCP_ADSENSE_HTTP_TOKENS（JSON对象）；
+                token和tokens都为空时不校验令牌
+        """
+        self.server = server
+        self.host = host or os.getenv("MCP_ADSENSE_HTTP_HOST", DEFAULT_HOST)
+        self.port = port if port is not None else int(os.getenv("MCP_ADSENSE_HTTP_PORT", DEFAULT_PORT))
+        self.max_workers = max_workers or int(os.getenv("MCP_ADSENSE_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        self.max_queue = max_queue or int(os.getenv("MCP_ADSENSE_MAX_QUEUE", DEFAULT_MAX_QUEUE))
+        self.token = token if token is not None else os.getenv("MCP_ADSENSE_HTTP_TOKEN") or None
+        if tokens is None:
+            tokens = json.loads(os.getenv("MCP_ADSENSE_HTTP_TOKENS") or "{}")
+            if not isinstance(tokens, dict):
+                raise ValueError("MCP_ADSENSE_HTTP_TOKENS 应为JSON对象：令牌 -> 账户列表或\"*\"")
+        # (令牌, 绑定的账户)，账户为None表示不限账户
+        self._credentials: List[Tuple[str, Optional[List[str]]]] = [(self.token, None)] if self.token else []
+        for bound_token, accounts in tokens.items():
+            if accounts == "*":
+                self._credentials.append((bound_token, None))
+            else:
+                accounts = [accounts] if isinstance(accounts, str) else accounts
+                self._credentials.append((bound_token, list(dict.fromkeys(_normalize_account(a) for a in accounts))))
+        self.session_ttl = session_ttl or float(os.getenv("MCP_ADSENSE_HTTP_SESSION_TTL", "3600"))
+        self.file_root = file_root or os.getenv("MCP_ADSENSE_HTTP_FILE_ROOT") or None
+        if allowed_origins is None:
+            allowed_origins = os.getenv("MCP_ADSENSE_HTTP_ALLOWED_ORIGINS", "").split(",")
+        self.allowed_origins = {origin.strip().rstrip("/").lower() for origin in allowed_origins if origin.strip()}
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="adsense-http")
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Session] = {}
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._stats = {
+            "sessions_created": 0,
+            "sessions_closed": 0,
+            "sessions_expired": 0,
+            "http_requests": 0,
+            "queue_depth": 0,
+            "peak_queue_depth": 0,
+            "in_flight": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "rejected": 0,
+            "unauthorized": 0,
+            "forbidden_origins": 0
+        }
+        server.dispatcher = self
+
+    # ---- 服务生命周期 ----
+
+    def start(self) -> Tuple[str, int]:
+        """绑定端口并在后台线程中开始服务，返回实际监听的 (地址, 端口)"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="adsense-http-server", daemon=True).start()
+        self.host, self.port = self._httpd.server_address[:2]
+        return self.host, self.port
+
+    def serve(self, input_stream: Any = None) -> None:
+        """启动HTTP服务并阻塞直到中断（input_stream 仅为与stdio调度器接口一致，不使用）"""
+        host, port = self.start()
+        print(f"🌐 MCP HTTP服务: http://{host}:{port}/mcp （SSE: http://{host}:{port}/sse）", file=sys.stderr)
+        try:
+            while True:
+                time.sleep(60)
+                self.expire_sessions()
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        """停止接受连接，结束所有会话并等待进行中的请求完成"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            self._close(session)
+        self._executor.shutdown(wait=True)
+
+    # ---- 会话 ----
+
+    def create_session(self, accounts: List[str], sse: bool = False, token: Optional[str] = None,
+                       bound: Optional[List[str]] = None) -> Session:
+        """创建会话；bound为令牌绑定的账户，请求的账户超出bound时抛出PermissionError，未请求账户时使用bound"""
+        accounts = list(dict.fromkeys(_normalize_account(account) for account in accounts if account.strip()))
+        if bound is not None:
+            outside = [account for account in accounts if account not in bound]
+            if outside:
+                raise PermissionError(f"令牌无权访问这些账户: {', '.join(outside)}")
+            accounts = accounts or list(bound)
+        session = Session(secrets.token_urlsafe(24), accounts, token)
+        if sse:
+            session.events = queue.Queue()
+        with self._lock:
+            self._sessions[session.id] = session
+            self._stats["sessions_created"] += 1
+        return session
+
+    def get_session(self, session_id: Optional[str], token: Optional[str] = None) -> Optional[Session]:
+        """按ID获取会话；会话不是由token创建时按不存在处理"""
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is not None and session.token != token:
+                session = None
+            if session is not None:
+                session.last_seen = time.monotonic()
+        return session
+
+    def close_session(self, session_id: str, token: Optional[str] = None) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session.token != token:
+                session = None
+            if session is not None:
+                del self._sessions[session_id]
+                self._stats["sessions_closed"] += 1
+        if session is None:
+            return False
+        self._close(session)
+        return True
+
+    def _close(self, session: Session) -> None:
+        session.closed = True
+        for future in list(session.pending.values()):
+            future.cancel()
+        if session.events is not None:
+            session.events.put(None)
+
+    def expire_sessions(self) -> int:
+        """移除空闲超时且没有进行中请求的会话"""
+        deadline = time.monotonic() - self.session_ttl
+        with self._lock:
+            expired = [session for session in self._sessions.values()
+                       if session.last_seen < deadline and not session.pending]
+            for session in expired:
+                del self._sessions[session.id]
+            self._stats["sessions_expired"] += len(expired)
+        for session in expired:
+            self._close(session)
+        return len(expired)
+
+    # ---- 消息处理 ----
+
+    def handle_message(self, session: Session, request: Dict[str, Any]) -> Optional[Future]:
+        """处理一条JSON-RPC消息，返回响应文本的Future；通知和取消返回None"""
+        method = request.get("method")
+        params = request.get("params") or {}
+        session.requests += 1
+
+        if method == "notifications/cancelled":
+            self.cancel(session, params.get("requestId"))
+            return None
+        if "id" not in request:
+            return None
+
+        if method != "tools/call":
+            future: Future = Future()
+            future.set_result(respond(self.server, request, method))
+            if method == "initialize" and session.accounts and os.getenv("MCP_ADSENSE_PREWARM", "1") != "0":
+                self.server.account_metadata.warm_up(session.accounts, self.server.fan_out_executor)
+            return future
+        return self._submit(session, request)
+
+    def _submit(self, session: Session, request: Dict[str, Any]) -> Future:
+        """将 tools/call 提交到共享线程池；排队已满时直接返回错误响应"""
+        request_id = request.get("id")
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            future: Future = Future()
+            future.set_result(self.server.serializer.dumps_message(
+                _error_response(request_id, -32000, "服务器繁忙，请稍后重试")
+            ))
+            return future
+        with self._lock:
+            self._stats["queue_depth"] += 1
+            self._stats["peak_queue_depth"] = max(self._stats["peak_queue_depth"], self._stats["queue_depth"])
+            future = self._executor.submit(self._run, session, request)
+            session.pending[request_id] = future
+        future.add_done_callback(lambda f: self._finish(session, request_id, f))
+        return future
+
+    def _run(self, session: Session, request: Dict[str, Any]) -> str:
+        """在工作线程中执行会话范围内的 tools/call 并序列化响应"""
+        with self._lock:
+            self._stats["queue_depth"] -= 1
+            self._stats["in_flight"] += 1
+        params = dict(request.get("params") or {})
+        try:
+            arguments, error = session.scope(params.get("name"), params.get("arguments") or {})
+            if error is None:
+                arguments, error = confine_paths(arguments, self.file_root)
+            if error is None:
+                params["arguments"] = arguments
+                return respond(self.server, dict(request, params=params), params.get("name"))
+            response = {"jsonrpc": "2.0", "id": request.get("id"),
+                        "result": self.server._text_result({"success": False, "error": error})}
+            return serialize_response(self.server, response, params.get("name"))
+        finally:
+            with self._lock:
+                self._stats["in_flight"] -= 1
+
+    def _finish(self, session: Session, request_id: Any, future: Future) -> None:
+        with self._lock:
+            if session.pending.get(request_id) is future:
+                del session.pending[request_id]
+            if future.cancelled():
+                self._stats["queue_depth"] -= 1
+                self._stats["cancelled"] += 1
+            else:
+                self._stats["completed"] += 1
+        self._slots.release()
+
+    def cancel(self, session: Session, request_id: Any) -> bool:
+        """取消本会话排队中的请求（执行中的请求不能中断）"""
+        future = session.pending.get(request_id)
+        return future.cancel() if future is not None else False
+
+    def origin_allowed(self, origin: Optional[str]) -> bool:
+        """Origin头是否可接受：没有Origin头，或来自本机及allowed_origins中的来源"""
+        if origin is None:
+            return True
+        origin = origin.strip().rstrip("/").lower()
+        try:
+            host = urlsplit(origin).hostname
+        except ValueError:
+            host = None
+        ok = host in LOCAL_ORIGIN_HOSTS or origin in self.allowed_origins or (
+            host is not None and host in self.allowed_origins)
+        if not ok:
+            with self._lock:
+                self._stats["forbidden_origins"] += 1
+        return ok
+
+    def authenticate(self, header: Optional[str]) -> Optional[Tuple[Optional[str], Optional[List[str]]]]:
+        """校验Authorization头，返回 (令牌, 绑定的账户)；未启用令牌时返回 (None, None)，未授权时返回None"""
+        if not self._credentials:
+            return None, None
+        presented = header[len("Bearer "):] if header and header.startswith("Bearer ") else None
+        if presented is not None:
+            for token, accounts in self._credentials:
+                if secrets.compare_digest(presented.encode("utf-8"), token.encode("utf-8")):
+                    return token, accounts
+        with self._lock:
+            self._stats["unauthorized"] += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """返回会话数、队列深度、执行中请求数等指标"""
+        with self._lock:
+            stats = dict(self._stats)
+            sessions = list(self._sessions.values())
+        stats.update({
+            "mode": "http",
+            "address": f"{self.host}:{self.port}",
+            "active_sessions": len(sessions),
+            "sse_sessions": sum(1 for session in sessions if session.events is not None),
+            "scoped_sessions": sum(1 for session in sessions if session.accounts),
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "session_ttl": self.session_ttl,
+            "auth": bool(self._credentials),
+            "scoped_tokens": sum(1 for _, accounts in self._credentials if accounts is not None),
+            "file_root": self.file_root,
+            "allowed_origins": sorted(self.allowed_origins),
+            "sessions": [session.describe() for session in sessions]
+        })
+        return stats
+
+    def health(self) -> Dict[str, Any]:
+        """存活检查：只包含计数，不包含会话的账户、地址和文件目录"""
+        with self._lock:
+            return {
+                "status": "ok",
+                "active_sessions": len(self._sessions),
+                "in_flight": self._stats["in_flight"],
+                "queue_depth": self._stats["queue_depth"],
+                "completed": self._stats["completed"]
+            }
+
+    def _handler_class(self) -> type:
+        dispatcher = self
+
+        class Handler(_MCPRequestHandler):
+            pass
+        Handler.dispatcher = dispatcher
+        return Handler
+
+
+class _MCPRequestHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理：/mcp（Streamable HTTP）、/sse 与 /messages（HTTP+SSE）、/healthz"""
+
+    dispatcher: HTTPDispatcher
+    protocol_version = "HTTP/1.1"
+    server_version = "mcp-adsense-ultimate"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # stdout/stderr保持安静，请求统计见 get_server_stats
+        pass
+
+    # ---- 路由 ----
+
+    def do_POST(self) -> None:
+        path, query = self._route()
+        if path is None:
+            return
+        if path == "/mcp":
+            self._post_streamable()
+        elif path == "/messages":
+            self._post_sse_message(query)
+        else:
+            self._send_json(404, {"error": f"Not found: {path}"})
+
+    def do_GET(self) -> None:
+        path, query = self._route()
+        if path is None:
+            return
+        if path == "/sse":
+            self._open_sse(query)
+        elif path == "/healthz":
+            self._send_json(200, self.dispatcher.health())
+        elif path == "/mcp":
+            self._send_json(405, {"error": "服务器不主动推送消息，请使用POST"}, {"Allow": "POST, DELETE"})
+        else:
+            self._send_json(404, {"error": f"Not found: {path}"})
+
+    def do_DELETE(self) -> None:
+        path, _ = self._route()
+        if path is None:
+            return
+        if path != "/mcp":
+            self._send_json(404, {"error": f"Not found: {path}"})
+            return
+        session_id = self.headers.get(SESSION_HEADER)
+        if not session_id:
+            self._send_json(400, {"error": f"缺少 {SESSION_HEADER} 头"})
+        elif self.dispatcher.close_session(session_id, self.token):
+            self._send_empty(204)
+        else:
+            self._send_json(404, {"error": "会话不存在或已过期"})
+
+    def _route(self) -> Tuple[Optional[str], Dict[str, List[str]]]:
+        """解析路径并校验Origin和令牌；拒绝时已发送403/401，返回 (None, {})"""
+        with self.dispatcher._lock:
+            self.dispatcher._stats["http_requests"] += 1
+        url = urlsplit(self.path)
+        if not self.dispatcher.origin_allowed(self.headers.get("Origin")):
+            self._send_json(403, {"error": f"不允许的Origin: {self.headers.get('Origin')}"})
+            return None, {}
+        self.token, self.bound_accounts = None, None
+        if url.path != "/healthz":
+            principal = self.dispatcher.authenticate(self.headers.get("Authorization"))
+            if principal is None:
+                self._send_json(401, {"error": "未授权"}, {"WWW-Authenticate": "Bearer"})
+                return None, {}
+            self.token, self.bound_accounts = principal
+        return url.path.rstrip("/") or "/", parse_qs(url.query)
+
+    def _requested_accounts(self, query: Dict[str, List[str]]) -> List[str]:
+        values = [self.headers.get(ACCOUNT_HEADER) or ""] + query.get("account", [])
+        return [account for value in values for account in value.split(",") if account.strip()]
+
+    def _create_session(self, query: Dict[str, List[str]], sse: bool = False) -> Optional[Session]:
+        """按请求的账户和令牌绑定的账户创建会话；超出令牌范围时已发送403，返回None"""
+        try:
+            return self.dispatcher.create_session(self._requested_accounts(query), sse, self.token, self.bound_accounts)
+        except PermissionError as e:
+            self._send_json(403, {"error": str(e)})
+            return None
+
+    # ---- Streamable HTTP ----
+
+    def _post_streamable(self) -> None:
+        messages, batch = self._read_messages()
+        if messages is None:
+            return
+        session_id = self.headers.get(SESSION_HEADER)
+        headers = {}
+        if any(message.get("method") == "initialize" for message in messages):
+            if session_id:
+                session = self.dispatcher.get_session(session_id, self.token)
+            else:
+                session = self._create_session(parse_qs(urlsplit(self.path).query))
+                if session is None:
+                    return
+                headers[SESSION_HEADER] = session.id
+        elif not session_id:
+            self._send_json(400, {"error": f"缺少 {SESSION_HEADER} 头，请先发送initialize"})
+            return
+        else:
+            session = self.dispatcher.get_session(session_id, self.token)
+        if session is None:
+            self._send_json(404, {"error": "会话不存在或已过期，请重新initialize"})
+            return
+
+        futures = [self.dispatcher.handle_message(session, message) for message in messages]
+        responses = []
+        for message, future in zip(messages, futures):
+            if future is None:
+                continue
+            try:
+                responses.append(future.result())
+            except Exception:  # 已取消
+                responses.append(self.dispatcher.server.serializer.dumps_message(
+                    _error_response(message.get("id"), -32800, "请求已取消")
+                ))
+        if not responses:
+            self._send_empty(202, headers)
+        elif batch:
+            self._send_body(200, "[" + ",".join(responses) + "]", headers)
+        else:
+            self._send_body(200, responses[0], headers)
+
+    # ---- HTTP+SSE ----
+
+    def _open_sse(self, query: Dict[str, List[str]]) -> None:
+        session = self._create_session(query, sse=True)
+        if session is None:
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            self._write_event("endpoint", f"/messages?session_id={session.id}")
+            while not session.closed:
+                try:
+                    data = session.events.get(timeout=_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # 事件流仍连接着，会话不算空闲
+                    session.last_seen = time.monotonic()
+                    self.wfile.write(b": ping\n\n")
+                    self.wfile.flush()
+                    continue
+                if data is None:
+                    break
+                self._write_event("message", data)
+        except OSError:  # 客户端断开
+            pass
+        finally:
+            self.dispatcher.close_session(session.id, session.token)
+
+    def _write_event(self, event: str, data: str) -> None:
+        self.wfile.write(f"event: {event}\ndata: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _post_sse_message(self, query: Dict[str, List[str]]) -> None:
+        session = self.dispatcher.get_session((query.get("session_id") or [None])[0], self.token)
+        if session is None or session.events is None:
+            self._send_json(404, {"error": "会话不存在或已过期"})
+            return
+        messages, _ = self._read_messages()
+        if messages is None:
+            return
+        for message in messages:
+            future = self.dispatcher.handle_message(session, message)
+            if future is not None:
+                future.add_done_callback(lambda f: None if f.cancelled() else session.events.put(f.result()))
+        self._send_empty(202)
+
+    # ---- 读写 ----
+
+    def _read_messages(self) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+        """读取请求体中的JSON-RPC消息（单条或数组）；格式错误时已发送错误响应，返回 (None, False)"""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > _BODY_LIMIT:
+            self._send_json(413, {"error": "请求体过大"})
+            return None, False
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            payload = None
+        if isinstance(payload, list):
+            if payload and all(isinstance(message, dict) for message in payload):
+                return payload, True
+        elif isinstance(payload, dict):
+            return [payload], False
+        self._send_json(400, _error_response(None, -32700, "Parse error"))
+        return None, False
+
+    def _send_body(self, status: int, body: str, headers: Optional[Dict[str, str]] = None,
+                   content_type: str = "application/json") -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_body(status, json.dumps(payload, ensure_ascii=False), headers)
+
+    def _send_empty(self, status: int, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
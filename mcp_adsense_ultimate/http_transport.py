@@ -0,0 +1,199 @@
+"""
+HTTP传输层 - AdSense服务对象使用的HTTP客户端
+
+    requests   所有线程共享一个带连接池的 AuthorizedSession（urllib3连接池线程安全），
+               连接保持keep-alive并在线程间复用，服务对象因此也只需构建一份
+    httplib2   google-api-python-client 默认的 AuthorizedHttp，httplib2.Http 不是线程安全的，
+               每个线程各构建一份服务对象和连接
+
+默认（auto）在安装了requests时使用requests，否则使用httplib2。
+requests传输通过 httplib2.Http 兼容的 request() 接口接入 googleapiclient，
+网络错误转换为内置的 ConnectionError/TimeoutError（OSError），由CallGuard按网络错误重试。
+requests、httplib2和google-auth在首次构建HTTP客户端时才导入。
+"""
+
+import importlib.util
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+TRANSPORTS = ("auto", "requests", "httplib2")
+
+
+class PooledHttp:
+    """httplib2.Http 兼容的适配器，请求经由共享的 AuthorizedSession 连接池发送"""
+
+    def __init__(self, credentials: Any, pool_size: int, timeout: Tuple[float, float],
+                 on_request: Optional[Any] = None):
+        from google.auth.transport.requests import AuthorizedSession
+        from requests.adapters import HTTPAdapter
+
+        # BatchHttpRequest 通过 http.credentials 刷新令牌并为子请求添加认证头
+        self.credentials = credentials
+        self.timeout = timeout
+        self._on_request = on_request
+        self.session = AuthorizedSession(credentials)
+        # 重试由CallGuard负责，连接池不重试；连接数超过上限时等待空闲连接而不是新建
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0, pool_block=True)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def request(self, uri: str, method: str = "GET", body: Any = None, headers: Optional[Dict[str, str]] = None,
+                redirections: int = 5, connection_type: Any = None) -> Tuple[Any, bytes]:
+        import httplib2
+        import requests
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, uri, data=body, headers=headers, timeout=self.timeout, allow_redirects=redirections > 0
+            )
+        except requests.exceptions.Timeout as e:
+            self._record(start, failed=True)
+            raise TimeoutError(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            self._record(start, failed=True)
+            raise ConnectionError(str(e)) from e
+        self._record(start)
+
+        # requests已解压响应体，去掉编码相关的头以免与内容不符
+        info = {key: value for key, value in response.headers.items()
+                if key.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+        info["status"] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, response.content
+
+    def stream(self, uri: str, method: str = "GET", body: Any = None, headers: Optional[Dict[str, str]] = None,
+               chunk_size: int = 64 * 1024) -> Tuple[Any, Iterator[bytes]]:
+        """发送请求但不读取响应体，返回 (httplib2.Response, 响应体分块迭代器)
+
+        迭代器读完或被关闭时连接归还连接池；读取过程中的网络错误同样转换为ConnectionError/TimeoutError。
+        """
+        import httplib2
+        import requests
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout, stream=True)
+        except requests.exceptions.Timeout as e:
+            self._record(start, failed=True)
+            raise TimeoutError(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            self._record(start, failed=True)
+            raise ConnectionError(str(e)) from e
+        self._record(start)
+
+        info = {key: value for key, value in response.headers.items()
+                if key.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+        info["status"] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+
+        def chunks() -> Iterator[bytes]:
+            try:
+                yield from response.iter_content(chunk_size)
+            except requests.exceptions.Timeout as e:
+                raise TimeoutError(str(e)) from e
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                raise ConnectionError(str(e)) from e
+            finally:
+                response.close()
+        return resp, chunks()
+
+    def _record(self, start: float, failed: bool = False) -> None:
+        if self._on_request is not None:
+            self._on_request(time.perf_counter() - start, failed)
+
+    def connection_stats(self) -> Dict[str, int]:
+        """urllib3连接池统计：新建连接数和经由连接池发送的请求数"""
+        pools = self.adapter.poolmanager.pools
+        connections = requests_sent = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+        return {"connections_opened": connections, "pool_requests": requests_sent}
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class HttpTransport:
+    """按配置构建服务对象使用的HTTP客户端，并汇总请求和连接复用统计"""
+
+    def __init__(self, kind: Optional[str] = None, pool_size: Optional[int] = None,
+                 timeout: Optional[float] = None, connect_timeout: Optional[float] = None):
+        """
+        Args:
+            kind: auto | requests | httplib2，默认读取MCP_ADSENSE_HTTP_TRANSPORT（默认auto）
+            pool_size: requests传输每个主机的最大连接数，默认读取MCP_ADSENSE_HTTP_POOL_SIZE（默认16）
+            timeout: 读取超时秒数，默认读取MCP_ADSENSE_HTTP_TIMEOUT（默认60）
+            connect_timeout: 建立连接的超时秒数，默认读取MCP_ADSENSE_HTTP_CONNECT_TIMEOUT（默认10）
+        """
+        kind = kind or os.getenv("MCP_ADSENSE_HTTP_TRANSPORT", "auto")
+        if kind not in TRANSPORTS:
+            raise ValueError(f"不支持的HTTP传输: {kind}，可选: {', '.join(TRANSPORTS)}")
+        has_requests = importlib.util.find_spec("requests") is not None
+        if kind == "auto":
+            kind = "requests" if has_requests else "httplib2"
+        elif kind == "requests" and not has_requests:
+            raise ValueError("HTTP传输requests需要安装requests（pip install requests）")
+        self.kind = kind
+        self.pool_size = pool_size or int(os.getenv("MCP_ADSENSE_HTTP_POOL_SIZE", "16"))
+        self.timeout = timeout or float(os.getenv("MCP_ADSENSE_HTTP_TIMEOUT", "60"))
+        self.connect_timeout = connect_timeout or float(os.getenv("MCP_ADSENSE_HTTP_CONNECT_TIMEOUT", "10"))
+        self._lock = threading.Lock()
+        self._clients: "weakref.WeakSet[PooledHttp]" = weakref.WeakSet()
+        self._stats = {"clients_built": 0, "requests": 0, "failures": 0, "total_ms": 0.0}
+
+    @property
+    def thread_safe(self) -> bool:
+        """构建的HTTP客户端能否在线程间共享（决定服务对象是否按线程构建）"""
+        return self.kind == "requests"
+
+    def build(self, credentials: Any) -> Any:
+        """为凭据构建HTTP客户端"""
+        with self._lock:
+            self._stats["clients_built"] += 1
+        if self.kind == "requests":
+            client = PooledHttp(credentials, self.pool_size, (self.connect_timeout, self.timeout), self._record)
+            with self._lock:
+                self._clients.add(client)
+            return client
+
+        import google_auth_httplib2
+        import httplib2
+        return google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=self.timeout))
+
+    def _record(self, seconds: float, failed: bool) -> None:
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["total_ms"] += seconds * 1000
+            if failed:
+                self._stats["failures"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回传输类型、配置和请求统计；requests传输另含连接复用统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            clients = list(self._clients)
+        stats["total_ms"] = round(stats["total_ms"], 1)
+        stats["avg_ms"] = round(stats["total_ms"] / stats["requests"], 2) if stats["requests"] else None
+        stats.update({
+            "transport": self.kind,
+            "pool_size": self.pool_size,
+            "timeout": self.timeout,
+            "connect_timeout": self.connect_timeout
+        })
+        if self.kind == "requests":
+            connections = [client.connection_stats() for client in clients]
+            opened = sum(item["connections_opened"] for item in connections)
+            sent = sum(item["pool_requests"] for item in connections)
+            stats["connections_opened"] = opened
+            stats["connections_reused"] = max(0, sent - opened)
+            stats["reuse_ratio"] = round((sent - opened) / sent, 3) if sent else None
+        return stats
@@ -0,0 +1,294 @@
+"""
+库存索引 - 广告单元、自定义渠道、URL渠道和网站的本地快照及内存检索
+
+每个账户的每类资源一份快照，由完整的分页列表构建，并建立以下索引：
+    名称     小写名称的有序列表（前缀检索用二分查找），子串检索顺序扫描预先转小写的名称
+    状态     state -> 记录
+    报告维度  reportingDimensionId -> 记录
+URI模式按通配符（fnmatch）匹配uriPattern或网站域名。
+
+快照在以下时机刷新：首次检索时同步加载；超过刷新间隔后先返回旧快照并在后台刷新；
+后台定时线程刷新已加载的快照；写操作（create/patch/delete）后立即更新对应记录并在后台重新列出。
+"""
+
+import bisect
+import fnmatch
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+KINDS = ("ad_units", "custom_channels", "url_channels", "sites")
+MATCH_MODES = ("substring", "prefix", "exact")
+DEFAULT_LIMIT = 50
+
+# 各类资源在结果中的ID字段
+_ID_FIELDS = {
+    "ad_units": "adUnitId",
+    "custom_channels": "customChannelId",
+    "url_channels": "urlChannelId",
+    "sites": "domain"
+}
+
+
+def _label(item: Dict[str, Any]) -> str:
+    """用于名称检索的文本：displayName，网站和URL渠道没有displayName时使用域名或URI模式"""
+    return item.get("displayName") or item.get("domain") or item.get("uriPattern") or item.get("name", "").split("/")[-1]
+
+
+def _make_record(kind: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """由API资源构造索引记录"""
+    name = item.get("name", "")
+    parts = name.split("/")
+    record = {
+        "kind": kind,
+        "name": name,
+        "id": item.get(_ID_FIELDS[kind]) or parts[-1],
+        "label": _label(item),
+        "state": item.get("state"),
+        "reportingDimensionId": item.get("reportingDimensionId")
+    }
+    if "adclients" in parts:
+        record["adClient"] = parts[parts.index("adclients") + 1]
+    for field in ("displayName", "uriPattern", "domain", "contentAdsSettings"):
+        if item.get(field) is not None:
+            record[field] = item[field]
+    return record
+
+
+class _Snapshot:
+    """一个账户一类资源的快照及其索引"""
+
+    def __init__(self, records: List[Dict[str, Any]], loaded_at: Optional[float] = None):
+        self.loaded_at = loaded_at or time.time()
+        self.records = records
+        self.refreshing = False
+        self._build()
+
+    def _build(self) -> None:
+        self.lower_labels = [record["label"].lower() for record in self.records]
+        self.sorted_labels: List[Tuple[str, int]] = sorted(
+            (label, index) for index, label in enumerate(self.lower_labels)
+        )
+        self.by_state: Dict[str, List[int]] = {}
+        self.by_dimension: Dict[str, int] = {}
+        for index, record in enumerate(self.records):
+            if record["state"]:
+                self.by_state.setdefault(record["state"], []).append(index)
+            if record["reportingDimensionId"]:
+                self.by_dimension[record["reportingDimensionId"]] = index
+
+    def candidates(self, query: Optional[str], match: str, state: Optional[str],
+                   reporting_dimension_id: Optional[str]) -> Iterable[int]:
+        """按最具选择性的索引给出候选记录序号（升序）"""
+        if reporting_dimension_id:
+            index = self.by_dimension.get(reporting_dimension_id)
+            return [] if index is None else [index]
+        if query and match in ("prefix", "exact"):
+            query = query.lower()
+            start = bisect.bisect_left(self.sorted_labels, (query, -1))
+            indexes = []
+            for label, index in self.sorted_labels[start:]:
+                if not label.startswith(query):
+                    break
+                if match == "prefix" or label == query:
+                    indexes.append(index)
+            return sorted(indexes)
+        if state:
+            return self.by_state.get(state, [])
+        return range(len(self.records))
+
+
+class InventoryIndex:
+    """按账户维护的库存快照"""
+
+    def __init__(self, loader: Callable[[str, str], List[Dict[str, Any]]], executor: Executor,
+                 refresh_interval: Optional[int] = None):
+        """
+        Args:
+            loader: loader(账户ID, 资源类型) 返回该类资源的完整列表（API资源对象）
+            executor: 执行后台刷新的线程池
+            refresh_interval: 快照刷新间隔秒数，默认读取MCP_ADSENSE_INVENTORY_REFRESH_INTERVAL（默认900），
+                0表示只在写操作后和显式refresh时刷新
+        """
+        self.loader = loader
+        self.executor = executor
+        self.refresh_interval = refresh_interval if refresh_interval is not None else int(
+            os.getenv("MCP_ADSENSE_INVENTORY_REFRESH_INTERVAL", "900"))
+        self._lock = threading.Lock()
+        self._snapshots: Dict[Tuple[str, str], _Snapshot] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._scheduler: Optional[threading.Thread] = None
+        self._stats = {"searches": 0, "loads": 0, "background_refreshes": 0, "refresh_failures": 0, "writes": 0}
+
+    def _stale(self, snapshot: _Snapshot) -> bool:
+        return self.refresh_interval > 0 and time.time() - snapshot.loaded_at >= self.refresh_interval
+
+    def _load(self, key: Tuple[str, str]) -> _Snapshot:
+        """列出资源并替换快照，同一键的并发加载只执行一次"""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            records = [_make_record(key[1], item) for item in self.loader(*key)]
+            snapshot = _Snapshot(records)
+            with self._lock:
+                self._snapshots[key] = snapshot
+                self._stats["loads"] += 1
+        self._start_scheduler()
+        return snapshot
+
+    def _refresh_in_background(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                if snapshot.refreshing:
+                    return
+                snapshot.refreshing = True
+            self._stats["background_refreshes"] += 1
+
+        def refresh():
+            try:
+                self._load(key)
+            except Exception as e:
+                with self._lock:
+                    self._stats["refresh_failures"] += 1
+                    if snapshot is not None:
+                        snapshot.refreshing = False
+                print(f"⚠️ 刷新库存索引 {key[0]}/{key[1]} 失败: {str(e)}", file=sys.stderr)
+
+        self.executor.submit(refresh)
+
+    def _snapshot(self, account: str, kind: str, refresh: bool = False) -> _Snapshot:
+        key = (account, kind)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot is None or refresh:
+            return self._load(key)
+        if self._stale(snapshot):
+            # 先返回旧快照，后台刷新
+            self._refresh_in_background(key)
+        return snapshot
+
+    def _start_scheduler(self) -> None:
+        """启动定时刷新线程（只启动一次）"""
+        if self.refresh_interval <= 0:
+            return
+        with self._lock:
+            if self._scheduler is not None:
+                return
+            self._scheduler = threading.Thread(target=self._run_scheduler, name="adsense-inventory", daemon=True)
+        self._scheduler.start()
+
+    def _run_scheduler(self) -> None:
+        while True:
+            time.sleep(max(1, self.refresh_interval / 4))
+            with self._lock:
+                stale = [key for key, snapshot in self._snapshots.items()
+                         if self._stale(snapshot) and not snapshot.refreshing]
+            for key in stale:
+                self._refresh_in_background(key)
+
+    def search(self, account: str, query: Optional[str] = None, match: str = "substring",
+               kinds: Optional[List[str]] = None, state: Optional[str] = None,
+               reporting_dimension_id: Optional[str] = None, uri_pattern: Optional[str] = None,
+               limit: Optional[int] = None, refresh: bool = False) -> Dict[str, Any]:
+        """检索库存，条件之间为“与”关系
+
+        Args:
+            query: 名称（displayName，网站为域名，URL渠道为URI模式）检索文本，不区分大小写
+            match: substring | prefix | exact
+            kinds: 资源类型，默认全部
+            state: 资源状态（例如 ACTIVE、ARCHIVED、READY）
+            reporting_dimension_id: 报告维度ID（精确匹配）
+            uri_pattern: 通配符模式，匹配URL渠道/网站的uriPattern或域名，例如 *example.com*
+            limit: 最多返回的记录数
+            refresh: 检索前同步重新列出
+
+        Returns:
+            {"items", "total", "truncated", "took_ms", "snapshots"}，snapshots为各类快照的记录数和年龄
+        """
+        if match not in MATCH_MODES:
+            raise ValueError(f"不支持的匹配方式: {match}，可选: {', '.join(MATCH_MODES)}")
+        kinds = kinds or list(KINDS)
+        unknown = [kind for kind in kinds if kind not in KINDS]
+        if unknown:
+            raise ValueError(f"不支持的资源类型: {', '.join(unknown)}，可选: {', '.join(KINDS)}")
+        limit = limit or DEFAULT_LIMIT
+        snapshots = {kind: self._snapshot(account, kind, refresh) for kind in kinds}
+
+        start = time.perf_counter()
+        lowered = query.lower() if query else None
+        uri_pattern = uri_pattern.lower() if uri_pattern else None
+        items, total = [], 0
+        for kind, snapshot in snapshots.items():
+            for index in snapshot.candidates(query, match, state, reporting_dimension_id):
+                record = snapshot.records[index]
+                if lowered and match == "substring" and lowered not in snapshot.lower_labels[index]:
+                    continue
+                if state and record["state"] != state:
+                    continue
+                if reporting_dimension_id and record["reportingDimensionId"] != reporting_dimension_id:
+                    continue
+                if uri_pattern and not any(
+                        fnmatch.fnmatchcase(value.lower(), uri_pattern)
+                        for value in (record.get("uriPattern"), record.get("domain")) if value):
+                    continue
+                total += 1
+                if len(items) < limit:
+                    items.append({key: value for key, value in record.items() if key != "label"})
+        took_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats["searches"] += 1
+        now = time.time()
+        return {
+            "items": items,
+            "total": total,
+            "truncated": total > len(items),
+            "took_ms": round(took_ms, 3),
+            "snapshots": {
+                kind: {"records": len(snapshot.records), "age_s": round(now - snapshot.loaded_at, 1)}
+                for kind, snapshot in snapshots.items()
+            }
+        }
+
+    def notify_write(self, account: str, kind: str, item: Optional[Dict[str, Any]] = None,
+                     removed_name: Optional[str] = None) -> None:
+        """写操作后更新索引：立即写入/移除对应记录，并在后台重新列出该类资源
+
+        未加载过快照的账户和资源类型不做处理，下次检索时自然会完整加载。
+        """
+        key = (account, kind)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None:
+                return
+            self._stats["writes"] += 1
+            if (item is not None and item.get("name")) or removed_name:
+                # 快照不可变，检索中的线程继续使用旧快照
+                replaced = {removed_name, item.get("name") if item else None}
+                records = [record for record in snapshot.records if record["name"] not in replaced]
+                if item is not None and item.get("name"):
+                    records.append(_make_record(kind, item))
+                self._snapshots[key] = _Snapshot(records, snapshot.loaded_at)
+        self._refresh_in_background(key)
+
+    def invalidate(self, account: Optional[str] = None) -> None:
+        """丢弃指定账户（或全部）的快照"""
+        with self._lock:
+            for key in [key for key in self._snapshots if account is None or key[0] == account]:
+                del self._snapshots[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """返回检索、加载统计及各快照的记录数和年龄"""
+        now = time.time()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["snapshots"] = {
+                f"{account}/{kind}": {"records": len(snapshot.records), "age_s": round(now - snapshot.loaded_at, 1)}
+                for (account, kind), snapshot in self._snapshots.items()
+            }
+        stats["refresh_interval"] = self.refresh_interval
+        return stats
@@ -0,0 +1,92 @@
+"""
+AdSense API 自动分页 - 按 nextPageToken 逐页流式读取列表结果
+
+所有 list 操作共享同一个分页器：按配置的 pageSize 跟随 pageToken 翻页，
+以生成器方式逐条产出结果，支持 max_items 上限，并可在后台线程预取下一页。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# AdSense API v2 list 方法允许的最大 pageSize
+MAX_PAGE_SIZE = 10000
+
+
+class Paginator:
+    """AdSense list 方法的分页迭代器"""
+
+    def __init__(self, list_method: Callable[..., Any], items_key: str,
+                 page_size: Optional[int] = None, max_items: Optional[int] = None,
+                 prefetch: bool = False, execute: Callable[[Any], Dict[str, Any]] = None,
+                 **params: Any):
+        """
+        Args:
+            list_method: API的list方法，例如 service.accounts().sites().list
+            items_key: 响应中结果列表的字段名，例如 "sites"
+            page_size: 每页条数，不指定时使用API默认值
+            max_items: 最多返回的条数，达到后停止翻页
+            prefetch: 是否在后台线程预取下一页
+            execute: 执行请求的函数，默认直接调用 request.execute()
+            **params: 传给list方法的其他参数，例如 parent
+        """
+        self.list_method = list_method
+        self.items_key = items_key
+        self.page_size = min(int(page_size), MAX_PAGE_SIZE) if page_size else None
+        self.max_items = int(max_items) if max_items else None
+        self.prefetch = prefetch
+        self.execute = execute or (lambda request: request.execute())
+        self.params = params
+        self.pages_fetched = 0
+        self.items_returned = 0
+        self.truncated = False
+
+    def _fetch_page(self, page_token: Optional[str]) -> Dict[str, Any]:
+        """获取单页结果"""
+        params = dict(self.params)
+        if self.page_size:
+            params["pageSize"] = self.page_size
+        if page_token:
+            params["pageToken"] = page_token
+        return self.execute(self.list_method(**params))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        pending = None
+        try:
+            page = self._fetch_page(None)
+            while True:
+                self.pages_fetched += 1
+                next_token = page.get("nextPageToken")
+
+                # 在产出当前页的同时后台请求下一页
+                if next_token and executor is not None:
+                    pending = executor.submit(self._fetch_page, next_token)
+
+                items = page.get(self.items_key, [])
+                for index, item in enumerate(items):
+                    if self.max_items is not None and self.items_returned >= self.max_items:
+                        self.truncated = bool(next_token) or index < len(items)
+                        return
+                    self.items_returned += 1
+                    yield item
+
+                if not next_token:
+                    return
+                if self.max_items is not None and self.items_returned >= self.max_items:
+                    self.truncated = True
+                    return
+
+                if pending is not None:
+                    page, pending = pending.result(), None
+                else:
+                    page = self._fetch_page(next_token)
+        finally:
+            if pending is not None:
+                pending.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+
+def paginate(list_method: Callable[..., Any], items_key: str, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+    """以生成器方式逐条产出所有分页结果，参数同 Paginator"""
+    return iter(Paginator(list_method, items_key, **kwargs))
@@ -0,0 +1,244 @@
+"""
+报告聚合 - 在已获取的细粒度报告（列式报告表）上本地计算汇总
+
+    分组汇总   按任意维度子集分组，也可以把DATE归并为WEEK（周一开始）或MONTH
+    派生指标   CTR、RPM、CPC等比率由分组后的求和结果重新计算，而不是对比率取平均
+    排序/TopN  按任意指标或维度排序后截取前N组
+    同比/环比  与上一周期（或去年同期）的分组结果按维度值对齐，计算差值和变化率
+
+计算按列进行：每个分组维度由字典编码映射一次得到分组号数组，每个指标列对分组号数组做一次求和。
+只有可加的指标（计数类和货币类）可以求和，货币类使用Decimal保证精度。
+数值计算不依赖numpy等可选库（Decimal列也无法向量化）：分组求和在类型化的列数组上逐元素累加，
+只有一个分组（只计算合计）时直接对整列调用内置sum。
+"""
+
+from array import array
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .date_ranges import parse_date
+from .report_table import ReportTable
+
+ADDITIVE_TYPES = ("METRIC_TALLY", "METRIC_CURRENCY")
+
+# 派生指标：(分子, 分母, 倍数)
+DERIVED_METRICS = {
+    "PAGE_VIEWS_CTR": ("CLICKS", "PAGE_VIEWS", 1),
+    "IMPRESSIONS_CTR": ("CLICKS", "IMPRESSIONS", 1),
+    "AD_REQUESTS_CTR": ("CLICKS", "AD_REQUESTS", 1),
+    "MATCHED_AD_REQUESTS_CTR": ("CLICKS", "MATCHED_AD_REQUESTS", 1),
+    "INDIVIDUAL_AD_IMPRESSIONS_CTR": ("CLICKS", "INDIVIDUAL_AD_IMPRESSIONS", 1),
+    "PAGE_VIEWS_RPM": ("ESTIMATED_EARNINGS", "PAGE_VIEWS", 1000),
+    "IMPRESSIONS_RPM": ("ESTIMATED_EARNINGS", "IMPRESSIONS", 1000),
+    "AD_REQUESTS_RPM": ("ESTIMATED_EARNINGS", "AD_REQUESTS", 1000),
+    "MATCHED_AD_REQUESTS_RPM": ("ESTIMATED_EARNINGS", "MATCHED_AD_REQUESTS", 1000),
+    "INDIVIDUAL_AD_IMPRESSIONS_RPM": ("ESTIMATED_EARNINGS", "INDIVIDUAL_AD_IMPRESSIONS", 1000),
+    "COST_PER_CLICK": ("ESTIMATED_EARNINGS", "CLICKS", 1),
+    "AD_REQUESTS_COVERAGE": ("MATCHED_AD_REQUESTS", "AD_REQUESTS", 1),
+}
+
+
+def _week(value: str) -> str:
+    day = parse_date(value)
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+# 由DATE维度派生的时间分组
+TIME_BUCKETS: Dict[str, Callable[[str], str]] = {
+    "WEEK": _week,
+    "MONTH": lambda value: value[:7]
+}
+
+COMPARE_MODES = ("none", "previous_period", "previous_year")
+
+
+def base_metrics(metrics: List[str]) -> List[str]:
+    """获取细粒度报告时需要的指标：派生指标替换为其分子和分母，保持顺序并去重"""
+    needed: List[str] = []
+    for metric in metrics:
+        for name in (DERIVED_METRICS[metric][:2] if metric in DERIVED_METRICS else (metric,)):
+            if name not in needed:
+                needed.append(name)
+    return needed
+
+
+def base_dimensions(group_by: List[str]) -> List[str]:
+    """获取细粒度报告时需要的维度：WEEK/MONTH分组由DATE派生"""
+    needed: List[str] = []
+    for name in group_by:
+        name = "DATE" if name in TIME_BUCKETS else name
+        if name not in needed:
+            needed.append(name)
+    return needed
+
+
+def comparison_span(mode: str, start: date, end: date) -> Tuple[date, date]:
+    """上一周期（紧邻之前的等长日期范围）或去年同期的日期范围"""
+    if mode == "previous_period":
+        length = end - start + timedelta(days=1)
+        return start - length, end - length
+    if mode == "previous_year":
+        def shift(day):
+            try:
+                return day.replace(year=day.year - 1)
+            except ValueError:  # 2月29日
+                return day.replace(year=day.year - 1, day=28)
+        return shift(start), shift(end)
+    raise ValueError(f"不支持的对比方式: {mode}，可选: {', '.join(COMPARE_MODES)}")
+
+
+class Aggregation:
+    """一个报告表按分组维度汇总后的结果：分组键 -> 各可加指标的和"""
+
+    def __init__(self, table: ReportTable, group_by: List[str], metrics: List[str]):
+        self.group_by = group_by
+        self.metrics = metrics
+        self.sum_metrics = base_metrics(metrics)
+        self._check(table)
+        self.row_count = len(table)
+
+        keys, group_ids = self._group(table)
+        self.keys = keys
+        self.sums: Dict[str, List[Any]] = {}
+        for name in self.sum_metrics:
+            column = table.column(name)
+            zero = Decimal(0) if column.type == "METRIC_CURRENCY" else 0
+            values = column.values
+            if len(keys) == 1:
+                present = values if isinstance(values, array) else [value for value in values if value is not None]
+                sums = [sum(present, zero)]
+            else:
+                sums = [zero] * len(keys)
+                for group_id, value in zip(group_ids, values):
+                    if value is not None:
+                        sums[group_id] += value
+            self.sums[name] = sums
+        self.index = {key: i for i, key in enumerate(keys)}
+
+    def _check(self, table: ReportTable) -> None:
+        names = set(table.column_names)
+        missing = [name for name in base_dimensions(self.group_by) + self.sum_metrics if name not in names]
+        if missing:
+            raise ValueError(f"报告中缺少以下列，无法聚合: {', '.join(missing)}")
+        for name in self.sum_metrics:
+            column_type = table.column(name).type
+            if column_type not in ADDITIVE_TYPES:
+                raise ValueError(
+                    f"指标 {name}（{column_type}）不可加，不能分组求和；比率类指标可用派生指标: {', '.join(DERIVED_METRICS)}"
+                )
+            texts = table.column(name).text_values()
+            if texts:
+                raise ValueError(f"指标 {name} 含有无法解析为数值的值，不能求和: {', '.join(texts[:5])}")
+
+    def _group(self, table: ReportTable) -> Tuple[List[Tuple[Any, ...]], List[int]]:
+        """按分组维度计算每行的分组号，返回 (分组键列表, 分组号数组)"""
+        if not self.group_by:
+            return [()], [0] * len(table)
+        per_column = []
+        for name in self.group_by:
+            column = table.column("DATE" if name in TIME_BUCKETS else name)
+            dictionary = column.dictionary
+            if name in TIME_BUCKETS:
+                # 只对字典中的每个日期计算一次所属的周/月
+                dictionary = [None if value is None else TIME_BUCKETS[name](value) for value in dictionary]
+            per_column.append([dictionary[code] for code in column.codes])
+        index: Dict[Tuple[Any, ...], int] = {}
+        group_ids = [index.setdefault(key, len(index)) for key in zip(*per_column)]
+        return list(index), group_ids
+
+    def values(self, group: int) -> Dict[str, Any]:
+        """一个分组的输出指标（派生指标由求和结果重新计算）"""
+        return self._values({name: sums[group] for name, sums in self.sums.items()})
+
+    def totals(self) -> Dict[str, Any]:
+        """全部分组合计"""
+        return self._values({name: sum(sums, type(sums[0])(0)) if sums else 0 for name, sums in self.sums.items()})
+
+    def _values(self, sums: Dict[str, Any]) -> Dict[str, Any]:
+        values = {}
+        for metric in self.metrics:
+            if metric in DERIVED_METRICS:
+                numerator, denominator, scale = DERIVED_METRICS[metric]
+                values[metric] = float(sums[numerator]) / float(sums[denominator]) * scale if sums[denominator] else None
+            else:
+                values[metric] = sums[metric]
+        return values
+
+
+def _sort_rows(rows: List[Dict[str, Any]], sort: Optional[str]) -> None:
+    """按"-字段"（降序）或"字段"/"+字段"（升序）排序，空值排在最后"""
+    if not sort:
+        return
+    descending = sort.startswith("-")
+    field = sort.lstrip("+-")
+    present = [row for row in rows if row.get(field) is not None]
+    missing = [row for row in rows if row.get(field) is None]
+    present.sort(key=lambda row: row[field], reverse=descending)
+    rows[:] = present + missing
+
+
+def aggregate(table: ReportTable, group_by: List[str], metrics: List[str], sort: Optional[str] = None,
+              top_n: Optional[int] = None, previous: Optional[ReportTable] = None) -> Dict[str, Any]:
+    """分组汇总报告表
+
+    Args:
+        group_by: 分组维度（可含WEEK/MONTH），为空时只计算合计
+        metrics: 输出指标，可加指标求和，派生指标由求和结果计算
+        sort: 排序字段，"-"前缀为降序，默认按输出顺序（分组首次出现的顺序）
+        top_n: 排序后只返回前N组
+        previous: 对比周期的报告表；提供时每个指标额外输出 _previous、_delta、_delta_pct
+
+    Returns:
+        {"rows", "totals", "total_groups", "truncated", "base_rows"}
+    """
+    if previous is not None and any(name in ("DATE", *TIME_BUCKETS) for name in group_by):
+        raise ValueError("周期对比时分组维度不能包含DATE、WEEK或MONTH（两个周期的日期不同，无法对齐）")
+    current = Aggregation(table, group_by, metrics)
+    prior = Aggregation(previous, group_by, metrics) if previous is not None else None
+
+    keys = list(current.keys)
+    if prior is not None:
+        # 只在对比周期出现的分组也输出（当前值为0）
+        keys += [key for key in prior.keys if key not in current.index]
+
+    def with_comparison(values: Dict[str, Any], previous_values: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if prior is None:
+            return values
+        result = dict(values)
+        for metric in metrics:
+            now, before = values.get(metric), (previous_values or {}).get(metric)
+            result[f"{metric}_previous"] = before
+            result[f"{metric}_delta"] = None if now is None or before is None else now - before
+            result[f"{metric}_delta_pct"] = (
+                float(now - before) / float(before) * 100 if now is not None and before else None
+            )
+        return result
+
+    rows = []
+    for key in keys:
+        group = current.index.get(key)
+        values = current.values(group) if group is not None else {
+            metric: (None if metric in DERIVED_METRICS else 0) for metric in metrics
+        }
+        previous_values = prior.values(prior.index[key]) if prior is not None and key in prior.index else None
+        row = dict(zip(group_by, key))
+        row.update(with_comparison(values, previous_values))
+        rows.append(row)
+
+    _sort_rows(rows, sort)
+    total_groups = len(rows) if group_by else 0
+    truncated = bool(top_n) and len(rows) > top_n
+    if truncated:
+        rows = rows[:top_n]
+
+    result = {
+        "rows": rows if group_by else [],
+        "totals": with_comparison(current.totals(), prior.totals() if prior is not None else None),
+        "total_groups": total_groups,
+        "truncated": truncated,
+        "base_rows": current.row_count
+    }
+    if prior is not None:
+        result["previous_base_rows"] = prior.row_count
+    return result
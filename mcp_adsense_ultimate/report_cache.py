@@ -0,0 +1,192 @@
+"""
+报告结果缓存 - 按规范化的报告请求缓存 accounts.reports.generate 的响应
+
+内存LRU层按字节预算淘汰，可选的SQLite磁盘层在进程重启后保留结果。
+包含今天的日期范围只缓存很短时间，最近几天（AdSense仍可能修订）缓存较短时间，
+完全结束的历史日期范围则永久缓存。
+写入时可同时记录规范化的请求，按请求内容（而不是缓存键）查找能覆盖另一个查询的缓存报告，
+例如用已缓存的较长日期范围回答其中一段的聚合。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+class ReportCache:
+    """两级报告结果缓存：内存LRU + 可选SQLite"""
+
+    def __init__(self, max_bytes: Optional[int] = None, db_path: Optional[str] = None,
+                 ttl_today: Optional[int] = None, ttl_recent: Optional[int] = None,
+                 recent_days: Optional[int] = None):
+        """
+        Args:
+            max_bytes: 内存层字节预算，默认读取MCP_ADSENSE_REPORT_CACHE_MB（默认64MB）
+            db_path: SQLite文件路径，默认读取MCP_ADSENSE_REPORT_CACHE_DB，未设置时不启用磁盘层
+            ttl_today: 包含今天的范围的缓存秒数
+            ttl_recent: 结束于最近recent_days天内的范围的缓存秒数
+            recent_days: 数据仍可能被修订的天数
+        """
+        self.max_bytes = max_bytes or int(float(os.getenv("MCP_ADSENSE_REPORT_CACHE_MB", "64")) * 1024 * 1024)
+        self.ttl_today = ttl_today if ttl_today is not None else int(os.getenv("MCP_ADSENSE_REPORT_CACHE_TTL_TODAY", "300"))
+        self.ttl_recent = ttl_recent if ttl_recent is not None else int(os.getenv("MCP_ADSENSE_REPORT_CACHE_TTL_RECENT", "3600"))
+        self.recent_days = recent_days if recent_days is not None else int(os.getenv("MCP_ADSENSE_RECENT_DAYS", "3"))
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (data, expires_at)
+        self._memory_bytes = 0
+        self._requests: Dict[str, Dict[str, Any]] = {}  # 内存层条目的规范化请求
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "puts": 0,
+            "evictions": 0,
+            "expired": 0
+        }
+
+        self.db_path = db_path or os.getenv("MCP_ADSENSE_REPORT_CACHE_DB")
+        self._db = None
+        if self.db_path:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS report_cache ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL, created_at REAL NOT NULL, request TEXT)"
+            )
+            try:
+                # 早期版本创建的表没有request列
+                self._db.execute("ALTER TABLE report_cache ADD COLUMN request TEXT")
+            except sqlite3.OperationalError:
+                pass
+            self._db.commit()
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """根据规范化后的请求生成缓存键"""
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def ttl_for_range(self, end: date, today: Optional[date] = None) -> Optional[int]:
+        """根据结束日期决定缓存时长，None表示永久缓存"""
+        today = today or date.today()
+        if end >= today:
+            return self.ttl_today
+        if end >= today - timedelta(days=self.recent_days):
+            return self.ttl_recent
+        return None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，未命中或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                data, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(data)
+                self._remove(key)
+                self._stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT data, expires_at FROM report_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    data, expires_at = row
+                    if expires_at is None or expires_at > now:
+                        self._store(key, data, expires_at)
+                        self._stats["disk_hits"] += 1
+                        return json.loads(data)
+                    self._db.execute("DELETE FROM report_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: Dict[str, Any], ttl: Optional[int] = None,
+            request: Optional[Dict[str, Any]] = None) -> None:
+        """写入缓存，ttl为None表示永久缓存；request为生成缓存键的规范化请求，记录后可被find_covering查找"""
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._stats["puts"] += 1
+            self._store(key, data, expires_at)
+            if request is not None and key in self._memory:
+                self._requests[key] = request
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO report_cache (key, data, expires_at, created_at, request) VALUES (?, ?, ?, ?, ?)",
+                    (key, data, expires_at, time.time(),
+                     json.dumps(request, sort_keys=True, default=str) if request is not None else None)
+                )
+                self._db.commit()
+
+    def find_covering(self, match: Callable[[Dict[str, Any]], bool]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """逐个产出记录的请求满足match且未过期的缓存条目 (请求, 响应)"""
+        now = time.time()
+        with self._lock:
+            candidates = [(key, request) for key, request in self._requests.items()
+                          if self._memory[key][1] is None or self._memory[key][1] > now]
+            if self._db is not None:
+                rows = self._db.execute(
+                    "SELECT key, request FROM report_cache WHERE request IS NOT NULL "
+                    "AND (expires_at IS NULL OR expires_at > ?)", (now,)
+                ).fetchall()
+                candidates += [(key, json.loads(request)) for key, request in rows if key not in self._requests]
+        for key, request in candidates:
+            if match(request):
+                value = self.get(key)
+                if value is not None:
+                    yield request, value
+
+    def _store(self, key: str, data: bytes, expires_at: Optional[float]) -> None:
+        """写入内存层并按字节预算淘汰最久未使用的条目（调用方持有锁）"""
+        if len(data) > self.max_bytes:
+            return
+        self._remove(key)
+        self._memory[key] = (data, expires_at)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_bytes:
+            oldest = next(iter(self._memory))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        """从内存层移除条目（调用方持有锁）"""
+        entry = self._memory.pop(key, None)
+        self._requests.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[0])
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        with self._lock:
+            self._memory.clear()
+            self._requests.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM report_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中率、容量等统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+            stats["max_bytes"] = self.max_bytes
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM report_cache").fetchone()[0]
+                stats["db_path"] = self.db_path
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else None
+        return stats
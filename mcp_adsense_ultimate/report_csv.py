@@ -0,0 +1,126 @@
+"""
+CSV报告下载 - 通过 reports.generateCsv / reports.saved.generateCsv 获取报告
+
+generateCsv 的响应体就是CSV文本，比JSON响应小得多，也不需要构建逐单元格的JSON树。
+响应体按块流式读取：导出时各块直接写入临时文件，解析时经增量解码后逐行交给 ReportTable.from_csv，
+内存中只保留当前块（以及解析出的列）。
+使用requests传输时才能流式读取；httplib2传输会先把整个响应体读入内存，之后的处理相同。
+"""
+
+import base64
+import codecs
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from .report_table import ReportTable
+
+TRANSPORTS = ("auto", "json", "csv")
+DEFAULT_ROW_THRESHOLD = 10000
+
+
+def resolve_transport(transport: str, limit: Optional[int], row_threshold: Optional[int] = None) -> str:
+    """决定报告使用JSON还是CSV下载
+
+    auto：请求的行数上限不小于阈值（MCP_ADSENSE_CSV_ROW_THRESHOLD，默认10000）或不限行数时使用CSV。
+    """
+    if transport not in TRANSPORTS:
+        raise ValueError(f"不支持的传输方式: {transport}，可选: {', '.join(TRANSPORTS)}")
+    if transport != "auto":
+        return transport
+    threshold = row_threshold or int(os.getenv("MCP_ADSENSE_CSV_ROW_THRESHOLD", DEFAULT_ROW_THRESHOLD))
+    return "csv" if not limit or limit >= threshold else "json"
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _decode_http_body(content: bytes) -> bytes:
+    """以JSON形式返回的HttpBody（data为base64）解码为CSV字节，不是HttpBody时原样返回"""
+    try:
+        body = json.loads(content)
+    except ValueError:
+        return content
+    if isinstance(body, dict) and "data" in body:
+        return base64.b64decode(body["data"])
+    return content
+
+
+def fetch_csv(request: Any, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """执行generateCsv请求，返回CSV响应体的分块迭代器（不经过JSON反序列化）"""
+    resp, chunks = request.execute_stream(chunk_size)
+    content_type = resp.get("content-type", "") if hasattr(resp, "get") else ""
+    if content_type.startswith("application/json"):
+        # JSON包装的HttpBody只能整体解码
+        return iter([_decode_http_body(b"".join(chunks))])
+    return chunks
+
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """将字节块增量解码为以换行结尾的文本行（保留行尾，与 newline="" 打开的文件相同）"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        if "\n" not in pending:
+            continue
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def parse_csv(chunks: Iterable[bytes], dimensions: Optional[list] = None) -> ReportTable:
+    """将CSV响应体的字节块逐行解析为列式报告表"""
+    return ReportTable.from_csv(_iter_lines(chunks), dimensions)
+
+
+def _count_records(chunk: bytes, in_quotes: bool) -> Tuple[int, bool]:
+    """统计块中引号外的换行数（即CSV记录的结束），返回 (换行数, 块结束时是否在引号内)
+
+    转义的引号（""）使引号状态翻转两次，不影响判断。
+    """
+    count = 0
+    for segment in chunk.split(b'"'):
+        if not in_quotes:
+            count += segment.count(b"\n")
+        in_quotes = not in_quotes
+    # split产生的段数比引号数多一，最后一次翻转不对应引号
+    return count, not in_quotes
+
+
+def write_csv(chunks: Iterable[bytes], path: str) -> Dict[str, Any]:
+    """将CSV字节块依次写入文件（先写临时文件再替换），返回 {"path", "format", "bytes", "rows"}
+
+    rows为数据行数（不含首行列名），引号内的换行不计入。
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    size = records = 0
+    in_quotes = False
+    last = b""
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                f.write(chunk)
+                size += len(chunk)
+                count, in_quotes = _count_records(chunk, in_quotes)
+                records += count
+                last = chunk[-1:]
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # 最后一行没有换行结尾时也是一条记录
+    if size and last != b"\n":
+        records += 1
+    return {"path": path, "format": "csv", "bytes": size, "rows": max(0, records - 1)}
@@ -0,0 +1,120 @@
+"""
+报告游标 - 大报告按固定行数分块返回
+
+get_reports 指定 chunk_rows 时，报告表（列式存储）保存在服务器端的游标中，
+第一个分块随结果返回，之后每次以 cursor 参数取下一块，只转换和序列化该块的行。
+闲置超过TTL的游标过期释放，游标数量超过上限时淘汰最久未使用的游标。
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .report_table import ReportTable
+
+
+class CursorExpiredError(LookupError):
+    """游标不存在、已读完或已过期"""
+
+
+class _Cursor:
+    def __init__(self, table: ReportTable, chunk_rows: int, context: Dict[str, Any]):
+        self.table = table
+        self.chunk_rows = chunk_rows
+        self.context = context
+        self.offset = 0
+        self.touched = time.monotonic()
+
+
+class CursorStore:
+    """服务器端报告游标"""
+
+    def __init__(self, ttl: Optional[int] = None, max_cursors: Optional[int] = None):
+        """
+        Args:
+            ttl: 游标闲置多少秒后过期，默认读取MCP_ADSENSE_CURSOR_TTL（默认600）
+            max_cursors: 同时保留的游标数上限，默认读取MCP_ADSENSE_MAX_CURSORS（默认32）
+        """
+        self.ttl = ttl if ttl is not None else int(os.getenv("MCP_ADSENSE_CURSOR_TTL", "600"))
+        self.max_cursors = max_cursors or int(os.getenv("MCP_ADSENSE_MAX_CURSORS", "32"))
+        self._lock = threading.Lock()
+        self._cursors: "OrderedDict[str, _Cursor]" = OrderedDict()
+        self._stats = {"opened": 0, "chunks": 0, "completed": 0, "expired": 0, "evicted": 0}
+
+    def _purge(self) -> None:
+        """移除过期游标（调用方持有锁）"""
+        now = time.monotonic()
+        for cursor_id in [cursor_id for cursor_id, cursor in self._cursors.items() if now - cursor.touched >= self.ttl]:
+            del self._cursors[cursor_id]
+            self._stats["expired"] += 1
+
+    def open(self, table: ReportTable, chunk_rows: int,
+             context: Optional[Dict[str, Any]] = None) -> Tuple[ReportTable, Dict[str, Any]]:
+        """为报告表创建游标，返回 (第一块, 分块信息)；报告不超过一块时不创建游标
+
+        Args:
+            context: 随每个后续分块返回的报告元信息（例如账户、维度、指标和格式）
+        """
+        if chunk_rows <= 0:
+            raise ValueError(f"chunk_rows必须大于0: {chunk_rows}")
+        cursor = _Cursor(table, chunk_rows, dict(context or {}))
+        if len(table) > chunk_rows:
+            cursor_id = secrets.token_urlsafe(16)
+            with self._lock:
+                self._purge()
+                while len(self._cursors) >= self.max_cursors:
+                    self._cursors.popitem(last=False)
+                    self._stats["evicted"] += 1
+                self._cursors[cursor_id] = cursor
+                self._stats["opened"] += 1
+        else:
+            cursor_id = None
+        return self._advance(cursor_id, cursor)
+
+    def next(self, cursor_id: str) -> Tuple[ReportTable, Dict[str, Any], Dict[str, Any]]:
+        """取游标的下一块，返回 (分块, 分块信息, 报告元信息)"""
+        with self._lock:
+            self._purge()
+            cursor = self._cursors.get(cursor_id)
+            if cursor is None:
+                raise CursorExpiredError(f"游标不存在或已过期（闲置超过{self.ttl}秒的游标会被释放）: {cursor_id}")
+            self._cursors.move_to_end(cursor_id)
+        chunk, info = self._advance(cursor_id, cursor)
+        return chunk, info, cursor.context
+
+    def _advance(self, cursor_id: Optional[str], cursor: _Cursor) -> Tuple[ReportTable, Dict[str, Any]]:
+        """切出游标当前位置的一块并前移；读完后释放游标"""
+        with self._lock:
+            start = cursor.offset
+            cursor.offset = min(start + cursor.chunk_rows, len(cursor.table))
+            cursor.touched = time.monotonic()
+            has_more = cursor.offset < len(cursor.table)
+            self._stats["chunks"] += 1
+            if cursor_id is not None and not has_more and self._cursors.pop(cursor_id, None) is not None:
+                self._stats["completed"] += 1
+        chunk = cursor.table.slice(start, cursor.offset)
+        return chunk, {
+            "offset": start,
+            "chunk_rows": len(chunk),
+            "total_rows": len(cursor.table),
+            "has_more": has_more,
+            "next_cursor": cursor_id if has_more else None
+        }
+
+    def close(self, cursor_id: str) -> bool:
+        """提前释放游标"""
+        with self._lock:
+            return self._cursors.pop(cursor_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """返回游标统计及当前打开的游标数"""
+        with self._lock:
+            self._purge()
+            stats = dict(self._stats)
+            stats["open"] = len(self._cursors)
+            stats["buffered_rows"] = sum(len(cursor.table) - cursor.offset for cursor in self._cursors.values())
+        stats["ttl"] = self.ttl
+        return stats
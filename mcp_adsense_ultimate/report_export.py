@@ -0,0 +1,145 @@
+"""
+报告导出 - 将列式报告表直接写入Parquet、Arrow IPC或CSV文件
+
+导出的数据不经过MCP文本通道，工具结果只包含文件路径、列类型和行数。
+列类型取自报告headers：
+    DIMENSION                          dictionary<int32, string>（直接复用表中的字典编码）
+    METRIC_TALLY / METRIC_MILLISECONDS int64
+    METRIC_CURRENCY                    decimal128（保持API返回的精度）
+    其他指标                            float64
+    含无法解析值的指标列                string（保留API返回的文本）
+维度编码和整数指标的数组缓冲区直接交给Arrow，不逐值复制。
+需要安装pyarrow（可选依赖，导入较慢，首次导出时才加载）；未安装时Parquet/Arrow导出改为写CSV。
+"""
+
+import os
+import tempfile
+from array import array
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from .report_table import ReportColumn, ReportTable
+
+pyarrow = None
+_pyarrow_checked = False
+
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+_EXTENSIONS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+_INT_TYPES = ("METRIC_TALLY", "METRIC_MILLISECONDS")
+
+
+def _load_pyarrow() -> Any:
+    """首次调用时导入pyarrow，未安装时返回None"""
+    global pyarrow, _pyarrow_checked
+    if not _pyarrow_checked:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:  # pyarrow为可选依赖
+            pyarrow = None
+        _pyarrow_checked = True
+    return pyarrow
+
+
+def infer_format(path: str, format: Optional[str] = None) -> str:
+    """导出格式：显式指定的格式，否则按扩展名推断（.parquet/.pq、.arrow/.feather/.ipc），其余为csv"""
+    if format:
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {format}，可选: {', '.join(EXPORT_FORMATS)}")
+        return format
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def _buffer_array(values: array, arrow_type: Any) -> Any:
+    """以数组缓冲区直接构建Arrow数组（不复制）"""
+    return pyarrow.Array.from_buffers(arrow_type, len(values), [None, pyarrow.py_buffer(values)])
+
+
+def _dictionary_array(codes: array, dictionary: List[Optional[str]]) -> Any:
+    indices = _buffer_array(codes, pyarrow.int32()) if codes.itemsize == 4 and len(dictionary) < 2 ** 31 \
+        else pyarrow.array(codes, pyarrow.int32())
+    return pyarrow.DictionaryArray.from_arrays(indices, pyarrow.array(dictionary, pyarrow.string()))
+
+
+def _metric_array(column: ReportColumn) -> Any:
+    values = column.values
+    if column.has_text_values:
+        # 含无法解析的值时按API返回的文本导出，不丢弃数据
+        return pyarrow.array(column.texts(), pyarrow.string())
+    if column.type in _INT_TYPES:
+        if isinstance(values, array) and values.itemsize == 8:
+            return _buffer_array(values, pyarrow.int64())
+        return pyarrow.array(values, pyarrow.int64())
+    if column.type == "METRIC_CURRENCY":
+        scale = max([-value.as_tuple().exponent for value in values
+                     if isinstance(value, Decimal) and value.is_finite()] + [0])
+        return pyarrow.array(values, pyarrow.decimal128(38, scale))
+    return pyarrow.array([None if value is None else float(value) for value in values], pyarrow.float64())
+
+
+def to_arrow(table: ReportTable) -> Any:
+    """将报告表转换为 pyarrow.Table；带标签的维度列额外生成 <列名>.label 列"""
+    if _load_pyarrow() is None:
+        raise ImportError("转换为Arrow表需要安装pyarrow（pip install pyarrow）")
+    names, arrays = [], []
+    for column in table.columns:
+        if column.is_dimension:
+            names.append(column.name)
+            arrays.append(_dictionary_array(column.codes, column.dictionary))
+            if any(label is not None for label in column.labels):
+                names.append(f"{column.name}.label")
+                arrays.append(_dictionary_array(column.codes, column.labels))
+        else:
+            names.append(column.name)
+            arrays.append(_metric_array(column))
+    return pyarrow.Table.from_arrays(arrays, names=names)
+
+
+def export_table(table: ReportTable, path: str, format: Optional[str] = None) -> Dict[str, Any]:
+    """将报告表写入文件（先写临时文件再替换）
+
+    Returns:
+        {"path", "format", "rows", "bytes", "schema"}；未安装pyarrow而改写CSV时另含 "fallback"
+    """
+    format = infer_format(path, format)
+    path = os.path.abspath(os.path.expanduser(path))
+    fallback = None
+    if format != "csv" and _load_pyarrow() is None:
+        fallback = f"未安装pyarrow，{format}导出已改为CSV（pip install pyarrow 后可导出{format}）"
+        format = "csv"
+        path = os.path.splitext(path)[0] + ".csv"
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        if format == "csv":
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                table.write_delimited(f)
+            schema = [{"name": column.name, "type": column.type} for column in table.columns]
+        else:
+            os.close(fd)
+            arrow_table = to_arrow(table)
+            if format == "parquet":
+                pyarrow.parquet.write_table(arrow_table, tmp_path)
+            else:
+                with pyarrow.ipc.new_file(tmp_path, arrow_table.schema) as writer:
+                    writer.write_table(arrow_table)
+            schema = [{"name": field.name, "type": str(field.type)} for field in arrow_table.schema]
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    result = {
+        "path": path,
+        "format": format,
+        "rows": len(table),
+        "bytes": os.path.getsize(path),
+        "schema": schema
+    }
+    if fallback:
+        result["fallback"] = fallback
+    return result
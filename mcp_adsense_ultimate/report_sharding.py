@@ -0,0 +1,132 @@
+"""
+报告日期分片 - 将大日期范围拆分为按天/周/月的分片并归并结果
+
+各分片的响应按请求的orderBy排序，使用k路归并合并为一个结果，
+保证调用方看到的与单次请求的结果一致。
+"""
+
+import heapq
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SHARD_GRANULARITIES = ("day", "week", "month")
+
+# 分片后各分片的行互不重叠的日期维度：含DATE时任意分片方式都安全，
+# 含MONTH时只有按月分片才不会把同一个月拆到两个分片
+_SAFE_TIME_DIMENSIONS = {
+    "DATE": SHARD_GRANULARITIES,
+    "MONTH": ("month",)
+}
+
+
+def plan_shards(start: date, end: date, granularity: str) -> List[Tuple[date, date]]:
+    """将 [start, end] 拆分为按天、周（周一开始）或自然月对齐的分片"""
+    if granularity not in SHARD_GRANULARITIES:
+        raise ValueError(f"不支持的分片粒度: {granularity}")
+    if start > end:
+        raise ValueError(f"开始日期 {start} 晚于结束日期 {end}")
+
+    shards = []
+    current = start
+    while current <= end:
+        if granularity == "day":
+            shard_end = current
+        elif granularity == "week":
+            shard_end = current + timedelta(days=6 - current.weekday())
+        else:
+            next_month = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+            shard_end = next_month - timedelta(days=1)
+        shard_end = min(shard_end, end)
+        shards.append((current, shard_end))
+        current = shard_end + timedelta(days=1)
+    return shards
+
+
+def check_shardable(dimensions: List[str], granularity: str) -> Optional[str]:
+    """检查维度组合能否按指定粒度分片，不能时返回错误说明"""
+    for dimension, granularities in _SAFE_TIME_DIMENSIONS.items():
+        if dimension in dimensions and granularity in granularities:
+            return None
+    return (f"按{granularity}分片要求dimensions包含DATE（或按month分片时包含MONTH），"
+            "否则同一维度组合的数据会分散在多个分片中而无法正确合并")
+
+
+def make_sort_key(headers: List[Dict[str, Any]], order_by: str) -> Tuple[Callable[[Dict[str, Any]], Any], bool]:
+    """根据orderBy（如 '+DATE'、'-ESTIMATED_EARNINGS'）构造行排序键"""
+    descending = order_by.startswith("-")
+    column = order_by.lstrip("+-")
+    names = [header.get("name") for header in headers]
+    if column not in names:
+        raise ValueError(f"排序字段 {column} 不在报告列中")
+    index = names.index(column)
+
+    if headers[index].get("type") == "DIMENSION":
+        def key(row):
+            return row["cells"][index].get("value") or ""
+    else:
+        def key(row):
+            try:
+                return float(row["cells"][index].get("value"))
+            except (TypeError, ValueError):
+                return float("-inf")
+    return key, descending
+
+
+def reorder_columns(response: Dict[str, Any], names: List[str]) -> Dict[str, Any]:
+    """按names的列顺序重排报告响应的headers及rows/totals/averages中的单元格
+
+    列已是该顺序时原样返回；names与响应的列不一致时抛出ValueError。
+    """
+    headers = response.get("headers") or []
+    current = [header.get("name") for header in headers]
+    if not headers or current == names:
+        return response
+    if sorted(current) != sorted(names):
+        raise ValueError(f"报告列 {current} 与期望的列 {names} 不一致")
+
+    order = [current.index(name) for name in names]
+
+    def reorder(row):
+        cells = row.get("cells", [])
+        return dict(row, cells=[cells[i] for i in order])
+
+    reordered = dict(response, headers=[headers[i] for i in order])
+    if "rows" in response:
+        reordered["rows"] = [reorder(row) for row in response["rows"]]
+    for field in ("totals", "averages"):
+        if response.get(field):
+            reordered[field] = reorder(response[field])
+    return reordered
+
+
+def merge_shard_reports(reports: List[Dict[str, Any]], order_by: Optional[List[str]] = None,
+                        limit: Optional[int] = None) -> Dict[str, Any]:
+    """按orderBy对各分片的行做k路归并，返回与 reports.generate 响应结构相同的结果
+
+    分片之间各指标的totals/averages无法直接相加（比率类指标），因此合并结果不包含这两项。
+    各分片（例如来自报告缓存的分片）的列顺序可能不同，合并前统一按第一个分片的列顺序重排。
+    """
+    headers = next((r["headers"] for r in reports if r.get("headers")), [])
+    names = [header.get("name") for header in headers]
+    shard_rows = [reorder_columns(r, names).get("rows", []) for r in reports]
+
+    if order_by and headers:
+        key, descending = make_sort_key(headers, order_by[0])
+        # API的字符串排序规则可能与Python不同，先按同一个键重新排序（对已有序数据接近线性）
+        shard_rows = [sorted(rows, key=key, reverse=descending) for rows in shard_rows]
+        merged = heapq.merge(*shard_rows, key=key, reverse=descending)
+    else:
+        merged = (row for rows in shard_rows for row in rows)
+
+    rows = []
+    for row in merged:
+        if limit and len(rows) >= limit:
+            break
+        rows.append(row)
+
+    total_matched = sum(int(r.get("totalMatchedRows", len(r.get("rows", [])))) for r in reports)
+    return {
+        "headers": headers,
+        "rows": rows,
+        "totalMatchedRows": str(total_matched)
+    }
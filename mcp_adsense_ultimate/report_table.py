@@ -0,0 +1,352 @@
+"""
+列式报告表 - 直接由API响应的 headers/rows 构建
+
+每个报告列保存为一个类型化数组：指标在构建时只解析一次（计数类为int数组，
+货币、比率等小数类为Decimal，保证输出文本与API返回的完全一致），维度值做字典编码。
+原有的逐单元格 {"value", "label"} 嵌套结构只在输出时生成。
+"""
+
+import csv
+import io
+from array import array
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# 按整数解析的指标类型，其余指标按Decimal解析
+_INT_TYPES = ("METRIC_TALLY", "METRIC_MILLISECONDS")
+
+
+def _infer_type(texts: List[str]) -> str:
+    """推断CSV列的类型"""
+    values = [text for text in texts if text != ""]
+    if not values:
+        return "DIMENSION"
+    try:
+        for text in values:
+            int(text)
+        return "METRIC_TALLY"
+    except ValueError:
+        pass
+    try:
+        for text in values:
+            if not Decimal(text).is_finite():
+                return "DIMENSION"
+        return "METRIC_DECIMAL"
+    except InvalidOperation:
+        return "DIMENSION"
+
+
+class ReportColumn:
+    """报告中的一列"""
+
+    def __init__(self, name: str, column_type: str):
+        self.name = name
+        self.type = column_type
+        self.is_dimension = column_type == "DIMENSION"
+        # 维度列：codes为字典编码，dictionary/labels为去重后的值和标签
+        self.codes: Optional[array] = None
+        self.dictionary: List[Optional[str]] = []
+        self.labels: List[Optional[str]] = []
+        # 指标列：int数组或Decimal列表，以及稀疏的标签
+        self.values: Any = None
+        self.metric_labels: Dict[int, str] = {}
+        # 指标列中存在无法解析为数值、按原文本保留的值
+        self.has_text_values = False
+
+    @classmethod
+    def from_cells(cls, name: str, column_type: str, cells: List[Dict[str, Any]]) -> "ReportColumn":
+        """由同一列的所有单元格构建列"""
+        column = cls(name, column_type)
+        if column.is_dimension:
+            index: Dict[tuple, int] = {}
+            keys = zip([cell.get("value") for cell in cells], [cell.get("label") for cell in cells])
+            column.codes = array("I", [index.setdefault(key, len(index)) for key in keys])
+            column.dictionary = [value for value, _ in index]
+            column.labels = [label for _, label in index]
+        else:
+            raw = [cell.get("value") for cell in cells]
+            column.values = column._parse_metric(raw)
+            for i, cell in enumerate(cells):
+                label = cell.get("label")
+                if label is not None:
+                    column.metric_labels[i] = label
+        return column
+
+    @classmethod
+    def from_texts(cls, name: str, column_type: Optional[str], texts: List[str]) -> "ReportColumn":
+        """由同一列的文本值（例如CSV中的一列）构建列，不生成单元格对象
+
+        column_type为None时按取值推断：全部为整数时为METRIC_TALLY，全部为数值时为METRIC_DECIMAL，否则为维度。
+        """
+        if column_type is None:
+            column_type = _infer_type(texts)
+        column = cls(name, column_type)
+        if column.is_dimension:
+            index: Dict[str, int] = {}
+            column.codes = array("I", [index.setdefault(text, len(index)) for text in texts])
+            column.dictionary = list(index)
+            column.labels = [None] * len(index)
+        else:
+            column.values = column._parse_metric([text if text != "" else None for text in texts])
+        return column
+
+    def _parse_metric(self, raw: List[Optional[str]]) -> Any:
+        """一次性解析指标值；存在缺失或无法解析的值时退化为列表，
+        缺失值为None，无法解析的值（例如API返回的占位文本）按原文本保留
+        """
+        parse = int if self.type in _INT_TYPES else Decimal
+        try:
+            if parse is int:
+                return array("q", map(int, raw))
+            return list(map(Decimal, raw))
+        except (TypeError, ValueError, InvalidOperation):
+            parsed = []
+            for value in raw:
+                try:
+                    parsed.append(parse(value))
+                except (TypeError, ValueError, InvalidOperation):
+                    parsed.append(value)
+                    self.has_text_values = self.has_text_values or value is not None
+            return parsed
+
+    def text_values(self) -> List[str]:
+        """无法解析为数值的值（去重，按出现顺序）"""
+        if not self.has_text_values:
+            return []
+        return list(dict.fromkeys(value for value in self.values if isinstance(value, str)))
+
+    def __len__(self) -> int:
+        return len(self.codes) if self.is_dimension else len(self.values)
+
+    def value_at(self, i: int) -> Any:
+        """第i行的原始类型值（维度为字符串，指标为数值）"""
+        if self.is_dimension:
+            return self.dictionary[self.codes[i]]
+        return self.values[i]
+
+    def text_at(self, i: int) -> Optional[str]:
+        """第i行的文本值，与API返回的value字段一致"""
+        if self.is_dimension:
+            return self.dictionary[self.codes[i]]
+        value = self.values[i]
+        return None if value is None else str(value)
+
+    def label_at(self, i: int) -> Optional[str]:
+        """第i行的标签"""
+        if self.is_dimension:
+            return self.labels[self.codes[i]]
+        return self.metric_labels.get(i)
+
+    def texts(self) -> List[Optional[str]]:
+        """整列的文本值"""
+        if self.is_dimension:
+            dictionary = self.dictionary
+            return [dictionary[code] for code in self.codes]
+        if isinstance(self.values, array):
+            return list(map(str, self.values))
+        return [None if value is None else str(value) for value in self.values]
+
+    def cells(self) -> List[Dict[str, Optional[str]]]:
+        """整列的 {"value", "label"} 单元格；维度列中相同的值共享同一个单元格对象"""
+        if self.is_dimension:
+            shared = [{"value": value, "label": label} for value, label in zip(self.dictionary, self.labels)]
+            return [shared[code] for code in self.codes]
+        labels = self.metric_labels
+        if not labels:
+            return [{"value": text, "label": None} for text in self.texts()]
+        return [{"value": text, "label": labels.get(i)} for i, text in enumerate(self.texts())]
+
+    def slice(self, start: int, stop: int) -> "ReportColumn":
+        """第start到stop行组成的列；维度列只保留这些行用到的字典项并重新编码"""
+        column = ReportColumn(self.name, self.type)
+        if self.is_dimension:
+            remap: Dict[int, int] = {}
+            column.codes = array("I", [remap.setdefault(code, len(remap)) for code in self.codes[start:stop]])
+            column.dictionary = [self.dictionary[code] for code in remap]
+            column.labels = [self.labels[code] for code in remap]
+        else:
+            column.values = self.values[start:stop]
+            column.has_text_values = self.has_text_values and any(isinstance(value, str) for value in column.values)
+            column.metric_labels = {
+                i - start: label for i, label in self.metric_labels.items() if start <= i < stop
+            }
+        return column
+
+    def take(self, indices: List[int]) -> "ReportColumn":
+        """indices指定的行组成的列；维度列只保留这些行用到的字典项并重新编码"""
+        column = ReportColumn(self.name, self.type)
+        if self.is_dimension:
+            remap: Dict[int, int] = {}
+            codes = self.codes
+            column.codes = array("I", [remap.setdefault(codes[i], len(remap)) for i in indices])
+            column.dictionary = [self.dictionary[code] for code in remap]
+            column.labels = [self.labels[code] for code in remap]
+        else:
+            values = self.values
+            taken = [values[i] for i in indices]
+            column.values = array(values.typecode, taken) if isinstance(values, array) else taken
+            column.has_text_values = self.has_text_values and any(isinstance(value, str) for value in taken)
+            labels = self.metric_labels
+            column.metric_labels = {j: labels[i] for j, i in enumerate(indices) if i in labels}
+        return column
+
+    def to_json(self) -> Dict[str, Any]:
+        """列式JSON输出：维度列输出字典和编码，指标列输出数值数组"""
+        result: Dict[str, Any] = {"name": self.name, "type": self.type}
+        if self.is_dimension:
+            result["dictionary"] = self.dictionary
+            if any(label is not None for label in self.labels):
+                result["labels"] = self.labels
+            result["codes"] = self.codes.tolist()
+        else:
+            if isinstance(self.values, array):
+                result["values"] = self.values.tolist()
+            else:
+                result["values"] = [
+                    value if value is None or isinstance(value, (int, str)) else float(value)
+                    for value in self.values
+                ]
+        return result
+
+
+class ReportTable:
+    """列式报告表"""
+
+    def __init__(self, columns: List[ReportColumn], row_count: int):
+        self.columns = columns
+        self.row_count = row_count
+        self._by_name = {column.name: column for column in columns}
+
+    @classmethod
+    def from_response(cls, response: Dict[str, Any], fallback_names: List[str] = None) -> "ReportTable":
+        """由 reports.generate / saved.generate 的响应构建
+
+        Args:
+            response: API响应，包含headers和rows
+            fallback_names: 响应缺少headers时使用的列名（按维度在前、指标在后的顺序）
+        """
+        headers = response.get("headers") or [
+            {"name": name, "type": "DIMENSION"} for name in (fallback_names or [])
+        ]
+        rows = response.get("rows", [])
+        width = len(headers)
+        # 按列转置单元格，单元格数量不符的行补齐或截断
+        padding = [{}] * width
+
+        def row_cells(row):
+            cells = row.get("cells", [])
+            return cells if len(cells) == width else (cells + padding)[:width]
+
+        cells_by_column = list(zip(*map(row_cells, rows))) if rows else [()] * width
+
+        columns = [
+            ReportColumn.from_cells(header.get("name"), header.get("type", "DIMENSION"), list(cells))
+            for header, cells in zip(headers, cells_by_column)
+        ]
+        return cls(columns, len(rows))
+
+    @classmethod
+    def from_csv(cls, lines: Iterable[str], dimensions: Optional[List[str]] = None) -> "ReportTable":
+        """由 generateCsv 返回的CSV文本（首行为列名）逐行解析构建，不经过JSON单元格
+
+        Args:
+            lines: CSV文本行，例如文件对象或 io.StringIO
+            dimensions: 维度列名；提供时其余列均为指标（整数列为METRIC_TALLY，其余为METRIC_DECIMAL），
+                否则按取值推断每列的类型
+        """
+        reader = csv.reader(lines)
+        header = next(reader, None) or []
+        width = len(header)
+        texts: List[List[str]] = [[] for _ in header]
+        appenders = [column.append for column in texts]
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != width:
+                row = (row + [""] * width)[:width]
+            for append, text in zip(appenders, row):
+                append(text)
+
+        columns = []
+        for name, values in zip(header, texts):
+            if dimensions is None:
+                column_type = None
+            elif name in dimensions:
+                column_type = "DIMENSION"
+            else:
+                column_type = "METRIC_TALLY" if _infer_type(values) == "METRIC_TALLY" else "METRIC_DECIMAL"
+            columns.append(ReportColumn.from_texts(name, column_type, values))
+        return cls(columns, len(texts[0]) if texts else 0)
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    @property
+    def column_names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+    def column(self, name: str) -> ReportColumn:
+        """按名称获取列"""
+        return self._by_name[name]
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "ReportTable":
+        """第start到stop行组成的表（用于分块输出）"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        start = min(max(start, 0), stop)
+        return ReportTable([column.slice(start, stop) for column in self.columns], stop - start)
+
+    def take(self, indices: List[int]) -> "ReportTable":
+        """indices指定的行组成的表"""
+        return ReportTable([column.take(indices) for column in self.columns], len(indices))
+
+    def rows_where(self, name: str, predicate: Callable[[Optional[str]], bool]) -> List[int]:
+        """维度列name的值满足predicate的行号；predicate对每个字典项只计算一次"""
+        column = self.column(name)
+        matches = [predicate(value) for value in column.dictionary]
+        return [i for i, code in enumerate(column.codes) if matches[code]]
+
+    def iter_rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, Dict[str, Optional[str]]]]:
+        """逐行产出原有的 {列名: {"value", "label"}} 嵌套结构"""
+        columns = self.columns
+        for i in range(start, self.row_count if stop is None else min(stop, self.row_count)):
+            yield {
+                column.name: {"value": column.text_at(i), "label": column.label_at(i)}
+                for column in columns
+            }
+
+    def to_rows(self) -> List[Dict[str, Dict[str, Optional[str]]]]:
+        """原有的嵌套字典行格式（按列批量生成单元格后再组装成行）"""
+        names = self.column_names
+        return [dict(zip(names, cells)) for cells in zip(*(column.cells() for column in self.columns))]
+
+    def iter_flat_rows(self) -> Iterator[Dict[str, Optional[str]]]:
+        """逐行产出 {列名: 文本值} 的扁平结构"""
+        names = self.column_names
+        for texts in zip(*(column.texts() for column in self.columns)):
+            yield dict(zip(names, texts))
+
+    def to_delimited(self, delimiter: str = ",") -> str:
+        """输出CSV/TSV文本；带标签的维度列额外输出一列 <列名>.label"""
+        buffer = io.StringIO()
+        self.write_delimited(buffer, delimiter)
+        return buffer.getvalue()
+
+    def write_delimited(self, stream: Any, delimiter: str = ",") -> None:
+        """将CSV/TSV逐行写入文本流（格式同to_delimited）"""
+        writer = csv.writer(stream, delimiter=delimiter, lineterminator="\n")
+        header, columns = [], []
+        for column in self.columns:
+            header.append(column.name)
+            columns.append(column.texts())
+            if column.is_dimension and any(label is not None for label in column.labels):
+                header.append(f"{column.name}.label")
+                columns.append([column.labels[code] for code in column.codes])
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
+
+    def to_columnar(self) -> Dict[str, Any]:
+        """列式JSON输出"""
+        return {
+            "row_count": self.row_count,
+            "columns": [column.to_json() for column in self.columns]
+        }
@@ -0,0 +1,127 @@
+"""
+统一的响应序列化层
+
+所有工具结果都通过 ResponseSerializer 编码为MCP文本内容，输出模式可配置：
+    pretty   缩进2格的JSON（默认，与早期版本一致）
+    compact  无缩进、紧凑分隔符
+安装了orjson时两种模式都使用orjson编码，否则使用标准库json。
+同时按工具统计结果字节数、线路字节数和编码耗时。
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+OUTPUT_MODES = ("pretty", "compact")
+
+
+def _default(value: Any) -> Any:
+    """json/orjson无法直接编码的类型"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResponseSerializer:
+    """工具结果与JSON-RPC消息的序列化器"""
+
+    def __init__(self, mode: Optional[str] = None):
+        mode = mode or os.getenv("MCP_ADSENSE_OUTPUT_MODE", "pretty")
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"不支持的输出模式: {mode}，可选值: {', '.join(OUTPUT_MODES)}")
+        self.mode = mode
+        self.encoder = "orjson" if orjson is not None else "json"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def dumps(self, payload: Any) -> str:
+        """按当前输出模式编码工具结果"""
+        if self.encoder == "orjson":
+            option = orjson.OPT_INDENT_2 if self.mode == "pretty" else 0
+            return orjson.dumps(payload, default=_default, option=option).decode("utf-8")
+        if self.mode == "compact":
+            return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_default)
+        return json.dumps(payload, ensure_ascii=False, indent=2, default=_default)
+
+    def dumps_message(self, message: Dict[str, Any]) -> str:
+        """编码JSON-RPC消息（始终紧凑单行）"""
+        if orjson is not None:
+            return orjson.dumps(message, default=_default).decode("utf-8")
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+    @contextmanager
+    def measure(self, tool: str) -> Iterator[None]:
+        """在上下文中执行的 text_result 调用计入指定工具的统计"""
+        previous = getattr(self._local, "tool", None)
+        self._local.tool = tool
+        try:
+            yield
+        finally:
+            self._local.tool = previous
+
+    @contextmanager
+    def capture(self) -> Iterator[None]:
+        """在上下文中 text_result 不编码，直接返回 {"payload", "extra_texts"}，供服务器内部组合多个工具结果"""
+        previous = getattr(self._local, "capture", False)
+        self._local.capture = True
+        try:
+            yield
+        finally:
+            self._local.capture = previous
+
+    def text_result(self, payload: Any, *extra_texts: str) -> Dict[str, Any]:
+        """将结果编码为MCP文本内容；extra_texts作为额外的文本项附加（例如CSV表格）"""
+        if getattr(self._local, "capture", False):
+            return {"payload": payload, "extra_texts": list(extra_texts)}
+        start = time.perf_counter()
+        text = self.dumps(payload)
+        elapsed = time.perf_counter() - start
+
+        content = [{"type": "text", "text": text}]
+        content.extend({"type": "text", "text": extra} for extra in extra_texts)
+        self._record(getattr(self._local, "tool", None), "payload",
+                     sum(len(item["text"].encode("utf-8")) for item in content), elapsed)
+        return {"content": content}
+
+    def record_wire(self, tool: Optional[str], nbytes: int, seconds: float) -> None:
+        """记录JSON-RPC响应写出时的字节数和编码耗时"""
+        self._record(tool, "wire", nbytes, seconds)
+
+    def _record(self, tool: Optional[str], kind: str, nbytes: int, seconds: float) -> None:
+        if not tool:
+            return
+        with self._lock:
+            stats = self._stats.setdefault(tool, {
+                "calls": 0,
+                "payload_bytes": 0,
+                "payload_encode_ms": 0.0,
+                "wire_bytes": 0,
+                "wire_encode_ms": 0.0
+            })
+            if kind == "payload":
+                stats["calls"] += 1
+            stats[f"{kind}_bytes"] += nbytes
+            stats[f"{kind}_encode_ms"] += seconds * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        """返回输出模式及各工具的字节数和编码耗时"""
+        with self._lock:
+            tools = {
+                tool: dict(values,
+                           payload_encode_ms=round(values["payload_encode_ms"], 3),
+                           wire_encode_ms=round(values["wire_encode_ms"], 3))
+                for tool, values in self._stats.items()
+            }
+        return {"mode": self.mode, "encoder": self.encoder, "tools": tools}
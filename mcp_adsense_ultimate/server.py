@@ -6,32 +6,175 @@ MCP AdSense 增强终极优化版服务器 - 包含所有AdSense功能
 
 import os
 import sys
+import time
 import json
-from typing import Any, Dict, List, Optional
-from datetime import datetime, timedelta
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import date, datetime, timedelta
 
-# Google AdSense imports
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from google.auth import default
-from google.oauth2.credentials import Credentials as UserCredentials
+from .batch_requests import batch_get
+from .account_metadata import AccountMetadataCache
+from .call_guard import CallGuard
+from .date_ranges import DATE_RANGES, parse_date, resolve_date_range, today_in
+from .discovery import build_adsense_service
+from .earnings_sync import EarningsStore
+from .inventory_index import KINDS as INVENTORY_KINDS, MATCH_MODES, InventoryIndex
+from .fan_out import ALL_ACCOUNTS, FAN_OUT_LIST_ACTIONS, add_account_column, merge_list_payloads, run_fan_out
+from .bulk_operations import BULK_ACTIONS, ListingCache, load_specs, run_bulk
+from .dispatcher import (DEFAULT_ASYNC_MAX_QUEUE, DEFAULT_ASYNC_MAX_WORKERS, DEFAULT_MAX_QUEUE, DEFAULT_MAX_WORKERS,
+                         JSONRPCDispatcher)
+from .pagination import Paginator
+from .report_aggregation import COMPARE_MODES, DERIVED_METRICS, aggregate, base_dimensions, base_metrics, comparison_span
+from .report_cache import ReportCache
+from .report_export import EXPORT_FORMATS, export_table, infer_format
+from .report_csv import TRANSPORTS, fetch_csv, parse_csv, resolve_transport, write_csv
+from .report_cursors import CursorExpiredError, CursorStore
+from .serialization import ResponseSerializer
+from .report_table import ReportTable
+from .report_sharding import SHARD_GRANULARITIES, check_shardable, merge_shard_reports, plan_shards, reorder_columns
+from .service_pool import AdSenseServicePool
+from .tool_registry import ToolRegistry
+from .http_transport import HttpTransport
+
+# list操作共享的分页参数
+PAGINATION_PROPERTIES = {
+    "page_size": {
+        "type": "integer",
+        "description": "list操作每页请求的条数（可选，最大10000）。服务器会自动跟随nextPageToken翻页获取全部结果"
+    },
+    "max_items": {
+        "type": "integer",
+        "description": "list操作最多返回的条数（可选）。达到上限后停止翻页，并在结果中标记truncated=true"
+    },
+    "prefetch": {
+        "type": "boolean",
+        "description": "list操作是否在处理当前页时后台预取下一页（可选，适合结果很多的账户）",
+        "default": False
+    }
+}
+
+# 批量创建/更新/删除操作共享的参数
+BULK_PROPERTIES = {
+    "specs": {
+        "type": "array",
+        "items": {"type": "object"},
+        "description": "批量操作的规格列表（对于bulk_create、bulk_patch、bulk_delete操作，与specs_file二选一）。字段：display_name，广告单元另有size、type、state；bulk_patch和bulk_delete需要ad_unit_id或channel_id"
+    },
+    "specs_file": {
+        "type": "string",
+        "description": "批量操作的规格文件路径（可选）。.csv文件首行为字段名，其余为JSON文件（对象列表或{\"specs\": [...]}）"
+    },
+    "qps": {
+        "type": "number",
+        "description": "批量操作每秒最多发起的API请求数（可选，默认读取环境变量MCP_ADSENSE_BULK_QPS，默认5）"
+    }
+}
+
+# 报告导出到文件的参数（get_reports 和 manage_saved_reports generate 共享）
+EXPORT_PROPERTIES = {
+    "output_file": {
+        "type": "string",
+        "description": "导出文件路径（可选）。指定时报告直接写入该文件而不通过结果文本返回，结果只包含文件路径、列类型（schema）和行数。CSV导出尽可能直接保存generateCsv的响应体"
+    },
+    "output_format": {
+        "type": "string",
+        "enum": list(EXPORT_FORMATS),
+        "description": "导出格式（可选，默认按output_file扩展名推断：.parquet为parquet，.arrow/.feather为Arrow IPC，其余为csv）。parquet和arrow需要安装pyarrow，未安装时改为导出CSV"
+    }
+}
+
+# 支持多账户并发调用的工具共享的参数
+ACCOUNT_IDS_PROPERTY = {
+    "account_ids": {
+        "oneOf": [
+            {"type": "array", "items": {"type": "string"}},
+            {"type": "string", "enum": ["*"]}
+        ],
+        "description": "多账户调用（可选）：账户ID列表，或\"*\"表示accounts.list返回的全部账户。各账户在有界线程池中并发执行，结果合并后每条记录带有account列，单个账户失败记录在errors中而不影响其他账户。支持get_reports、manage_ad_units list、manage_policy_issues list、manage_accounts list_alerts"
+    }
+}
 
 class MCPAdSenseEnhancedUltimateServer:
     """Google AdSense 增强终极优化版MCP服务器"""
     
     def __init__(self):
         self.account_id = os.getenv("GOOGLE_ADSENSE_ACCOUNT_ID")
-        self.default_ad_client_id = None  # 将存储默认的广告客户端ID
+        # 按账户缓存的广告客户端、默认客户端ID、时区和币种
+        self.account_metadata = AccountMetadataCache({
+            "ad_clients": self._load_ad_clients_metadata,
+            "account": self._load_account_metadata,
+            "currency": self._load_currency_metadata
+        })
+        # 所有API请求共享的限流、重试和熔断
+        self.call_guard = CallGuard()
+        # 服务对象使用的HTTP客户端（默认为线程间共享的keep-alive连接池）
+        self.http_transport = HttpTransport()
+        # 进程级服务池：每个凭据身份只构建一次服务对象
+        self.service_pool = AdSenseServicePool(
+            credentials_loader=self._get_credentials,
+            service_builder=lambda credentials: build_adsense_service(
+                http=self.http_transport.build(credentials), request_builder=self.call_guard.request_builder
+            ),
+            identity_resolver=self._get_credentials_identity,
+            refresh_margin=int(os.getenv("MCP_ADSENSE_TOKEN_REFRESH_MARGIN", "300")),
+            shared=self.http_transport.thread_safe
+        )
+        self.dispatcher = None  # 由调度器（stdio、--async或--http）在启动时注册
+        self.serializer = ResponseSerializer()
+        self.report_cache = ReportCache()
+        self.report_cursors = CursorStore()
+        self.earnings_store = EarningsStore()
+        # 报告分片并发拉取的线程池（线程按需创建）
+        self.shard_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("MCP_ADSENSE_SHARD_WORKERS", "4")),
+            thread_name_prefix="adsense-shard"
+        )
+        # 批量创建/更新/删除的线程池（实际速率由QPS预算限制）及其使用的列表缓存
+        self.bulk_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("MCP_ADSENSE_BULK_WORKERS", "8")),
+            thread_name_prefix="adsense-bulk"
+        )
+        self.listing_cache = ListingCache()
+        # 多账户调用的有界线程池
+        self.fan_out_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("MCP_ADSENSE_FAN_OUT_WORKERS", "8")),
+            thread_name_prefix="adsense-fan-out"
+        )
+        # 广告单元、渠道和网站的本地快照（后台刷新复用多账户线程池）
+        self.inventory = InventoryIndex(self._load_inventory, self.fan_out_executor)
+        # 工具注册表：定义、参数校验和分发
+        self.tools = self._register_tools()
         
         print("🎯 MCP AdSense 增强终极优化版 v1.0 已初始化", file=sys.stderr)
         print(f"   📊 账户ID: {self.account_id if self.account_id else '未设置'}", file=sys.stderr)
         print("   🚀 增强版 - 完整AdSense功能支持!", file=sys.stderr)
 
+    def _get_credentials_path(self) -> Optional[str]:
+        """获取凭证文件路径，优先使用GOOGLE_APPLICATION_CREDENTIALS，兼容GOOGLE_APPLICATION_CREDS"""
+        return os.getenv('GOOGLE_APPLICATION_CREDENTIALS') or os.getenv('GOOGLE_APPLICATION_CREDS')
+
+    def _get_credentials_identity(self):
+        """获取凭据身份及版本标识（文件修改时间），供服务池判断缓存是否失效"""
+        creds_path = self._get_credentials_path()
+        if creds_path:
+            try:
+                stat = os.stat(creds_path)
+                return creds_path, (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+        return "application_default", None
+
     def _get_credentials(self):
         """获取Google认证凭据，支持service_account和authorized_user两种类型"""
         try:
+            # Google认证库导入较慢，initialize和tools/list用不到，首次获取凭据时才导入
+            from google.auth import default
+            from google.oauth2 import service_account
+            from google.oauth2.credentials import Credentials as UserCredentials
+            
             # 优先使用标准的GOOGLE_APPLICATION_CREDENTIALS，兼容GOOGLE_APPLICATION_CREDS
-            creds_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS') or os.getenv('GOOGLE_APPLICATION_CREDS')
+            creds_path = self._get_credentials_path()
             
             if creds_path and os.path.exists(creds_path):
                 print(f"✅ 使用指定的认证文件: {creds_path}", file=sys.stderr)
@@ -105,16 +248,28 @@ class MCPAdSenseEnhancedUltimateServer:
             raise ValueError(f"无法获取认证凭据: {str(e)}")
 
     def _get_adsense_service(self):
-        """获取AdSense API服务对象"""
+        """获取AdSense API服务对象（从进程级服务池复用）"""
         try:
-            credentials, project = self._get_credentials()
-            service = build('adsense', 'v2', credentials=credentials)
-            return service
+            return self.service_pool.get_service()
         except Exception as e:
             raise ValueError(f"无法初始化AdSense服务: {str(e)}")
 
+    def _prewarm(self) -> None:
+        """后台导入Google客户端库、加载凭据并构建服务对象，首次tools/call不再承担这些耗时"""
+        try:
+            self._get_adsense_service()
+        except Exception as e:
+            print(f"⚠️ 预热AdSense服务失败: {str(e)}", file=sys.stderr)
+
     def handle_initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """处理MCP初始化请求"""
+        """处理MCP初始化请求，并在后台预热服务对象、预加载默认账户的元数据
+
+        MCP_ADSENSE_PREWARM=0 时不做任何后台工作，Google客户端库在首次tools/call时才导入。
+        """
+        if os.getenv("MCP_ADSENSE_PREWARM", "1") != "0":
+            self.fan_out_executor.submit(self._prewarm)
+            if self.account_id:
+                self.account_metadata.warm_up([self._clean_account_id(self.account_id)], self.fan_out_executor)
         return {
             "protocolVersion": "2024-11-05",
             "capabilities": {
@@ -137,7 +292,15 @@ class MCPAdSenseEnhancedUltimateServer:
         }
 
     def handle_tools_list(self) -> Dict[str, Any]:
-        """处理工具列表请求"""
+        """处理工具列表请求（注册表中构建一次的工具列表）"""
+        return self.tools.list_payload()
+
+    def tools_list_json(self) -> str:
+        """预先序列化的tools/list结果，调度器直接拼接到响应中"""
+        return self.tools.list_json(self.serializer.dumps_message)
+
+    def _tool_definitions(self) -> List[Dict[str, Any]]:
+        """MCP工具定义（名称、说明和inputSchema）"""
         tools = [
             # 账户管理工具
             {
@@ -155,7 +318,9 @@ class MCPAdSenseEnhancedUltimateServer:
                         "account_id": {
                             "type": "string",
                             "description": "账户ID（对于get、get_payments和list_alerts操作必需）。如果不提供，将自动使用环境变量GOOGLE_ADSENSE_ACCOUNT_ID的值"
-                        }
+                        },
+                        **ACCOUNT_IDS_PROPERTY,
+                        **PAGINATION_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -170,8 +335,8 @@ class MCPAdSenseEnhancedUltimateServer:
                     "properties": {
                         "action": {
                             "type": "string",
-                            "enum": ["list", "get", "create", "patch", "delete"],
-                            "description": "操作类型：list(列出广告单元), get(获取详情), create(创建广告单元), patch(更新广告单元), delete(删除广告单元)",
+                            "enum": ["list", "get", "create", "patch", "delete", "bulk_create", "bulk_patch", "bulk_delete"],
+                            "description": "操作类型：list(列出广告单元), get(获取详情), create(创建广告单元), patch(更新广告单元), delete(删除广告单元), bulk_create/bulk_patch/bulk_delete(按specs或specs_file批量操作，在QPS预算内并发执行；bulk_create跳过已存在的同名广告单元；广告单元没有删除接口，bulk_delete将其归档为ARCHIVED)",
                             "default": "list"
                         },
                         "account_id": {
@@ -186,6 +351,11 @@ class MCPAdSenseEnhancedUltimateServer:
                             "type": "string",
                             "description": "广告单元ID（对于get操作必需）"
                         },
+                        "ad_unit_ids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "广告单元ID列表（对于get操作可选）。提供时通过批量HTTP请求一次获取多个广告单元，结果和错误按ID分别返回"
+                        },
                         "ad_unit_name": {
                             "type": "string",
                             "description": "广告单元名称（对于create操作必需）"
@@ -204,7 +374,10 @@ class MCPAdSenseEnhancedUltimateServer:
                                     "SIZE_970_200", "SIZE_728_280", "SIZE_468_60", "SIZE_320_480", "RESPONSIVE"],
                             "description": "广告单元尺寸（对于create操作）",
                             "default": "RESPONSIVE"
-                        }
+                        },
+                        **BULK_PROPERTIES,
+                        **ACCOUNT_IDS_PROPERTY,
+                        **PAGINATION_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -225,8 +398,8 @@ class MCPAdSenseEnhancedUltimateServer:
                         },
                         "action": {
                             "type": "string",
-                            "enum": ["list", "get", "create", "patch", "delete"],
-                            "description": "操作类型：list(列出渠道), get(获取详情), create(创建渠道), patch(更新渠道), delete(删除渠道)",
+                            "enum": ["list", "get", "create", "patch", "delete", "bulk_create", "bulk_patch", "bulk_delete"],
+                            "description": "操作类型：list(列出渠道), get(获取详情), create(创建渠道), patch(更新渠道), delete(删除渠道), bulk_create/bulk_patch/bulk_delete(仅custom_channels，按specs或specs_file批量操作，在QPS预算内并发执行；bulk_create跳过已存在的同名渠道)",
                             "default": "list"
                         },
                         "account_id": {
@@ -241,10 +414,17 @@ class MCPAdSenseEnhancedUltimateServer:
                             "type": "string",
                             "description": "渠道ID（对于get、patch、delete操作必需）"
                         },
+                        "channel_ids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "渠道ID列表（对于get操作可选）。提供时通过批量HTTP请求一次获取多个渠道，结果和错误按ID分别返回"
+                        },
                         "channel_name": {
                             "type": "string",
                             "description": "渠道名称（对于create和patch操作可选）"
-                        }
+                        },
+                        **BULK_PROPERTIES,
+                        **PAGINATION_PROPERTIES
                     },
                     "required": ["channel_type", "action"]
                 }
@@ -300,6 +480,128 @@ class MCPAdSenseEnhancedUltimateServer:
                             "type": "string",
                             "enum": ["TODAY", "YESTERDAY", "MONTH_TO_DATE", "YEAR_TO_DATE", "LAST_7_DAYS", "LAST_30_DAYS"],
                             "description": "预定义的日期范围。可选值：TODAY(今天), YESTERDAY(昨天), MONTH_TO_DATE(本月至今), YEAR_TO_DATE(本年至今), LAST_7_DAYS(最近7天), LAST_30_DAYS(最近30天)。如果指定此参数，start_date和end_date将被忽略"
+                        },
+                        "cache": {
+                            "type": "string",
+                            "enum": ["use", "bypass", "refresh"],
+                            "description": "报告缓存模式：use(优先使用缓存), bypass(不读不写缓存), refresh(忽略已有缓存，重新请求并更新缓存)。历史日期范围的结果会被长期缓存，包含今天的范围只缓存几分钟",
+                            "default": "use"
+                        },
+                        "shard": {
+                            "type": "string",
+                            "enum": ["none", "day", "week", "month"],
+                            "description": "大日期范围分片：将日期范围按天/周/月拆分后并发请求，再按sort顺序合并为一个结果。适合跨度很长、维度很多的报告。要求dimensions包含DATE（按month分片时也可以是MONTH）。每个分片单独缓存，已结束的历史分片不会被重复请求",
+                            "default": "none"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["rows", "columnar", "csv", "tsv"],
+                            "description": "结果格式：rows(默认，每行为{列名: {value, label}}), columnar(列式，维度列为dictionary+codes字典编码，指标列为数值数组，适合大报告), csv/tsv(报告元信息之后附加一段CSV/TSV文本表格，体积最小)",
+                            "default": "rows"
+                        },
+                        **ACCOUNT_IDS_PROPERTY,
+                        "source": {
+                            "type": "string",
+                            "enum": ["auto", "api", "local"],
+                            "description": "数据来源：auto(默认，sync_earnings已同步的数据维度组合相同、指标包含在内且没有filters时，已最终确定的日期在本地查询，之后仍可能被修订的日期调用API并与本地数据合并，否则调用API), api(始终调用API), local(只在本地查询已同步的全部日期，未覆盖时返回错误)",
+                            "default": "auto"
+                        },
+                        "chunk_rows": {
+                            "type": "integer",
+                            "description": "分块返回（可选）：每块最多的行数。报告超过一块时只返回第一块，结果中的chunk.next_cursor用于获取下一块，每块只转换和序列化该块的行，适合数万行的大报告"
+                        },
+                        "cursor": {
+                            "type": "string",
+                            "description": "上一块结果中的chunk.next_cursor（可选）。指定时只返回该游标的下一块，其他参数被忽略。闲置的游标会在几分钟后过期"
+                        },
+                        "transport": {
+                            "type": "string",
+                            "enum": list(TRANSPORTS),
+                            "description": "报告下载方式：json(reports.generate), csv(reports.generateCsv，响应体积小，直接解析为列式表，不使用报告缓存和本地同步数据，不支持shard和account_ids), auto(默认，limit不小于阈值（环境变量MCP_ADSENSE_CSV_ROW_THRESHOLD，默认10000）或为0时使用csv，否则json)",
+                            "default": "auto"
+                        },
+                        **EXPORT_PROPERTIES
+                    },
+                    "required": []
+                }
+            },
+            
+            # 报告聚合工具
+            {
+                "name": "aggregate_report",
+                "description": "报告本地聚合 - 获取一次细粒度报告（例如DATE x COUNTRY_CODE x AD_UNIT_ID，按get_reports相同的方式使用报告缓存和本地同步数据；缓存中维度相同、未被limit截断、日期范围更长的报告（例如get_reports已获取的）也可直接使用），在本地计算分组汇总、TopN、周期对比和派生比率。CTR、RPM、CPC等由分组后的求和结果重新计算。同一细粒度报告上的连续聚合（按国家、按周、Top 10广告单元等）不会重复请求API。account_id将从环境变量GOOGLE_ADSENSE_ACCOUNT_ID自动获取",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "account_id": {
+                            "type": "string",
+                            "description": "账户ID（可选，将自动从环境变量GOOGLE_ADSENSE_ACCOUNT_ID获取）"
+                        },
+                        "group_by": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "分组维度（可选，为空时只计算合计）。可以是细粒度报告中的任意维度，以及由DATE派生的WEEK（周一开始）和MONTH。例如[\"COUNTRY_CODE\"]、[\"WEEK\"]、[\"AD_UNIT_ID\", \"AD_UNIT_NAME\"]"
+                        },
+                        "metrics": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": f"输出指标。可加指标（计数类、货币类，例如ESTIMATED_EARNINGS、CLICKS、PAGE_VIEWS、IMPRESSIONS、AD_REQUESTS）求和；派生指标由求和结果计算：{', '.join(DERIVED_METRICS)}",
+                            "default": ["ESTIMATED_EARNINGS", "PAGE_VIEWS", "CLICKS", "PAGE_VIEWS_RPM"]
+                        },
+                        "dimensions": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "细粒度报告的维度（可选，默认为group_by需要的维度）。对同一组细粒度维度做多次不同的聚合时指定相同的dimensions，之后的调用直接使用缓存的报告"
+                        },
+                        "start_date": {
+                            "type": "string",
+                            "description": "开始日期（格式：YYYY-MM-DD），与end_date一起使用"
+                        },
+                        "end_date": {
+                            "type": "string",
+                            "description": "结束日期（格式：YYYY-MM-DD），与start_date一起使用"
+                        },
+                        "date_range": {
+                            "type": "string",
+                            "enum": ["TODAY", "YESTERDAY", "MONTH_TO_DATE", "YEAR_TO_DATE", "LAST_7_DAYS", "LAST_30_DAYS"],
+                            "description": "预定义的日期范围，指定时忽略start_date和end_date"
+                        },
+                        "filters": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "细粒度报告的过滤器，格式同get_reports，例如['COUNTRY_CODE==US']"
+                        },
+                        "sort": {
+                            "type": "string",
+                            "description": "分组结果的排序字段，'-'前缀表示降序，例如'-ESTIMATED_EARNINGS'。默认按分组在报告中首次出现的顺序"
+                        },
+                        "top_n": {
+                            "type": "integer",
+                            "description": "排序后只返回前N组（可选）"
+                        },
+                        "compare": {
+                            "type": "string",
+                            "enum": list(COMPARE_MODES),
+                            "description": "周期对比：none(默认), previous_period(与紧邻之前的等长日期范围对比), previous_year(与去年同期对比)。每个指标额外输出 _previous、_delta 和 _delta_pct。对比时group_by不能包含DATE/WEEK/MONTH",
+                            "default": "none"
+                        },
+                        "cache": {
+                            "type": "string",
+                            "enum": ["use", "bypass", "refresh"],
+                            "description": "细粒度报告的缓存模式，同get_reports",
+                            "default": "use"
+                        },
+                        "source": {
+                            "type": "string",
+                            "enum": ["auto", "api", "local"],
+                            "description": "细粒度报告的数据来源，同get_reports（auto时优先使用sync_earnings同步的本地数据）",
+                            "default": "auto"
+                        },
+                        "shard": {
+                            "type": "string",
+                            "enum": ["none", "day", "week", "month"],
+                            "description": "细粒度报告的日期分片，同get_reports",
+                            "default": "none"
                         }
                     },
                     "required": []
@@ -326,7 +628,8 @@ class MCPAdSenseEnhancedUltimateServer:
                         "ad_client_id": {
                             "type": "string",
                             "description": "广告客户端ID（对于get操作必需）"
-                        }
+                        },
+                        **PAGINATION_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -352,7 +655,13 @@ class MCPAdSenseEnhancedUltimateServer:
                         "site_url": {
                             "type": "string",
                             "description": "网站标识符（对于get、approve和token_oauth_domain操作必需）。应该是从list操作返回的name字段中的站点标识部分，例如从'accounts/pub-xxx/sites/example.com'提取'example.com'"
-                        }
+                        },
+                        "site_urls": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "网站标识符列表（对于get操作可选）。提供时通过批量HTTP请求一次获取多个网站，结果和错误按标识符分别返回"
+                        },
+                        **PAGINATION_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -378,7 +687,14 @@ class MCPAdSenseEnhancedUltimateServer:
                         "policy_issue_id": {
                             "type": "string",
                             "description": "政策问题ID（对于get操作必需）。应该是从list操作返回的policy issue的完整name，或name中的ID部分"
-                        }
+                        },
+                        "policy_issue_ids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "政策问题ID列表（对于get操作可选）。提供时通过批量HTTP请求一次获取多个政策问题，结果和错误按ID分别返回"
+                        },
+                        **ACCOUNT_IDS_PROPERTY,
+                        **PAGINATION_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -404,28 +720,163 @@ class MCPAdSenseEnhancedUltimateServer:
                         "saved_report_id": {
                             "type": "string",
                             "description": "已保存报告ID（对于generate操作必需）。应该是从list操作返回的saved report的完整name，或name中的ID部分"
-                        }
+                        },
+                        "transport": {
+                            "type": "string",
+                            "enum": ["json", "csv"],
+                            "description": "generate的下载方式：json(saved.generate，默认), csv(saved.generateCsv，响应体积小，适合大报告)",
+                            "default": "json"
+                        },
+                        **EXPORT_PROPERTIES,
+                        **PAGINATION_PROPERTIES
                     },
                     "required": ["action"]
                 }
             },
             
+            # 报告缓存管理工具
+            {
+                "name": "manage_report_cache",
+                "description": "管理报告缓存 - 查看get_reports结果缓存的命中率、容量等统计，或清空缓存",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "action": {
+                            "type": "string",
+                            "enum": ["stats", "clear"],
+                            "description": "操作类型：stats(查看缓存统计), clear(清空内存和磁盘缓存)",
+                            "default": "stats"
+                        }
+                    },
+                    "required": []
+                }
+            },
+            
+            # 收入数据增量同步工具
+            {
+                "name": "sync_earnings",
+                "description": "收入数据增量同步 - 将报告数据同步到本地SQLite事实表（按日期和维度），之后get_reports可直接在本地回答已覆盖日期范围的查询。每次同步只拉取最终水位线之后的日期，并重新拉取AdSense仍可能修订的最近几天。account_id将从环境变量GOOGLE_ADSENSE_ACCOUNT_ID自动获取",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "action": {
+                            "type": "string",
+                            "enum": ["sync", "status", "delete"],
+                            "description": "操作类型：sync(增量同步), status(查看同步规格、水位线和行数), delete(删除同步规格及其数据)",
+                            "default": "sync"
+                        },
+                        "account_id": {
+                            "type": "string",
+                            "description": "账户ID（可选，将自动从环境变量GOOGLE_ADSENSE_ACCOUNT_ID获取）"
+                        },
+                        "dimensions": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "同步的维度列表（对于sync操作，必须包含DATE），默认[\"DATE\"]"
+                        },
+                        "metrics": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "同步的指标列表（对于sync操作），默认[\"ESTIMATED_EARNINGS\", \"PAGE_VIEWS\", \"CLICKS\", \"IMPRESSIONS\"]"
+                        },
+                        "start_date": {
+                            "type": "string",
+                            "description": "数据起始日期（格式：YYYY-MM-DD，可选）。首次同步默认回填最近90天，早于已同步数据时补齐之前的日期"
+                        },
+                        "spec_id": {
+                            "type": "string",
+                            "description": "同步规格ID（对于delete操作必需），可从status操作获取"
+                        }
+                    },
+                    "required": []
+                }
+            },
+            
+            # 库存检索工具
+            {
+                "name": "search_inventory",
+                "description": "库存检索 - 在本地快照中按名称（前缀/子串/精确）、状态、reportingDimensionId和URI模式查找广告单元、自定义渠道、URL渠道和网站，用于按名称查找ID而无需反复调用list。快照首次使用时由完整的分页列表构建，定期在后台刷新，create/patch/delete后自动更新。account_id将从环境变量GOOGLE_ADSENSE_ACCOUNT_ID自动获取",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "account_id": {
+                            "type": "string",
+                            "description": "账户ID（可选，将自动从环境变量GOOGLE_ADSENSE_ACCOUNT_ID获取）"
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "名称检索文本（不区分大小写）：广告单元和自定义渠道匹配displayName，网站匹配域名，URL渠道匹配URI模式"
+                        },
+                        "match": {
+                            "type": "string",
+                            "enum": list(MATCH_MODES),
+                            "description": "名称匹配方式：substring(包含), prefix(前缀), exact(完全相同)",
+                            "default": "substring"
+                        },
+                        "kinds": {
+                            "type": "array",
+                            "items": {"type": "string", "enum": list(INVENTORY_KINDS)},
+                            "description": "资源类型（可选，默认全部）：ad_units, custom_channels, url_channels, sites"
+                        },
+                        "state": {
+                            "type": "string",
+                            "description": "资源状态（可选），例如广告单元的ACTIVE/INACTIVE/ARCHIVED，网站的READY/GETTING_READY/REQUIRES_REVIEW"
+                        },
+                        "reporting_dimension_id": {
+                            "type": "string",
+                            "description": "报告维度ID（可选，精确匹配），例如'ca-pub-xxx:123456789'"
+                        },
+                        "uri_pattern": {
+                            "type": "string",
+                            "description": "URI通配符模式（可选），匹配URL渠道的uriPattern和网站域名，例如'*example.com*'"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "最多返回的记录数",
+                            "default": 50
+                        },
+                        "refresh": {
+                            "type": "boolean",
+                            "description": "检索前重新列出资源以刷新快照（可选）",
+                            "default": False
+                        }
+                    },
+                    "required": []
+                }
+            },
+            
             # 获取默认广告客户端ID工具
             {
                 "name": "get_default_ad_client_id",
-                "description": "获取默认的广告客户端ID - 自动获取账户中的第一个可用广告客户端ID",
+                "description": "获取默认的广告客户端ID - 自动获取账户中的第一个可用广告客户端ID，同时返回账户的广告客户端列表、时区和币种。结果按账户缓存",
                 "inputSchema": {
                     "type": "object",
                     "properties": {
                         "account_id": {
                             "type": "string",
                             "description": "账户ID（可选，将自动从环境变量GOOGLE_ADSENSE_ACCOUNT_ID获取）"
+                        },
+                        "refresh": {
+                            "type": "boolean",
+                            "description": "是否忽略缓存重新获取账户元数据（可选）。账户新增或变更广告客户端后使用",
+                            "default": False
                         }
                     },
                     "required": []
                 }
             },
             
+            # 服务器运行统计工具
+            {
+                "name": "get_server_stats",
+                "description": "获取服务器运行统计 - 包括AdSense服务池的命中、未命中、令牌刷新和失效次数，API调用的重试、限流速率和熔断状态，请求调度器的队列深度和并发数，以及各工具结果的字节数和编码耗时等",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {},
+                    "required": []
+                }
+            },
+            
             # 帮助工具
             {
                 "name": "get_help",
@@ -438,7 +889,7 @@ class MCPAdSenseEnhancedUltimateServer:
             }
         ]
         
-        return {"tools": tools}
+        return tools
 
     def _get_account_id(self, account_id: str = None) -> str:
         """获取账户ID，优先使用参数，其次使用环境变量。自动格式化账户ID为正确格式"""
@@ -464,6 +915,26 @@ class MCPAdSenseEnhancedUltimateServer:
         
         return None
 
+    def _text_result(self, payload: Any, *extra_texts: str) -> Dict[str, Any]:
+        """将结果编码为MCP文本内容（统一的序列化出口）"""
+        return self.serializer.text_result(payload, *extra_texts)
+
+    def _get_pagination_options(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """从工具参数中提取分页选项"""
+        return {
+            "page_size": arguments.get("page_size"),
+            "max_items": arguments.get("max_items"),
+            "prefetch": bool(arguments.get("prefetch", False))
+        }
+
+    def _get_bulk_options(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """从工具参数中提取批量操作选项"""
+        return {
+            "specs": arguments.get("specs"),
+            "specs_file": arguments.get("specs_file"),
+            "qps": arguments.get("qps")
+        }
+
     def _clean_account_id(self, account_id: str) -> str:
         """清理账户ID，确保格式正确，去掉重复的accounts/前缀"""
         if not account_id:
@@ -471,322 +942,580 @@ class MCPAdSenseEnhancedUltimateServer:
         # 去掉重复的accounts/前缀
         return account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
 
-    def _get_default_ad_client_id(self, account_id: str) -> str:
-        """获取默认的广告客户端ID"""
+    @staticmethod
+    def _describe_ad_unit(ad_unit: Dict[str, Any]) -> Dict[str, Any]:
+        """get操作返回的广告单元字段"""
+        return {
+            "name": ad_unit.get('name'),
+            "displayName": ad_unit.get('displayName'),
+            "adUnitId": ad_unit.get('adUnitId'),
+            "state": ad_unit.get('state'),
+            "contentAdsSettings": ad_unit.get('contentAdsSettings', {}),
+            "reportingDimensionId": ad_unit.get('reportingDimensionId')
+        }
+
+    @staticmethod
+    def _describe_custom_channel(channel: Dict[str, Any]) -> Dict[str, Any]:
+        """get操作返回的自定义渠道字段"""
+        return {
+            "name": channel.get('name'),
+            "displayName": channel.get('displayName'),
+            "customChannelId": channel.get('customChannelId'),
+            "reportingDimensionId": channel.get('reportingDimensionId')
+        }
+
+    @staticmethod
+    def _describe_url_channel(channel: Dict[str, Any]) -> Dict[str, Any]:
+        """get操作返回的URL渠道字段"""
+        return {
+            "name": channel.get('name'),
+            "uriPattern": channel.get('uriPattern'),
+            "reportingDimensionId": channel.get('reportingDimensionId')
+        }
+
+    @staticmethod
+    def _describe_site(site: Dict[str, Any]) -> Dict[str, Any]:
+        """get操作返回的网站字段"""
+        return {
+            "name": site.get('name'),
+            "reportingDimensionId": site.get('reportingDimensionId'),
+            "uriPattern": site.get('uriPattern'),
+            "state": site.get('state')
+        }
+
+    @staticmethod
+    def _describe_policy_issue(policy_issue: Dict[str, Any]) -> Dict[str, Any]:
+        """get操作返回的政策问题字段"""
+        return {
+            "name": policy_issue.get('name'),
+            "reportingDimensionId": policy_issue.get('reportingDimensionId'),
+            "uriPattern": policy_issue.get('uriPattern'),
+            "actionable": policy_issue.get('actionable'),
+            "issue": policy_issue.get('issue')
+        }
+
+    def _load_ad_clients_metadata(self, clean_account_id: str) -> Dict[str, Any]:
+        """加载账户的广告客户端列表，第一个 ca-pub- 客户端作为默认客户端"""
+        service = self._get_adsense_service()
+        ad_clients = [
+            {
+                "name": client.get('name'),
+                "productCode": client.get('productCode'),
+                "state": client.get('state')
+            }
+            for client in Paginator(service.accounts().adclients().list, 'adClients',
+                                    parent=f"accounts/{clean_account_id}")
+        ]
+        default_client_id = next(
+            (client_id for client_id in (client["name"].split('/')[-1] for client in ad_clients if client["name"])
+             if client_id.startswith('ca-pub-')),
+            None
+        )
+        return {"ad_clients": ad_clients, "default_ad_client_id": default_client_id}
+
+    def _load_account_metadata(self, clean_account_id: str) -> Dict[str, Any]:
+        """加载账户显示名称和时区（accounts.get）"""
+        service = self._get_adsense_service()
+        account = service.accounts().get(name=f"accounts/{clean_account_id}").execute()
+        return {
+            "display_name": account.get('displayName'),
+            "time_zone": (account.get('timeZone') or {}).get('id')
+        }
+
+    def _load_currency_metadata(self, clean_account_id: str) -> Dict[str, Any]:
+        """加载账户币种（accounts.get不包含币种，取自报告收入列的currencyCode）"""
+        service = self._get_adsense_service()
+        report = service.accounts().reports().generate(
+            account=f"accounts/{clean_account_id}",
+            dateRange="TODAY",
+            metrics=["ESTIMATED_EARNINGS"],
+            limit=1
+        ).execute()
+        return {"currency_code": self._currency_from_headers(report.get("headers"))}
+
+    @staticmethod
+    def _currency_from_headers(headers: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+        return next((header.get("currencyCode") for header in headers or [] if header.get("currencyCode")), None)
+
+    def _get_default_ad_client_id(self, account_id: str, refresh: bool = False) -> str:
+        """获取账户的默认广告客户端ID（按账户缓存）"""
         try:
-            if self.default_ad_client_id:
-                return self.default_ad_client_id
-                
-            service = self._get_adsense_service()
-            clean_account_id = self._clean_account_id(account_id)
-            
-            # 获取广告客户端列表
-            ad_clients = service.accounts().adclients().list(
-                parent=f"accounts/{clean_account_id}"
-            ).execute()
-            
-            # 找到第一个可用的广告客户端
-            for client in ad_clients.get('adClients', []):
-                client_id = client.get('name', '').split('/')[-1]  # 提取ca-pub-xxx部分
-                if client_id and client_id.startswith('ca-pub-'):
-                    self.default_ad_client_id = client_id
-                    return client_id
-            
-            return None
+            metadata = self.account_metadata.get(self._clean_account_id(account_id), "ad_clients", refresh)
+            return metadata["default_ad_client_id"]
         except Exception as e:
             print(f"⚠️ 获取默认广告客户端ID失败: {str(e)}", file=sys.stderr)
             return None
 
-    def get_default_ad_client_id(self, account_id: str = None) -> Dict[str, Any]:
-        """获取默认的广告客户端ID"""
+    def _account_time_zone(self, account_id: str) -> Optional[str]:
+        """账户时区（accounts.get 的 timeZone.id，按账户缓存），获取失败时返回None"""
+        try:
+            return self.account_metadata.get(self._clean_account_id(account_id), "account").get("time_zone")
+        except Exception as e:
+            print(f"⚠️ 获取账户时区失败，按本机日期计算: {str(e)}", file=sys.stderr)
+            return None
+
+    def _account_today(self, account_id: str) -> date:
+        """账户时区中的今天；AdSense按账户时区划分报告日期，日期范围、缓存TTL和增量同步都以此为准"""
+        return today_in(self._account_time_zone(account_id))
+
+    def _resolve_report_dates(self, account_id: str, date_range: Optional[str], start_date: Optional[str],
+                              end_date: Optional[str]) -> Tuple[Tuple[date, date], Optional[str]]:
+        """按账户时区将报告日期范围换算为具体日期，返回 (日期范围, 时区)
+
+        自定义日期与时区无关，不查询账户；dateRange不合法时在查询账户之前报错。
+        """
+        if not date_range or date_range == "CUSTOM":
+            return resolve_date_range(date_range, start_date, end_date), None
+        if date_range not in DATE_RANGES:
+            raise ValueError(f"不支持的日期范围: {date_range}，可选: {', '.join(DATE_RANGES)}")
+        time_zone = self._account_time_zone(account_id)
+        return resolve_date_range(date_range, today=today_in(time_zone)), time_zone
+
+    def get_default_ad_client_id(self, account_id: str = None, refresh: bool = False) -> Dict[str, Any]:
+        """获取默认的广告客户端ID及账户元数据"""
         try:
             # 获取账户ID
             if not account_id:
                 account_id = self._get_account_id()
                 if not account_id:
-                    return {
+                    return self._text_result({
                         "success": False,
                         "error": "未提供账户ID，且环境变量GOOGLE_ADSENSE_ACCOUNT_ID未设置"
-                    }
+                    })
             
-            # 获取默认客户端ID
-            default_client_id = self._get_default_ad_client_id(account_id)
+            metadata = self.account_metadata.get_all(self._clean_account_id(account_id), refresh)
+            default_client_id = metadata.get("default_ad_client_id")
             
             if not default_client_id:
-                return {
+                return self._text_result({
                     "success": False,
-                    "error": "无法获取默认广告客户端ID，请检查账户是否有可用的广告客户端"
-                }
+                    "error": "无法获取默认广告客户端ID，请检查账户是否有可用的广告客户端",
+                    "metadata": metadata
+                })
             
-            return {
+            return self._text_result({
                 "success": True,
                 "default_ad_client_id": default_client_id,
+                "metadata": metadata,
                 "message": f"默认广告客户端ID: {default_client_id}",
                 "usage": f"在调用manage_ad_units或manage_channels时，可以使用此ID作为ad_client_id参数"
-            }
+            })
             
         except Exception as e:
-            return {
+            return self._text_result({
                 "success": False,
                 "error": f"获取默认广告客户端ID失败: {str(e)}"
-            }
+            })
 
     def handle_tools_call(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """处理工具调用请求"""
+        with self.serializer.measure(name):
+            return self._call_tool(name, arguments)
+
+    def _call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """按工具名从注册表分发调用，调用前按inputSchema校验并转换参数"""
+        tool = self.tools.get(name)
+        if tool is None:
+            return {"error": f"Unknown tool: {name}"}
+        start = time.perf_counter()
+        arguments, error = tool.bind(arguments)
         try:
+            if error:
+                return self._text_result({"success": False, "error": error})
             # 获取账户ID，优先使用参数，其次使用环境变量
             account_id = self._get_account_id(arguments.get("account_id"))
+            pagination = self._get_pagination_options(arguments)
             
-            if name == "get_help":
-                return self.get_help()
-            elif name == "manage_accounts":
-                return self.manage_accounts(
-                    arguments.get("action", "list"),
-                    account_id
-                )
-            elif name == "manage_ad_units":
-                return self.manage_ad_units(
-                    arguments.get("action", "list"),
-                    account_id,
-                    arguments.get("ad_client_id"),
-                    arguments.get("ad_unit_id"),
-                    arguments.get("ad_unit_name"),
-                    arguments.get("ad_unit_type", "DISPLAY"),
-                    arguments.get("size", "RESPONSIVE")
-                )
-            elif name == "manage_channels":
-                return self.manage_channels(
-                    arguments.get("channel_type", "url_channels"),
-                    arguments.get("action", "list"),
-                    account_id,
-                    arguments.get("ad_client_id"),
-                    arguments.get("channel_id"),
-                    arguments.get("channel_name")
-                )
-            elif name == "get_reports":
-                return self.get_reports(
-                    account_id,
-                    arguments.get("start_date"),
-                    arguments.get("end_date"),
-                    arguments.get("metrics"),
-                    arguments.get("dimensions"),
-                    arguments.get("filters"),
-                    arguments.get("sort", "DATE"),
-                    arguments.get("limit", 100),
-                    arguments.get("date_range")
-                )
-            elif name == "manage_ad_clients":
-                return self.manage_ad_clients(
-                    arguments.get("action", "list"),
-                    account_id,
-                    arguments.get("ad_client_id")
-                )
-            elif name == "manage_sites":
-                return self.manage_sites(
-                    arguments.get("action", "list"),
-                    account_id,
-                    arguments.get("site_url")
-                )
-            elif name == "manage_policy_issues":
-                return self.manage_policy_issues(
-                    arguments.get("action", "list"),
-                    account_id,
-                    arguments.get("policy_issue_id")
-                )
-            elif name == "manage_saved_reports":
-                return self.manage_saved_reports(
-                    arguments.get("action", "list"),
-                    account_id,
-                    arguments.get("saved_report_id")
-                )
-            elif name == "get_default_ad_client_id":
-                return self.get_default_ad_client_id(account_id)
-            else:
-                return {"error": f"Unknown tool: {name}"}
+            if arguments.get("account_ids") and name != "get_reports":
+                return self._fan_out_tool(name, arguments)
+            return tool.handler(arguments, account_id, pagination)
         except Exception as e:
             return {"error": str(e)}
+        finally:
+            self.tools.record(name, time.perf_counter() - start, invalid=error is not None)
 
-    def get_help(self) -> Dict[str, Any]:
-        """获取帮助信息"""
+    def _tool_handlers(self) -> Dict[str, Callable[[Dict[str, Any], str, Dict[str, Any]], Dict[str, Any]]]:
+        """各工具的参数绑定：handler(参数, 账户ID, 分页选项)"""
         return {
-            "content": [
-                {
-                    "type": "text",
-                    "text": json.dumps({
-                        "success": True,
-                        "message": "AdSense增强终极优化版MCP服务器帮助",
-                        "data": {
-                            "server": "🎯 MCP AdSense 增强终极优化版",
-                            "version": "1.0.0",
-                            "total_functions": 8,
-                            "tools": [
-                                {"name": "manage_accounts", "description": "账户管理 - 账户列表、详情、付款信息、警报"},
-                                {"name": "manage_ad_units", "description": "广告单元管理 - 列出、获取、创建广告单元"},
-                                {"name": "manage_channels", "description": "渠道管理 - URL渠道、自定义渠道管理"},
-                                {"name": "get_reports", "description": "报告分析 - 性能报告、收益报告等多维度分析"},
-                                {"name": "manage_ad_clients", "description": "广告客户端管理 - 广告客户端列表和详情"},
-                                {"name": "manage_sites", "description": "网站管理 - 网站列表、批准、OAuth令牌"},
-                                {"name": "manage_policy_issues", "description": "政策问题管理 - 政策问题列表和详情"},
-                                {"name": "manage_saved_reports", "description": "已保存报告管理 - 列出和生成已保存报告"},
-                                {"name": "get_default_ad_client_id", "description": "获取默认广告客户端ID - 自动获取账户中的第一个可用广告客户端ID"},
-                                {"name": "get_help", "description": "帮助信息"}
-                            ],
-                            "metrics": {
-                                "available": "支持所有AdSense API v2官方指标（60+个），包括：收入类、展示类、点击类、请求类、浏览量类、CTR类、RPM类、CPI类等。完整列表见：https://developers.google.com/adsense/management/metrics-dimensions",
-                                "description": "常用指标类别：\n- 收入：ESTIMATED_EARNINGS(估算收入), TOTAL_EARNINGS(总收入)\n- 展示：IMPRESSIONS, INDIVIDUAL_AD_IMPRESSIONS\n- 点击：CLICKS\n- 浏览：PAGE_VIEWS, WEBSEARCH_RESULT_PAGES\n- 请求：AD_REQUESTS, MATCHED_AD_REQUESTS\n- CTR：PAGE_VIEWS_CTR, IMPRESSIONS_CTR, MATCHED_AD_REQUESTS_CTR等\n- RPM：PAGE_VIEWS_RPM, IMPRESSIONS_RPM, MATCHED_AD_REQUESTS_RPM等\n- CPI：COST_PER_CLICK\n完整列表请访问官方文档"
-                            },
-                            "dimensions": {
-                                "available": "支持所有AdSense API v2官方维度（50+个），包括：账户、客户端、广告单元、日期、国家地区、平台、广告格式、渠道、产品、主机等。完整列表见：https://developers.google.com/adsense/management/metrics-dimensions",
-                                "description": "常用维度类别：\n- 日期：DATE, MONTH, WEEK\n- 广告单元：AD_UNIT_ID, AD_UNIT_NAME, AD_UNIT_SIZE_CODE/NAME\n- 客户端：AD_CLIENT_ID, AD_CLIENT_NAME\n- 国家地区：COUNTRY_CODE/NAME, REGION_CODE/NAME, CITY_CODE/NAME\n- 平台：CONTENT_PLATFORM_CODE/NAME, DEVICE_CATEGORY_NAME, OS_NAME\n- 广告格式：AD_FORMAT_CODE/NAME, AD_PLACEMENT_CODE/NAME\n- 渠道：CUSTOM_CHANNEL_ID, URL_CHANNEL_ID\n- 产品：PRODUCT_NAME\n- 主机：HOST_NAME\n完整列表请访问官方文档"
-                            },
-                            "usage_tips": [
-                                "使用 manage_accounts 管理账户信息",
-                                "使用 manage_ad_units 管理广告单元",
-                                "使用 manage_channels 管理渠道和域名",
-                                "使用 get_reports 获取性能报告",
-                                "使用 manage_ad_clients 查看广告客户端",
-                                "所有操作都需要先列出账户获取account_id"
-                            ]
-                        },
-                        "timestamp": datetime.now().isoformat()
-                    }, ensure_ascii=False, indent=2)
-                }
-            ]
+            "get_help": lambda arguments, account_id, pagination: self.get_help(),
+            "manage_accounts": lambda arguments, account_id, pagination: self.manage_accounts(
+                arguments.get("action", "list"),
+                account_id,
+                pagination
+            ),
+            "manage_ad_units": lambda arguments, account_id, pagination: self.manage_ad_units(
+                arguments.get("action", "list"),
+                account_id,
+                arguments.get("ad_client_id"),
+                arguments.get("ad_unit_id"),
+                arguments.get("ad_unit_name"),
+                arguments.get("ad_unit_type", "DISPLAY"),
+                arguments.get("size", "RESPONSIVE"),
+                pagination,
+                arguments.get("ad_unit_ids"),
+                self._get_bulk_options(arguments)
+            ),
+            "manage_channels": lambda arguments, account_id, pagination: self.manage_channels(
+                arguments.get("channel_type", "url_channels"),
+                arguments.get("action", "list"),
+                account_id,
+                arguments.get("ad_client_id"),
+                arguments.get("channel_id"),
+                arguments.get("channel_name"),
+                pagination,
+                arguments.get("channel_ids"),
+                self._get_bulk_options(arguments)
+            ),
+            "get_reports": lambda arguments, account_id, pagination: self.get_reports(
+                account_id,
+                arguments.get("start_date"),
+                arguments.get("end_date"),
+                arguments.get("metrics"),
+                arguments.get("dimensions"),
+                arguments.get("filters"),
+                arguments.get("sort", "DATE"),
+                arguments.get("limit", 100),
+                arguments.get("date_range"),
+                arguments.get("cache", "use"),
+                arguments.get("shard", "none"),
+                arguments.get("format", "rows"),
+                arguments.get("source", "auto"),
+                arguments.get("account_ids"),
+                arguments.get("chunk_rows"),
+                arguments.get("cursor"),
+                arguments.get("transport", "auto"),
+                arguments.get("output_file"),
+                arguments.get("output_format")
+            ),
+            "aggregate_report": lambda arguments, account_id, pagination: self.aggregate_report(
+                account_id,
+                arguments.get("group_by"),
+                arguments.get("metrics"),
+                arguments.get("dimensions"),
+                arguments.get("start_date"),
+                arguments.get("end_date"),
+                arguments.get("date_range"),
+                arguments.get("filters"),
+                arguments.get("sort"),
+                arguments.get("top_n"),
+                arguments.get("compare", "none"),
+                arguments.get("cache", "use"),
+                arguments.get("source", "auto"),
+                arguments.get("shard", "none")
+            ),
+            "manage_ad_clients": lambda arguments, account_id, pagination: self.manage_ad_clients(
+                arguments.get("action", "list"),
+                account_id,
+                arguments.get("ad_client_id"),
+                pagination
+            ),
+            "manage_sites": lambda arguments, account_id, pagination: self.manage_sites(
+                arguments.get("action", "list"),
+                account_id,
+                arguments.get("site_url"),
+                pagination,
+                arguments.get("site_urls")
+            ),
+            "manage_policy_issues": lambda arguments, account_id, pagination: self.manage_policy_issues(
+                arguments.get("action", "list"),
+                account_id,
+                arguments.get("policy_issue_id"),
+                pagination,
+                arguments.get("policy_issue_ids")
+            ),
+            "manage_saved_reports": lambda arguments, account_id, pagination: self.manage_saved_reports(
+                arguments.get("action", "list"),
+                account_id,
+                arguments.get("saved_report_id"),
+                pagination,
+                arguments.get("transport", "json"),
+                arguments.get("output_file"),
+                arguments.get("output_format")
+            ),
+            "get_default_ad_client_id": lambda arguments, account_id, pagination: self.get_default_ad_client_id(account_id, bool(arguments.get("refresh", False))),
+            "get_server_stats": lambda arguments, account_id, pagination: self.get_server_stats(),
+            "manage_report_cache": lambda arguments, account_id, pagination: self.manage_report_cache(arguments.get("action", "stats")),
+            "search_inventory": lambda arguments, account_id, pagination: self.search_inventory(
+                account_id,
+                arguments.get("query"),
+                arguments.get("match", "substring"),
+                arguments.get("kinds"),
+                arguments.get("state"),
+                arguments.get("reporting_dimension_id"),
+                arguments.get("uri_pattern"),
+                arguments.get("limit", 50),
+                bool(arguments.get("refresh", False))
+            ),
+            "sync_earnings": lambda arguments, account_id, pagination: self.sync_earnings(
+                arguments.get("action", "sync"),
+                account_id,
+                arguments.get("dimensions"),
+                arguments.get("metrics"),
+                arguments.get("start_date"),
+                arguments.get("spec_id")
+            )
         }
 
-    def manage_accounts(self, action: str, account_id: str = None) -> Dict[str, Any]:
-        """管理AdSense账户"""
-        try:
-            service = self._get_adsense_service()
-            
+    def _register_tools(self) -> ToolRegistry:
+        """注册全部工具（定义与参数绑定按名称对应）"""
+        handlers = self._tool_handlers()
+        registry = ToolRegistry()
+        for definition in self._tool_definitions():
+            registry.register(definition["name"], definition["description"], definition["inputSchema"],
+                              handlers.pop(definition["name"]))
+        if handlers:
+            raise RuntimeError(f"以下工具缺少定义: {', '.join(handlers)}")
+        return registry
+
+    def get_help(self) -> Dict[str, Any]:
+        """获取帮助信息"""
+        return self._text_result({
+            "success": True,
+            "message": "AdSense增强终极优化版MCP服务器帮助",
+            "data": {
+                "server": "🎯 MCP AdSense 增强终极优化版",
+                "version": "1.0.0",
+                "total_functions": 8,
+                "tools": [
+                    {"name": "manage_accounts", "description": "账户管理 - 账户列表、详情、付款信息、警报"},
+                    {"name": "manage_ad_units", "description": "广告单元管理 - 列出、获取、创建广告单元"},
+                    {"name": "manage_channels", "description": "渠道管理 - URL渠道、自定义渠道管理"},
+                    {"name": "get_reports", "description": "报告分析 - 性能报告、收益报告等多维度分析"},
+                    {"name": "aggregate_report", "description": "报告本地聚合 - 在细粒度报告上计算分组汇总、TopN、周期对比和派生比率"},
+                    {"name": "manage_ad_clients", "description": "广告客户端管理 - 广告客户端列表和详情"},
+                    {"name": "manage_sites", "description": "网站管理 - 网站列表、批准、OAuth令牌"},
+                    {"name": "manage_policy_issues", "description": "政策问题管理 - 政策问题列表和详情"},
+                    {"name": "manage_saved_reports", "description": "已保存报告管理 - 列出和生成已保存报告"},
+                    {"name": "get_default_ad_client_id", "description": "获取默认广告客户端ID - 自动获取账户中的第一个可用广告客户端ID"},
+                    {"name": "manage_report_cache", "description": "报告缓存管理 - 查看缓存统计、清空缓存"},
+                    {"name": "sync_earnings", "description": "收入数据增量同步 - 同步到本地事实表，get_reports可直接在本地查询"},
+                    {"name": "search_inventory", "description": "库存检索 - 在本地快照中按名称、状态、报告维度ID或URI模式查找广告单元、渠道和网站"},
+                    {"name": "get_server_stats", "description": "服务器运行统计 - 服务池命中/未命中/刷新计数、API重试与熔断状态"},
+                    {"name": "get_help", "description": "帮助信息"}
+                ],
+                "metrics": {
+                    "available": "支持所有AdSense API v2官方指标（60+个），包括：收入类、展示类、点击类、请求类、浏览量类、CTR类、RPM类、CPI类等。完整列表见：https://developers.google.com/adsense/management/metrics-dimensions",
+                    "description": "常用指标类别：\n- 收入：ESTIMATED_EARNINGS(估算收入), TOTAL_EARNINGS(总收入)\n- 展示：IMPRESSIONS, INDIVIDUAL_AD_IMPRESSIONS\n- 点击：CLICKS\n- 浏览：PAGE_VIEWS, WEBSEARCH_RESULT_PAGES\n- 请求：AD_REQUESTS, MATCHED_AD_REQUESTS\n- CTR：PAGE_VIEWS_CTR, IMPRESSIONS_CTR, MATCHED_AD_REQUESTS_CTR等\n- RPM：PAGE_VIEWS_RPM, IMPRESSIONS_RPM, MATCHED_AD_REQUESTS_RPM等\n- CPI：COST_PER_CLICK\n完整列表请访问官方文档"
+                },
+                "dimensions": {
+                    "available": "支持所有AdSense API v2官方维度（50+个），包括：账户、客户端、广告单元、日期、国家地区、平台、广告格式、渠道、产品、主机等。完整列表见：https://developers.google.com/adsense/management/metrics-dimensions",
+                    "description": "常用维度类别：\n- 日期：DATE, MONTH, WEEK\n- 广告单元：AD_UNIT_ID, AD_UNIT_NAME, AD_UNIT_SIZE_CODE/NAME\n- 客户端：AD_CLIENT_ID, AD_CLIENT_NAME\n- 国家地区：COUNTRY_CODE/NAME, REGION_CODE/NAME, CITY_CODE/NAME\n- 平台：CONTENT_PLATFORM_CODE/NAME, DEVICE_CATEGORY_NAME, OS_NAME\n- 广告格式：AD_FORMAT_CODE/NAME, AD_PLACEMENT_CODE/NAME\n- 渠道：CUSTOM_CHANNEL_ID, URL_CHANNEL_ID\n- 产品：PRODUCT_NAME\n- 主机：HOST_NAME\n完整列表请访问官方文档"
+                },
+                "usage_tips": [
+                    "使用 manage_accounts 管理账户信息",
+                    "使用 manage_ad_units 管理广告单元",
+                    "使用 manage_channels 管理渠道和域名",
+                    "使用 get_reports 获取性能报告",
+                    "对同一份数据做多种切分（按国家、按周、Top N）时使用 aggregate_report，只获取一次细粒度报告",
+                    "使用 manage_ad_clients 查看广告客户端",
+                    "按名称查找广告单元、渠道或网站的ID时使用 search_inventory，无需反复调用list",
+                    "get_reports、manage_ad_units list、manage_policy_issues list、manage_accounts list_alerts 支持 account_ids 参数并发查询多个账户",
+                    "所有操作都需要先列出账户获取account_id"
+                ]
+            },
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def get_server_stats(self) -> Dict[str, Any]:
+        """获取服务器运行统计"""
+        return self._text_result({
+            "success": True,
+            "service_pool": self.service_pool.stats(),
+            "tools": self.tools.stats(),
+            "http_transport": self.http_transport.stats(),
+            "api_calls": self.call_guard.stats(),
+            "account_metadata": self.account_metadata.stats(),
+            "report_cursors": self.report_cursors.stats(),
+            "inventory": self.inventory.stats(),
+            "dispatcher": self.dispatcher.stats() if self.dispatcher else None,
+            "serialization": self.serializer.stats(),
+            "earnings_sync": self.earnings_store.stats(),
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def manage_report_cache(self, action: str = "stats") -> Dict[str, Any]:
+        """管理报告缓存"""
+        if action == "clear":
+            self.report_cache.clear()
+            payload = {"success": True, "action": "clear", "message": "报告缓存已清空"}
+        elif action == "stats":
+            payload = {"success": True, "action": "stats", "stats": self.report_cache.stats()}
+        else:
+            payload = {"success": False, "error": f"不支持的操作: {action}"}
+        
+        return self._text_result(payload)
+
+    def _load_inventory(self, clean_account_id: str, kind: str) -> List[Dict[str, Any]]:
+        """列出账户的一类库存资源（跨全部广告客户端），供库存索引构建快照"""
+        service = self._get_adsense_service()
+        if kind == "sites":
+            return list(Paginator(service.accounts().sites().list, 'sites', parent=f"accounts/{clean_account_id}"))
+        
+        adclients = service.accounts().adclients()
+        list_method, items_key = {
+            "ad_units": (lambda: adclients.adunits().list, 'adUnits'),
+            "custom_channels": (lambda: adclients.customchannels().list, 'customChannels'),
+            "url_channels": (lambda: adclients.urlchannels().list, 'urlChannels')
+        }[kind]
+        items = []
+        for client in self.account_metadata.get(clean_account_id, "ad_clients")["ad_clients"]:
+            # 广告单元只存在于AdSense for Content客户端
+            if kind == "ad_units" and client.get("productCode") != "AFC":
+                continue
+            items.extend(Paginator(list_method(), items_key, parent=client["name"]))
+        return items
+
+    def search_inventory(self, account_id: str, query: str = None, match: str = "substring",
+                         kinds: List[str] = None, state: str = None, reporting_dimension_id: str = None,
+                         uri_pattern: str = None, limit: int = 50, refresh: bool = False) -> Dict[str, Any]:
+        """在本地库存快照中检索广告单元、渠道和网站"""
+        try:
+            if not account_id:
+                return self._text_result({
+                    "success": False,
+                    "error": "缺少必需参数: account_id",
+                    "hint": "请提供 account_id 参数或设置环境变量 GOOGLE_ADSENSE_ACCOUNT_ID"
+                })
+            
+            result = self.inventory.search(
+                self._clean_account_id(account_id), query, match, kinds, state,
+                reporting_dimension_id, uri_pattern, limit, refresh
+            )
+            return self._text_result({"success": True, **result})
+        
+        except Exception as e:
+            return self._text_result({"success": False, "error": str(e)})
+
+    def sync_earnings(self, action: str, account_id: str, dimensions: List[str] = None,
+                      metrics: List[str] = None, start_date: str = None, spec_id: str = None) -> Dict[str, Any]:
+        """收入数据增量同步"""
+        try:
+            clean_account_id = self._clean_account_id(account_id)
+            if action == "sync":
+                dimensions = dimensions or ["DATE"]
+                metrics = metrics or ["ESTIMATED_EARNINGS", "PAGE_VIEWS", "CLICKS", "IMPRESSIONS"]
+                api_calls = []
+                
+                def fetch(span):
+                    # 按月分片并发拉取，跳过报告缓存以取得最新的修订数据
+                    reports, shard_info = self._fetch_sharded_report(
+                        account_id, {"metrics": metrics, "dimensions": dimensions}, span, "month", cache="bypass"
+                    )
+                    api_calls.append(shard_info["count"])
+                    return reports
+                
+                spec = self.earnings_store.sync(
+                    clean_account_id, dimensions, metrics, fetch,
+                    start=parse_date(start_date) if start_date else None,
+                    today=self._account_today(account_id)
+                )
+                spec.pop("headers", None)
+                payload = {"success": True, "action": "sync", "api_calls": sum(api_calls), "spec": spec}
+            elif action == "status":
+                payload = {"success": True, "action": "status", "specs": self.earnings_store.status(clean_account_id)}
+            elif action == "delete":
+                if not spec_id:
+                    payload = {"success": False, "error": "delete操作需要提供spec_id"}
+                else:
+                    deleted = self.earnings_store.delete(spec_id, clean_account_id)
+                    payload = {"success": deleted, "action": "delete", "spec_id": spec_id}
+                    if not deleted:
+                        payload["error"] = f"账户 {clean_account_id} 下不存在同步规格: {spec_id}"
+            else:
+                payload = {"success": False, "error": f"不支持的操作: {action}"}
+        except Exception as e:
+            payload = {"success": False, "error": str(e)}
+        
+        return self._text_result(payload)
+
+    def manage_accounts(self, action: str, account_id: str = None,
+                        pagination: Dict[str, Any] = None) -> Dict[str, Any]:
+        """管理AdSense账户"""
+        try:
+            service = self._get_adsense_service()
+            
             # 验证必需参数
             if action in ["get", "get_payments", "list_alerts"] and not account_id:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": f"操作 '{action}' 需要 account_id 参数",
-                                "hint": "请提供 account_id 参数或设置环境变量 GOOGLE_ADSENSE_ACCOUNT_ID"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": f"操作 '{action}' 需要 account_id 参数",
+                    "hint": "请提供 account_id 参数或设置环境变量 GOOGLE_ADSENSE_ACCOUNT_ID"
+                })
             
             if action == "list":
                 # 列出所有账户
-                accounts = service.accounts().list().execute()
+                accounts = Paginator(service.accounts().list, 'accounts', **(pagination or {}))
                 account_list = []
-                for account in accounts.get('accounts', []):
+                for account in accounts:
                     account_list.append({
                         "name": account.get('name'),
                         "displayName": account.get('displayName'),
                         "pendingTasks": account.get('pendingTasks', [])
                     })
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "list",
-                                "accounts": account_list,
-                                "total": len(account_list)
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "list",
+                    "accounts": account_list,
+                    "total": len(account_list),
+                    "truncated": accounts.truncated
+                })
             
             elif action == "get" and account_id:
                 # 获取账户详情
                 account = service.accounts().get(name=account_id).execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "account": {
-                                    "name": account.get('name'),
-                                    "displayName": account.get('displayName'),
-                                    "pendingTasks": account.get('pendingTasks', []),
-                                    "premium": account.get('premium', False),
-                                    "createTime": account.get('createTime'),
-                                    "timeZone": account.get('timeZone'),
-                                    "currencyCode": account.get('currencyCode'),
-                                    "accountType": account.get('accountType'),
-                                    "state": account.get('state')
-                                }
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "get",
+                    "account": {
+                        "name": account.get('name'),
+                        "displayName": account.get('displayName'),
+                        "pendingTasks": account.get('pendingTasks', []),
+                        "premium": account.get('premium', False),
+                        "createTime": account.get('createTime'),
+                        "timeZone": account.get('timeZone'),
+                        "currencyCode": account.get('currencyCode'),
+                        "accountType": account.get('accountType'),
+                        "state": account.get('state')
+                    }
+                })
             
             elif action == "get_payments" and account_id:
                 # 获取付款信息
                 payments = service.accounts().listPayments(name=account_id).execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get_payments",
-                                "payments": payments.get('payments', [])
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "get_payments",
+                    "payments": payments.get('payments', [])
+                })
             
             elif action == "list_alerts" and account_id:
                 # 列出警报
                 clean_account_id = self._clean_account_id(account_id)
                 alerts = service.accounts().alerts().list(parent=f"accounts/{clean_account_id}").execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "list_alerts",
-                                "alerts": alerts.get('alerts', [])
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "list_alerts",
+                    "alerts": alerts.get('alerts', [])
+                })
             
             else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": "缺少必需参数或操作不支持"
+                })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self._text_result({"success": False, "error": str(e)})
 
     def manage_ad_units(self, action: str, account_id: str, ad_client_id: str = None,
                        ad_unit_id: str = None, ad_unit_name: str = None, 
-                       ad_unit_type: str = "DISPLAY", size: str = "RESPONSIVE") -> Dict[str, Any]:
+                       ad_unit_type: str = "DISPLAY", size: str = "RESPONSIVE",
+                       pagination: Dict[str, Any] = None, ad_unit_ids: List[str] = None,
+                       bulk: Dict[str, Any] = None) -> Dict[str, Any]:
         """管理广告单元"""
         try:
             service = self._get_adsense_service()
@@ -795,62 +1524,49 @@ class MCPAdSenseEnhancedUltimateServer:
             if not ad_client_id:
                 ad_client_id = self._get_default_ad_client_id(account_id)
                 if not ad_client_id:
-                    return {
+                    return self._text_result({
                         "success": False,
                         "error": "未提供广告客户端ID，且无法获取默认客户端ID。请先调用manage_ad_clients获取可用的客户端ID。"
-                    }
+                    })
             
             # 验证必需参数
             if not account_id:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数: account_id",
-                                "hint": "请提供 account_id 参数或设置环境变量 GOOGLE_ADSENSE_ACCOUNT_ID"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": "缺少必需参数: account_id",
+                    "hint": "请提供 account_id 参数或设置环境变量 GOOGLE_ADSENSE_ACCOUNT_ID"
+                })
             
-            if action in ["get", "patch", "delete"] and not ad_unit_id:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": f"操作 '{action}' 需要 ad_unit_id 参数"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+            if action in BULK_ACTIONS:
+                clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
+                return self._text_result(self._bulk_provision(
+                    action, f"accounts/{clean_account_id}/adclients/{ad_client_id}", "adunits", bulk or {}
+                ))
+            
+            if action in ["get", "patch", "delete"] and not ad_unit_id and not (action == "get" and ad_unit_ids):
+                return self._text_result({
+                    "success": False,
+                    "error": f"操作 '{action}' 需要 ad_unit_id 参数"
+                })
             
             if action == "create" and not ad_unit_name:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "操作 'create' 需要 ad_unit_name 参数"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": "操作 'create' 需要 ad_unit_name 参数"
+                })
             
             if action == "list":
                 # 列出广告单元
                 # 确保account_id格式正确，去掉重复的accounts/前缀
                 clean_account_id = self._clean_account_id(account_id)
-                ad_units = service.accounts().adclients().adunits().list(
-                    parent=f"accounts/{clean_account_id}/adclients/{ad_client_id}"
-                ).execute()
+                ad_units = Paginator(
+                    service.accounts().adclients().adunits().list, 'adUnits',
+                    parent=f"accounts/{clean_account_id}/adclients/{ad_client_id}",
+                    **(pagination or {})
+                )
                 
                 unit_list = []
-                for unit in ad_units.get('adUnits', []):
+                for unit in ad_units:
                     unit_list.append({
                         "name": unit.get('name'),
                         "displayName": unit.get('displayName'),
@@ -860,19 +1576,33 @@ class MCPAdSenseEnhancedUltimateServer:
                         "size": unit.get('contentAdsSettings', {}).get('size')
                     })
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "list",
-                                "ad_units": unit_list,
-                                "total": len(unit_list)
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "list",
+                    "ad_units": unit_list,
+                    "total": len(unit_list),
+                    "truncated": ad_units.truncated
+                })
+            
+            elif action == "get" and ad_unit_ids:
+                # 批量获取多个广告单元详情
+                clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
+                batch = batch_get(
+                    service, ad_unit_ids,
+                    lambda unit_id: service.accounts().adclients().adunits().get(
+                        name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/adunits/{unit_id}"
+                    ),
+                    self._describe_ad_unit, "ad_unit_id", execute=self.call_guard.execute
+                )
+                
+                return self._text_result({
+                    "success": True,
+                    "action": "get",
+                    "ad_units": batch["items"],
+                    "errors": batch["errors"],
+                    "total": batch["total"],
+                    "batches": batch["batches"]
+                })
             
             elif action == "get" and ad_unit_id:
                 # 获取广告单元详情
@@ -881,25 +1611,11 @@ class MCPAdSenseEnhancedUltimateServer:
                     name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/adunits/{ad_unit_id}"
                 ).execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "ad_unit": {
-                                    "name": ad_unit.get('name'),
-                                    "displayName": ad_unit.get('displayName'),
-                                    "adUnitId": ad_unit.get('adUnitId'),
-                                    "state": ad_unit.get('state'),
-                                    "contentAdsSettings": ad_unit.get('contentAdsSettings', {}),
-                                    "reportingDimensionId": ad_unit.get('reportingDimensionId')
-                                }
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "get",
+                    "ad_unit": self._describe_ad_unit(ad_unit)
+                })
             
             elif action == "create" and ad_unit_name:
                 # 创建广告单元
@@ -914,23 +1630,18 @@ class MCPAdSenseEnhancedUltimateServer:
                         }
                     }
                 ).execute()
+                self.listing_cache.add(f"accounts/{clean_account_id}/adclients/{ad_client_id}/adunits", ad_unit)
+                self.inventory.notify_write(clean_account_id, "ad_units", ad_unit)
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "create",
-                                "ad_unit": {
-                                    "name": ad_unit.get('name'),
-                                    "displayName": ad_unit.get('displayName'),
-                                    "adUnitId": ad_unit.get('adUnitId')
-                                }
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "create",
+                    "ad_unit": {
+                        "name": ad_unit.get('name'),
+                        "displayName": ad_unit.get('displayName'),
+                        "adUnitId": ad_unit.get('adUnitId')
+                    }
+                })
             
             elif action == "patch" and ad_unit_id:
                 # 更新广告单元
@@ -945,41 +1656,30 @@ class MCPAdSenseEnhancedUltimateServer:
                     update_body["contentAdsSettings"]["type"] = ad_unit_type
                 
                 if not update_body:
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": False,
-                                    "error": "必须提供至少一个要更新的字段"
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    return self._text_result({
+                        "success": False,
+                        "error": "必须提供至少一个要更新的字段"
+                    })
                 
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
                 ad_unit = service.accounts().adclients().adunits().patch(
                     name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/adunits/{ad_unit_id}",
                     body=update_body
                 ).execute()
+                self.inventory.notify_write(clean_account_id, "ad_units", ad_unit)
+                # 名称可能已改变，下次批量创建时重新列出
+                self.listing_cache.invalidate(f"accounts/{clean_account_id}/adclients/{ad_client_id}/adunits")
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "patch",
-                                "ad_unit": {
-                                    "name": ad_unit.get('name'),
-                                    "displayName": ad_unit.get('displayName'),
-                                    "adUnitId": ad_unit.get('adUnitId'),
-                                    "state": ad_unit.get('state')
-                                }
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "patch",
+                    "ad_unit": {
+                        "name": ad_unit.get('name'),
+                        "displayName": ad_unit.get('displayName'),
+                        "adUnitId": ad_unit.get('adUnitId'),
+                        "state": ad_unit.get('state')
+                    }
+                })
             
             elif action == "delete" and ad_unit_id:
                 # 删除广告单元
@@ -987,45 +1687,31 @@ class MCPAdSenseEnhancedUltimateServer:
                 service.accounts().adclients().adunits().delete(
                     name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/adunits/{ad_unit_id}"
                 ).execute()
+                self.inventory.notify_write(
+                    clean_account_id, "ad_units",
+                    removed_name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/adunits/{ad_unit_id}"
+                )
+                self.listing_cache.invalidate(f"accounts/{clean_account_id}/adclients/{ad_client_id}/adunits")
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "delete",
-                                "message": "广告单元已成功删除"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "delete",
+                    "message": "广告单元已成功删除"
+                })
             
             else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": "缺少必需参数或操作不支持"
+                })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self._text_result({"success": False, "error": str(e)})
 
     def manage_channels(self, channel_type: str, action: str, account_id: str, ad_client_id: str = None,
-                       channel_id: str = None, channel_name: str = None) -> Dict[str, Any]:
+                       channel_id: str = None, channel_name: str = None,
+                       pagination: Dict[str, Any] = None, channel_ids: List[str] = None,
+                       bulk: Dict[str, Any] = None) -> Dict[str, Any]:
         """管理渠道"""
         try:
             service = self._get_adsense_service()
@@ -1034,52 +1720,90 @@ class MCPAdSenseEnhancedUltimateServer:
             if not ad_client_id:
                 ad_client_id = self._get_default_ad_client_id(account_id)
                 if not ad_client_id:
-                    return {
+                    return self._text_result({
                         "success": False,
                         "error": "未提供广告客户端ID，且无法获取默认客户端ID。请先调用manage_ad_clients获取可用的客户端ID。"
-                    }
+                    })
             
             if channel_type == "url_channels":
                 if action == "list":
                     # 列出URL渠道
                     clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
-                    url_channels = service.accounts().adclients().urlchannels().list(
-                        parent=f"accounts/{clean_account_id}/adclients/{ad_client_id}"
-                    ).execute()
+                    url_channels = Paginator(
+                        service.accounts().adclients().urlchannels().list, 'urlChannels',
+                        parent=f"accounts/{clean_account_id}/adclients/{ad_client_id}",
+                        **(pagination or {})
+                    )
                     
                     channel_list = []
-                    for channel in url_channels.get('urlChannels', []):
+                    for channel in url_channels:
                         channel_list.append({
                             "name": channel.get('name'),
                             "uriPattern": channel.get('uriPattern'),
                             "reportingDimensionId": channel.get('reportingDimensionId')
                         })
                     
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "channel_type": "url_channels",
-                                    "channels": channel_list,
-                                    "total": len(channel_list)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    return self._text_result({
+                        "success": True,
+                        "action": "list",
+                        "channel_type": "url_channels",
+                        "channels": channel_list,
+                        "total": len(channel_list),
+                        "truncated": url_channels.truncated
+                    })
+                
+                elif action == "get" and channel_ids:
+                    # 批量获取多个URL渠道详情
+                    clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
+                    batch = batch_get(
+                        service, channel_ids,
+                        lambda url_channel_id: service.accounts().adclients().urlchannels().get(
+                            name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/urlchannels/{url_channel_id}"
+                        ),
+                        self._describe_url_channel, "channel_id", execute=self.call_guard.execute
+                    )
+                    
+                    return self._text_result({
+                        "success": True,
+                        "action": "get",
+                        "channel_type": "url_channels",
+                        "channels": batch["items"],
+                        "errors": batch["errors"],
+                        "total": batch["total"],
+                        "batches": batch["batches"]
+                    })
+                
+                elif action == "get" and channel_id:
+                    # 获取URL渠道详情
+                    clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
+                    channel = service.accounts().adclients().urlchannels().get(
+                        name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/urlchannels/{channel_id}"
+                    ).execute()
+                    
+                    return self._text_result({
+                        "success": True,
+                        "action": "get",
+                        "channel": self._describe_url_channel(channel)
+                    })
             
             elif channel_type == "custom_channels":
-                if action == "list":
+                if action in BULK_ACTIONS:
+                    clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
+                    return self._text_result(self._bulk_provision(
+                        action, f"accounts/{clean_account_id}/adclients/{ad_client_id}", "customchannels", bulk or {}
+                    ))
+                
+                elif action == "list":
                     # 列出自定义渠道
                     clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
-                    custom_channels = service.accounts().adclients().customchannels().list(
-                        parent=f"accounts/{clean_account_id}/adclients/{ad_client_id}"
-                    ).execute()
+                    custom_channels = Paginator(
+                        service.accounts().adclients().customchannels().list, 'customChannels',
+                        parent=f"accounts/{clean_account_id}/adclients/{ad_client_id}",
+                        **(pagination or {})
+                    )
                     
                     channel_list = []
-                    for channel in custom_channels.get('customChannels', []):
+                    for channel in custom_channels:
                         channel_list.append({
                             "name": channel.get('name'),
                             "displayName": channel.get('displayName'),
@@ -1087,20 +1811,35 @@ class MCPAdSenseEnhancedUltimateServer:
                             "reportingDimensionId": channel.get('reportingDimensionId')
                         })
                     
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "channel_type": "custom_channels",
-                                    "channels": channel_list,
-                                    "total": len(channel_list)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    return self._text_result({
+                        "success": True,
+                        "action": "list",
+                        "channel_type": "custom_channels",
+                        "channels": channel_list,
+                        "total": len(channel_list),
+                        "truncated": custom_channels.truncated
+                    })
+                
+                elif action == "get" and channel_ids:
+                    # 批量获取多个自定义渠道详情
+                    clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
+                    batch = batch_get(
+                        service, channel_ids,
+                        lambda custom_channel_id: service.accounts().adclients().customchannels().get(
+                            name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/customchannels/{custom_channel_id}"
+                        ),
+                        self._describe_custom_channel, "channel_id", execute=self.call_guard.execute
+                    )
+                    
+                    return self._text_result({
+                        "success": True,
+                        "action": "get",
+                        "channel_type": "custom_channels",
+                        "channels": batch["items"],
+                        "errors": batch["errors"],
+                        "total": batch["total"],
+                        "batches": batch["batches"]
+                    })
                 
                 elif action == "get" and channel_id:
                     # 获取自定义渠道详情
@@ -1109,98 +1848,63 @@ class MCPAdSenseEnhancedUltimateServer:
                         name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/customchannels/{channel_id}"
                     ).execute()
                     
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "get",
-                                    "channel": {
-                                        "name": channel.get('name'),
-                                        "displayName": channel.get('displayName'),
-                                        "customChannelId": channel.get('customChannelId'),
-                                        "reportingDimensionId": channel.get('reportingDimensionId')
-                                    }
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    return self._text_result({
+                        "success": True,
+                        "action": "get",
+                        "channel": self._describe_custom_channel(channel)
+                    })
                 
                 elif action == "create":
                     if not channel_name:
-                        return {
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": json.dumps({
-                                        "success": False,
-                                        "error": "操作 'create' 需要 channel_name 参数"
-                                    }, ensure_ascii=False, indent=2)
-                                }
-                            ]
-                        }
+                        return self._text_result({
+                            "success": False,
+                            "error": "操作 'create' 需要 channel_name 参数"
+                        })
                     # 创建自定义渠道
                     clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
                     channel = service.accounts().adclients().customchannels().create(
                         parent=f"accounts/{clean_account_id}/adclients/{ad_client_id}",
                         body={"displayName": channel_name}
                     ).execute()
+                    self.listing_cache.add(f"accounts/{clean_account_id}/adclients/{ad_client_id}/customchannels", channel)
+                    self.inventory.notify_write(clean_account_id, "custom_channels", channel)
                     
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "create",
-                                    "channel": {
-                                        "name": channel.get('name'),
-                                        "displayName": channel.get('displayName'),
-                                        "customChannelId": channel.get('customChannelId')
-                                    }
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    return self._text_result({
+                        "success": True,
+                        "action": "create",
+                        "channel": {
+                            "name": channel.get('name'),
+                            "displayName": channel.get('displayName'),
+                            "customChannelId": channel.get('customChannelId')
+                        }
+                    })
                 
                 elif action == "patch" and channel_id:
                     # 更新自定义渠道
                     if not channel_name:
-                        return {
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": json.dumps({
-                                        "success": False,
-                                        "error": "操作 'patch' 需要 channel_name 参数"
-                                    }, ensure_ascii=False, indent=2)
-                                }
-                            ]
-                        }
+                        return self._text_result({
+                            "success": False,
+                            "error": "操作 'patch' 需要 channel_name 参数"
+                        })
                     
                     clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
                     channel = service.accounts().adclients().customchannels().patch(
                         name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/customchannels/{channel_id}",
                         body={"displayName": channel_name}
                     ).execute()
+                    self.inventory.notify_write(clean_account_id, "custom_channels", channel)
+                    # 名称可能已改变，下次批量创建时重新列出
+                    self.listing_cache.invalidate(f"accounts/{clean_account_id}/adclients/{ad_client_id}/customchannels")
                     
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "patch",
-                                    "channel": {
-                                        "name": channel.get('name'),
-                                        "displayName": channel.get('displayName'),
-                                        "customChannelId": channel.get('customChannelId')
-                                    }
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    return self._text_result({
+                        "success": True,
+                        "action": "patch",
+                        "channel": {
+                            "name": channel.get('name'),
+                            "displayName": channel.get('displayName'),
+                            "customChannelId": channel.get('customChannelId')
+                        }
+                    })
                 
                 elif action == "delete" and channel_id:
                     # 删除自定义渠道
@@ -1208,47 +1912,160 @@ class MCPAdSenseEnhancedUltimateServer:
                     service.accounts().adclients().customchannels().delete(
                         name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/customchannels/{channel_id}"
                     ).execute()
+                    self.inventory.notify_write(
+                        clean_account_id, "custom_channels",
+                        removed_name=f"accounts/{clean_account_id}/adclients/{ad_client_id}/customchannels/{channel_id}"
+                    )
+                    self.listing_cache.invalidate(f"accounts/{clean_account_id}/adclients/{ad_client_id}/customchannels")
                     
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "delete",
-                                    "message": "自定义渠道已成功删除"
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    return self._text_result({
+                        "success": True,
+                        "action": "delete",
+                        "message": "自定义渠道已成功删除"
+                    })
             
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({
-                            "success": False,
-                            "error": "不支持的操作或渠道类型"
-                        }, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self._text_result({
+                "success": False,
+                "error": "不支持的操作或渠道类型"
+            })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
+            return self._text_result({"success": False, "error": str(e)})
+
+    def _bulk_provision(self, action: str, parent: str, collection: str, bulk: Dict[str, Any]) -> Dict[str, Any]:
+        """批量创建/更新/删除广告单元（collection="adunits"）或自定义渠道（collection="customchannels"）
+
+        广告单元没有删除接口，bulk_delete将其状态改为ARCHIVED。
+        """
+        is_ad_unit = collection == "adunits"
+        items_key, id_field = ("adUnits", "ad_unit_id") if is_ad_unit else ("customChannels", "channel_id")
+        cache_key = f"{parent}/{collection}"
+        specs = load_specs(bulk.get("specs"), bulk.get("specs_file"))
+        
+        def resource():
+            # 在各工作线程中取得该线程自己的服务对象
+            adclients = self._get_adsense_service().accounts().adclients()
+            return adclients.adunits() if is_ad_unit else adclients.customchannels()
+        
+        def display_name(spec):
+            return spec.get("display_name") or spec.get("displayName") or spec.get("ad_unit_name" if is_ad_unit else "channel_name")
+        
+        def resource_name(spec):
+            resource_id = str(spec.get(id_field) or spec.get("id") or "")
+            return resource_id if "/" in resource_id else f"{parent}/{collection}/{resource_id}"
+        
+        def describe(item, status):
+            result = {
+                "status": status,
+                "display_name": item.get("displayName"),
+                "name": item.get("name"),
+                id_field: item.get("adUnitId" if is_ad_unit else "customChannelId")
             }
+            if is_ad_unit:
+                result["state"] = item.get("state")
+            return result
+        
+        def patch_body(spec):
+            """由规格中提供的字段构造patch请求体和updateMask"""
+            body, mask = {}, []
+            if display_name(spec):
+                body["displayName"] = display_name(spec)
+                mask.append("displayName")
+            if is_ad_unit:
+                settings = {}
+                for field in ("size", "type"):
+                    if spec.get(field):
+                        settings[field] = spec[field]
+                        mask.append(f"contentAdsSettings.{field}")
+                if settings:
+                    body["contentAdsSettings"] = settings
+                if spec.get("state"):
+                    body["state"] = spec["state"]
+                    mask.append("state")
+            return body, mask
+        
+        precomputed = {}
+        if action == "bulk_create":
+            # 幂等：已存在的displayName和规格中重复的名称都跳过
+            existing = self.listing_cache.get(
+                cache_key, lambda: list(Paginator(resource().list, items_key, parent=parent))
+            )
+            seen = set()
+            for index, spec in enumerate(specs):
+                name = display_name(spec)
+                if not name:
+                    precomputed[index] = {"status": "failed", "spec": spec, "error": "缺少display_name"}
+                elif name in existing:
+                    precomputed[index] = dict(describe(existing[name], "skipped"), reason="已存在同名资源")
+                elif name in seen:
+                    precomputed[index] = {"status": "skipped", "display_name": name, "reason": "规格中名称重复"}
+                seen.add(name)
+            
+            def operation(spec):
+                if is_ad_unit:
+                    body = {
+                        "displayName": display_name(spec),
+                        "state": spec.get("state", "ACTIVE"),
+                        "contentAdsSettings": {
+                            "size": spec.get("size", "RESPONSIVE"),
+                            "type": spec.get("type", "DISPLAY")
+                        }
+                    }
+                else:
+                    body = {"displayName": display_name(spec)}
+                item = resource().create(parent=parent, body=body).execute()
+                self.listing_cache.add(cache_key, item)
+                return describe(item, "created")
+        
+        elif action == "bulk_patch":
+            for index, spec in enumerate(specs):
+                if not (spec.get(id_field) or spec.get("id")):
+                    precomputed[index] = {"status": "failed", "spec": spec, "error": f"缺少{id_field}"}
+                elif not patch_body(spec)[1]:
+                    precomputed[index] = {"status": "failed", "spec": spec, "error": "必须提供至少一个要更新的字段"}
+            
+            def operation(spec):
+                body, mask = patch_body(spec)
+                item = resource().patch(name=resource_name(spec), body=body, updateMask=",".join(mask)).execute()
+                return describe(item, "updated")
+        
+        else:
+            for index, spec in enumerate(specs):
+                if not (spec.get(id_field) or spec.get("id")):
+                    precomputed[index] = {"status": "failed", "spec": spec, "error": f"缺少{id_field}"}
+            
+            def operation(spec):
+                if is_ad_unit:
+                    item = resource().patch(
+                        name=resource_name(spec), body={"state": "ARCHIVED"}, updateMask="state"
+                    ).execute()
+                    return describe(item, "archived")
+                resource().delete(name=resource_name(spec)).execute()
+                return {"status": "deleted", "name": resource_name(spec)}
+        
+        outcome = run_bulk(self.bulk_executor, specs, operation, bulk.get("qps"), precomputed)
+        if action != "bulk_create":
+            # 更新和删除会改变名称集合，下次批量创建时重新列出
+            self.listing_cache.invalidate(cache_key)
+        if any(result["status"] not in ("skipped", "failed") for result in outcome["results"]):
+            self.inventory.notify_write(parent.split("/")[1], "ad_units" if is_ad_unit else "custom_channels")
+        return {
+            "success": outcome["summary"]["failed"] == 0,
+            "action": action,
+            "parent": parent,
+            **outcome
+        }
 
     def get_reports(self, account_id: str, start_date: str = None, end_date: str = None,
                    metrics: List[str] = None, dimensions: List[str] = None,
                    filters: List[str] = None, sort: str = "DATE", limit: int = 100,
-                   date_range: str = None) -> Dict[str, Any]:
+                   date_range: str = None, cache: str = "use", shard: str = "none",
+                   format: str = "rows", source: str = "auto",
+                   account_ids: Any = None, chunk_rows: int = None, cursor: str = None,
+                   transport: str = "auto", output_file: str = None, output_format: str = None) -> Dict[str, Any]:
         """获取AdSense报告"""
+        if cursor:
+            return self._next_report_chunk(cursor)
         if filters is None:
             filters = []
         if metrics is None:
@@ -1257,91 +2074,94 @@ class MCPAdSenseEnhancedUltimateServer:
             dimensions = ["DATE"]
         
         try:
-            service = self._get_adsense_service()
+            if shard and shard != "none":
+                shard_error = check_shardable(dimensions, shard) if shard in SHARD_GRANULARITIES else f"不支持的分片粒度: {shard}"
+                if shard_error:
+                    return self._text_result({
+                        "success": False,
+                        "error": shard_error
+                    })
             
-            # 构建报告请求
-            if date_range:
-                # 使用预定义的日期范围
-                request_body = {
-                    "dateRange": date_range,
-                    "metrics": metrics,
-                    "dimensions": dimensions
-                }
-            else:
-                # 使用自定义日期范围
-                if not start_date or not end_date:
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": False,
-                                    "error": "必须提供start_date和end_date，或使用date_range参数"
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
-                
-                # 对于自定义日期范围，直接设置startDate和endDate，不设置dateRange字段
-                request_body = {
-                    "startDate": {
-                        "year": int(start_date.split('-')[0]),
-                        "month": int(start_date.split('-')[1]),
-                        "day": int(start_date.split('-')[2])
-                    },
-                    "endDate": {
-                        "year": int(end_date.split('-')[0]),
-                        "month": int(end_date.split('-')[1]),
-                        "day": int(end_date.split('-')[2])
-                    },
-                    "metrics": metrics,
-                    "dimensions": dimensions
+            # CSV下载直接调用API，不经过分片、多账户合并和本地同步数据
+            csv_unsupported = bool(account_ids) or (shard and shard != "none") or source == "local"
+            output_format = infer_format(output_file, output_format) if output_file else None
+            # 导出CSV文件时尽量直接保存generateCsv的响应体
+            raw_csv = output_format == "csv" and not csv_unsupported and transport != "json"
+            resolved_transport = "csv" if raw_csv else resolve_transport(transport, limit)
+            if resolved_transport == "csv" and csv_unsupported:
+                if transport == "csv":
+                    return self._text_result({
+                        "success": False,
+                        "error": "transport=csv 不支持account_ids、shard和source=local"
+                    })
+                resolved_transport = "json"
+            
+            # 日期范围按账户时区换算为具体日期后再请求，缓存键、分片和API使用同一范围
+            date_span, time_zone = self._resolve_report_dates(account_id, date_range, start_date, end_date)
+            resolved_dates = {
+                "start_date": date_span[0].isoformat(),
+                "end_date": date_span[1].isoformat(),
+                "time_zone": time_zone
+            }
+            request_body = self._build_report_request(metrics, dimensions, date_span, filters, sort, limit)
+            
+            resolved_by_account = {}
+            
+            def load(account):
+                return self._load_report(account, request_body, date_span, filters, cache, shard, source)
+            
+            def load_in_account_zone(account):
+                # 多账户时各账户按自己的时区换算相对日期范围
+                span, zone = self._resolve_report_dates(account, date_range, start_date, end_date)
+                resolved_by_account[account] = {
+                    "start_date": span[0].isoformat(), "end_date": span[1].isoformat(), "time_zone": zone
                 }
+                body = request_body if span == date_span else self._build_report_request(
+                    metrics, dimensions, span, filters, sort, limit
+                )
+                return self._load_report(account, body, span, filters, cache, shard, source)
             
-            if filters:
-                request_body["filters"] = filters
+            table = None
+            if resolved_transport == "csv":
+                chunks = self._fetch_report_csv(account_id, request_body)
+                if raw_csv:
+                    return self._text_result({
+                        "success": True,
+                        "account": account_id,
+                        "start_date": start_date,
+                        "end_date": end_date,
+                        "date_range": date_range,
+                        "resolved_dates": resolved_dates,
+                        "metrics": metrics,
+                        "dimensions": dimensions,
+                        "transport": "csv",
+                        "file": write_csv(chunks, output_file)
+                    })
+                table = parse_csv(chunks, dimensions)
+                report_info = {"cached": False, "source": "api", "sync": None, "shards": None}
+            elif account_ids:
+                # 多账户：各账户并发拉取，加入account列后按orderBy归并
+                accounts = self._resolve_account_ids(account_ids)
+                results, errors = run_fan_out(self.fan_out_executor, accounts, load_in_account_zone)
+                names = None
+                responses = []
+                for account, (reports, _) in results:
+                    names = names or [header.get("name") for header in reports.get("headers") or []]
+                    responses.append(add_account_column(account, reports, names))
+                reports = merge_shard_reports(responses, request_body.get("orderBy"))
+                sources = {info["source"] for _, (_, info) in results}
+                report_info = {
+                    "cached": bool(results) and all(info["cached"] for _, (_, info) in results),
+                    "source": sources.pop() if len(sources) == 1 else "mixed",
+                    "sync": None,
+                    "shards": None
+                }
+            else:
+                reports, report_info = load(account_id)
             
-            if sort:
-                # orderBy应该是字符串数组格式，如["+DATE"]或["-ESTIMATED_EARNINGS"]
-                # + 表示升序，- 表示降序
-                if sort.startswith('-'):
-                    # 降序
-                    request_body["orderBy"] = [f"-{sort[1:]}"]
-                else:
-                    # 升序
-                    request_body["orderBy"] = [f"+{sort}"]
-            
-            if limit and limit > 0:
-                request_body["limit"] = limit
-            
-            # 调用API
-            clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
-            
-            # AdSense API v2的generate方法需要将参数展开传递，而不是使用body参数
-            reports = service.accounts().reports().generate(
-                account=f"accounts/{clean_account_id}",
-                **request_body
-            ).execute()
-            
-            # 处理报告数据
-            rows = []
-            for row in reports.get('rows', []):
-                row_data = {}
-                for i, cell in enumerate(row.get('cells', [])):
-                    dim_index = i if i < len(dimensions) else None
-                    metric_index = i - len(dimensions) if i >= len(dimensions) else None
-                    
-                    if dim_index is not None:
-                        row_data[dimensions[dim_index]] = {
-                            "value": cell.get('value'),
-                            "label": cell.get('label')
-                        }
-                    elif metric_index is not None:
-                        row_data[metrics[metric_index]] = {
-                            "value": cell.get('value'),
-                            "label": cell.get('label')
-                        }
-                rows.append(row_data)
+            if table is None:
+                # 处理报告数据，列名以响应headers为准（缓存命中时请求中的列顺序可能不同）
+                table = ReportTable.from_response(reports, fallback_names=dimensions + metrics)
             
             result = {
                 "success": True,
@@ -1349,38 +2169,404 @@ class MCPAdSenseEnhancedUltimateServer:
                 "start_date": start_date,
                 "end_date": end_date,
                 "date_range": date_range,
+                "resolved_dates": resolved_dates,
                 "metrics": metrics,
                 "dimensions": dimensions,
                 "filters": filters if filters else None,
-                "total_rows": len(rows),
-                "rows": rows
+                **report_info,
+                "transport": resolved_transport,
+                "total_rows": len(table)
             }
+            if account_ids:
+                result["account"] = None
+                result["accounts"] = accounts
+                result["errors"] = errors
+                result["resolved_dates"] = {account: resolved_by_account.get(account) for account in accounts}
+            if output_file:
+                # 导出到文件，结果中只返回路径、列类型和行数
+                result["file"] = export_table(table, output_file, output_format)
+                return self._text_result(result)
+            if chunk_rows:
+                # 分块：剩余的行留在服务器端游标中
+                context = {key: result[key] for key in ("account", "start_date", "end_date", "date_range", "metrics", "dimensions")}
+                context["format"] = format
+                table, result["chunk"] = self.report_cursors.open(table, int(chunk_rows), context)
+            delimited = self._render_report_table(result, table, format)
             
             # 如果没有数据，添加友好的提示信息
-            if len(rows) == 0:
+            if len(table) == 0:
                 date_info = f"日期范围: {date_range}" if date_range else f"日期范围: {start_date} 到 {end_date}"
                 result["message"] = f"查询成功，但在指定的{date_info}内没有数据。这表示该广告单元在此时间范围内确实没有展示、点击或收入数据。"
             
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps(result, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            if delimited is not None:
+                return self._text_result(result, delimited)
+            return self._text_result(result)
             
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
+            return self._text_result({"success": False, "error": str(e)})
+
+    @staticmethod
+    def _build_report_request(metrics: List[str], dimensions: List[str], date_span: Tuple[date, date],
+                              filters: List[str] = None, sort: str = None, limit: int = None) -> Dict[str, Any]:
+        """构建报告请求（get_reports和aggregate_report共用），日期范围为已解析的具体日期"""
+        request_body = {
+            "startDate": {"year": date_span[0].year, "month": date_span[0].month, "day": date_span[0].day},
+            "endDate": {"year": date_span[1].year, "month": date_span[1].month, "day": date_span[1].day},
+            "metrics": metrics,
+            "dimensions": dimensions
+        }
+        
+        if filters:
+            request_body["filters"] = filters
+        
+        if sort:
+            # orderBy应该是字符串数组格式，如["+DATE"]或["-ESTIMATED_EARNINGS"]
+            # + 表示升序，- 表示降序
+            if sort.startswith('-'):
+                # 降序
+                request_body["orderBy"] = [f"-{sort[1:]}"]
+            else:
+                # 升序
+                request_body["orderBy"] = [f"+{sort}"]
+        
+        if limit and limit > 0:
+            request_body["limit"] = limit
+        return request_body
+
+    def aggregate_report(self, account_id: str, group_by: List[str] = None, metrics: List[str] = None,
+                         dimensions: List[str] = None, start_date: str = None, end_date: str = None,
+                         date_range: str = None, filters: List[str] = None, sort: str = None,
+                         top_n: int = None, compare: str = "none", cache: str = "use",
+                         source: str = "auto", shard: str = "none") -> Dict[str, Any]:
+        """在细粒度报告上本地计算分组汇总"""
+        try:
+            group_by = group_by or []
+            metrics = metrics or ["ESTIMATED_EARNINGS", "PAGE_VIEWS", "CLICKS", "PAGE_VIEWS_RPM"]
+            filters = filters or []
+            dimensions = dimensions or base_dimensions(group_by)
+            missing = [name for name in base_dimensions(group_by) if name not in dimensions]
+            if missing:
+                return self._text_result({
+                    "success": False,
+                    "error": f"dimensions中缺少分组需要的维度: {', '.join(missing)}"
+                })
+            if compare not in COMPARE_MODES:
+                return self._text_result({
+                    "success": False,
+                    "error": f"不支持的对比方式: {compare}，可选: {', '.join(COMPARE_MODES)}"
+                })
+            if compare != "none" and "DATE" in base_dimensions(group_by):
+                return self._text_result({
+                    "success": False,
+                    "error": "周期对比时group_by不能包含DATE、WEEK或MONTH（两个周期的日期不同，无法对齐）"
+                })
+            if shard and shard != "none":
+                shard_error = check_shardable(dimensions, shard) if shard in SHARD_GRANULARITIES else f"不支持的分片粒度: {shard}"
+                if shard_error:
+                    return self._text_result({
+                        "success": False,
+                        "error": shard_error
+                    })
+            date_span, time_zone = self._resolve_report_dates(account_id, date_range, start_date, end_date)
+            
+            # 细粒度报告不排序、不限行数，以便按相同参数命中缓存
+            fetch_metrics = base_metrics(metrics)
+            
+            def load_table(span, body):
+                if cache == "use" and source != "local":
+                    # 已缓存的报告（例如get_reports获取的、日期范围更长的报告）覆盖本次查询时直接在其上聚合
+                    covered = self._find_covering_report(account_id, dimensions, fetch_metrics, filters, span)
+                    if covered is not None:
+                        return covered
+                reports, info = self._load_report(account_id, body, span, filters, cache, shard, source)
+                return ReportTable.from_response(reports, fallback_names=dimensions + fetch_metrics), info
+            
+            table, report_info = load_table(date_span, self._build_report_request(
+                fetch_metrics, dimensions, date_span, filters
+            ))
+            previous, comparison = None, None
+            if compare != "none":
+                previous_span = comparison_span(compare, date_span[0], date_span[1])
+                previous, previous_info = load_table(previous_span, self._build_report_request(
+                    fetch_metrics, dimensions, previous_span, filters
+                ))
+                comparison = {
+                    "mode": compare,
+                    "start_date": previous_span[0].isoformat(),
+                    "end_date": previous_span[1].isoformat(),
+                    "cached": previous_info["cached"],
+                    "source": previous_info["source"]
+                }
+            
+            result = aggregate(table, group_by, metrics, sort, top_n, previous)
+            return self._text_result({
+                "success": True,
+                "account": account_id,
+                "start_date": date_span[0].isoformat(),
+                "end_date": date_span[1].isoformat(),
+                "date_range": date_range,
+                "time_zone": time_zone,
+                "group_by": group_by,
+                "metrics": metrics,
+                "base": {
+                    "dimensions": dimensions,
+                    "metrics": fetch_metrics,
+                    "filters": filters if filters else None,
+                    **report_info
+                },
+                "compare": comparison,
+                **result
+            })
+        
+        except Exception as e:
+            return self._text_result({"success": False, "error": str(e)})
+
+    def _find_covering_report(self, account_id: str, dimensions: List[str], metrics: List[str],
+                              filters: List[str], date_span: Tuple[Any, Any]) -> Optional[Tuple[ReportTable, Dict[str, Any]]]:
+        """在报告缓存中查找能覆盖本次查询的完整报告，返回 (截取到date_span的报告表, 来源信息)
+
+        缓存的报告需要维度组合和filters相同、指标包含所需指标、未被limit截断，
+        日期范围包含date_span；范围更长时要求维度含DATE，按DATE截取行。orderBy不影响聚合结果。
+        """
+        clean_account_id = self._clean_account_id(account_id)
+        start, end = date_span[0].isoformat(), date_span[1].isoformat()
+        
+        def match(request):
+            same_range = (request["startDate"], request["endDate"]) == (start, end)
+            return (request.get("account") == clean_account_id
+                    and request.get("dimensions") == sorted(dimensions)
+                    and request.get("filters") == sorted(filters)
+                    and set(metrics) <= set(request.get("metrics", []))
+                    and request["startDate"] <= start and request["endDate"] >= end
+                    and (same_range or "DATE" in dimensions))
+        
+        for request, reports in self.report_cache.find_covering(match):
+            rows = reports.get("rows", [])
+            if int(reports.get("totalMatchedRows", len(rows))) > len(rows):
+                continue
+            table = ReportTable.from_response(reports)
+            if (request["startDate"], request["endDate"]) != (start, end):
+                table = table.take(table.rows_where("DATE", lambda value: value is not None and start <= value <= end))
+            return table, {
+                "cached": True,
+                "source": "api",
+                "sync": None,
+                "shards": None,
+                "covering_range": [request["startDate"], request["endDate"]]
             }
+        return None
+
+    def _render_report_table(self, result: Dict[str, Any], table: ReportTable, format: str) -> Optional[str]:
+        """按format将报告表写入result；csv/tsv返回表格文本，由调用方作为单独的文本内容返回"""
+        if format == "columnar":
+            result["format"] = "columnar"
+            result["columns"] = table.to_columnar()["columns"]
+        elif format in ("csv", "tsv"):
+            # 表格作为单独的文本内容返回，避免再被JSON转义一次
+            result["format"] = format
+            return table.to_delimited("\t" if format == "tsv" else ",")
+        else:
+            result["rows"] = table.to_rows()
+        return None
+
+    def _next_report_chunk(self, cursor: str) -> Dict[str, Any]:
+        """返回报告游标的下一块"""
+        try:
+            chunk, chunk_info, context = self.report_cursors.next(cursor)
+        except CursorExpiredError as e:
+            return self._text_result({"success": False, "error": str(e)})
+        
+        result = {"success": True, **context, "chunk": chunk_info}
+        delimited = self._render_report_table(result, chunk, context.get("format", "rows"))
+        if delimited is not None:
+            return self._text_result(result, delimited)
+        return self._text_result(result)
+
+    def _load_report(self, account_id: str, request_body: Dict[str, Any], date_span: Tuple[Any, Any],
+                     filters: List[str], cache: str = "use", shard: str = "none",
+                     source: str = "auto") -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """按source从本地同步数据或API获取单个账户的报告，返回 (响应, 来源信息)
+
+        auto只使用本地已最终确定（不晚于finalized_through）的日期，之后仍可能被修订的日期
+        从API获取并与本地数据归并；local使用已同步的全部日期。
+        """
+        dimensions = request_body.get("dimensions", [])
+        metrics = request_body.get("metrics", [])
+        if source != "api" and not filters and cache != "bypass":
+            reports = self.earnings_store.query(
+                self._clean_account_id(account_id), dimensions, metrics, date_span[0], date_span[1],
+                request_body.get("orderBy"), request_body.get("limit"), final_only=source == "auto"
+            )
+            if reports is not None:
+                sync_spec = reports.pop("syncSpec")
+                local_through = date.fromisoformat(sync_spec["local_through"])
+                if local_through >= date_span[1]:
+                    return reports, {"cached": False, "source": "local", "sync": sync_spec, "shards": None}
+                api_span = (local_through + timedelta(days=1), date_span[1])
+                api_reports, cached, shard_info = self._load_api_report(
+                    account_id, self._request_for_span(request_body, api_span), api_span, cache, shard
+                )
+                sync_spec["api_range"] = [api_span[0].isoformat(), api_span[1].isoformat()]
+                merged = merge_shard_reports(
+                    [reports, api_reports], request_body.get("orderBy"), request_body.get("limit")
+                )
+                return merged, {"cached": cached, "source": "mixed", "sync": sync_spec, "shards": shard_info}
+        if source == "local":
+            raise ValueError("本地同步数据未覆盖此查询（需要维度组合相同、指标包含在内、日期范围已同步且没有filters），请先调用sync_earnings")
+        
+        reports, cached, shard_info = self._load_api_report(account_id, request_body, date_span, cache, shard)
+        return reports, {"cached": cached, "source": "api", "sync": None, "shards": shard_info}
 
-    def manage_ad_clients(self, action: str, account_id: str, ad_client_id: str = None) -> Dict[str, Any]:
+    def _load_api_report(self, account_id: str, request_body: Dict[str, Any], date_span: Tuple[Any, Any],
+                         cache: str = "use", shard: str = "none") -> Tuple[Dict[str, Any], bool, Optional[Dict[str, Any]]]:
+        """从API（按shard分片）获取报告，返回 (响应, 是否全部来自缓存, 分片统计)"""
+        if shard and shard != "none":
+            reports, shard_info = self._fetch_sharded_report(account_id, request_body, date_span, shard, cache)
+            cached = shard_info["cached"] == shard_info["count"]
+        else:
+            reports, cached = self._fetch_report(account_id, request_body, date_span, cache)
+            shard_info = None
+        currency_code = self._currency_from_headers(reports.get("headers"))
+        if currency_code:
+            # 报告headers已带币种，之后查询账户元数据时不必再请求一次报告
+            self.account_metadata.seed(self._clean_account_id(account_id), "currency", {"currency_code": currency_code})
+        return reports, cached, shard_info
+
+    def _resolve_account_ids(self, account_ids: Any) -> List[str]:
+        """解析account_ids参数："*"表示accounts.list返回的全部账户，结果去重并去掉accounts/前缀"""
+        if account_ids == ALL_ACCOUNTS or account_ids == [ALL_ACCOUNTS]:
+            service = self._get_adsense_service()
+            account_ids = [account.get("name") for account in Paginator(service.accounts().list, "accounts")]
+        elif isinstance(account_ids, str):
+            account_ids = [account_ids]
+        accounts = []
+        for account_id in account_ids:
+            clean_account_id = self._clean_account_id(account_id)
+            if clean_account_id not in accounts:
+                accounts.append(clean_account_id)
+        return accounts
+
+    def _fan_out_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """对多个账户并发执行同一个列表操作并合并结果"""
+        action = arguments.get("action", "list")
+        items_key = FAN_OUT_LIST_ACTIONS.get((name, action))
+        if items_key is None:
+            supported = ", ".join(f"{tool} {tool_action}" for tool, tool_action in FAN_OUT_LIST_ACTIONS)
+            return self._text_result({
+                "success": False,
+                "error": f"{name} 的 {action} 操作不支持account_ids，支持的操作: {supported}, get_reports"
+            })
+        
+        accounts = self._resolve_account_ids(arguments["account_ids"])
+        
+        def call(account):
+            with self.serializer.capture():
+                result = self._call_tool(name, dict(arguments, account_id=account, account_ids=None))
+            payload = result.get("payload", result)
+            if not payload.get("success"):
+                raise RuntimeError(payload.get("error") or "调用失败")
+            return payload
+        
+        results, errors = run_fan_out(self.fan_out_executor, accounts, call)
+        return self._text_result({
+            "success": True,
+            "action": action,
+            **merge_list_payloads(items_key, results),
+            "accounts": accounts,
+            "errors": errors
+        })
+
+    def _fetch_report(self, account_id: str, request_body: Dict[str, Any], date_span: Tuple[Any, Any],
+                      cache: str = "use") -> Tuple[Dict[str, Any], bool]:
+        """调用accounts.reports.generate并按cache模式读写报告缓存，返回 (响应, 是否来自缓存)"""
+        clean_account_id = self._clean_account_id(account_id)
+        
+        cache_key, cache_request = None, None
+        if cache != "bypass":
+            # 列表参数排序后作为缓存键，orderBy顺序有意义因此保持原样；
+            # 命中时缓存的列顺序可能与本次请求不同，返回前按请求的列顺序重排
+            cache_request = {
+                "account": clean_account_id,
+                "metrics": sorted(request_body.get("metrics", [])),
+                "dimensions": sorted(request_body.get("dimensions", [])),
+                "filters": sorted(request_body.get("filters", [])),
+                "orderBy": request_body.get("orderBy"),
+                "limit": request_body.get("limit"),
+                "startDate": date_span[0].isoformat(),
+                "endDate": date_span[1].isoformat()
+            }
+            cache_key = self.report_cache.make_key(cache_request)
+            if cache == "use":
+                reports = self.report_cache.get(cache_key)
+                if reports is not None:
+                    names = request_body.get("dimensions", []) + request_body.get("metrics", [])
+                    try:
+                        return reorder_columns(reports, names), True
+                    except ValueError:
+                        # 列与请求对不上时按未命中处理，重新请求后覆盖这条缓存
+                        pass
+        
+        service = self._get_adsense_service()
+        reports = service.accounts().reports().generate(
+            account=f"accounts/{clean_account_id}",
+            **self._report_params(request_body)
+        ).execute()
+        
+        if cache_key:
+            self.report_cache.put(cache_key, reports,
+                                  self.report_cache.ttl_for_range(date_span[1], self._account_today(account_id)),
+                                  request=cache_request)
+        return reports, False
+
+    @staticmethod
+    def _report_params(request_body: Dict[str, Any]) -> Dict[str, Any]:
+        """将报告请求转换为generate/generateCsv的关键字参数"""
+        # AdSense API v2的generate方法需要将参数展开传递，而不是使用body参数；
+        # startDate/endDate在发现文档中是 startDate.year 这类扁平参数，对应关键字参数 startDate_year
+        params = dict(request_body)
+        for field in ("startDate", "endDate"):
+            for part, number in (params.pop(field, None) or {}).items():
+                params[f"{field}_{part}"] = number
+        return params
+
+    @staticmethod
+    def _request_for_span(request_body: Dict[str, Any], span: Tuple[Any, Any]) -> Dict[str, Any]:
+        """返回日期范围替换为span的报告请求副本"""
+        body = dict(request_body)
+        body["startDate"] = {"year": span[0].year, "month": span[0].month, "day": span[0].day}
+        body["endDate"] = {"year": span[1].year, "month": span[1].month, "day": span[1].day}
+        return body
+
+    def _fetch_report_csv(self, account_id: str, request_body: Dict[str, Any]) -> Iterator[bytes]:
+        """调用accounts.reports.generateCsv，返回CSV响应体的分块迭代器"""
+        service = self._get_adsense_service()
+        return fetch_csv(service.accounts().reports().generateCsv(
+            account=f"accounts/{self._clean_account_id(account_id)}",
+            **self._report_params(request_body)
+        ))
+
+    def _fetch_sharded_report(self, account_id: str, request_body: Dict[str, Any], date_span: Tuple[Any, Any],
+                              granularity: str, cache: str = "use") -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """按日期分片并发拉取报告并按orderBy归并，返回 (合并后的响应, 分片统计)"""
+        shards = plan_shards(date_span[0], date_span[1], granularity)
+        
+        def fetch(span):
+            return self._fetch_report(account_id, self._request_for_span(request_body, span), span, cache)
+        
+        results = list(self.shard_executor.map(fetch, shards))
+        merged = merge_shard_reports(
+            [reports for reports, _ in results],
+            request_body.get("orderBy"),
+            request_body.get("limit")
+        )
+        return merged, {
+            "granularity": granularity,
+            "count": len(shards),
+            "cached": sum(1 for _, cached in results if cached)
+        }
+
+    def manage_ad_clients(self, action: str, account_id: str, ad_client_id: str = None,
+                          pagination: Dict[str, Any] = None) -> Dict[str, Any]:
         """管理广告客户端"""
         try:
             service = self._get_adsense_service()
@@ -1388,12 +2574,14 @@ class MCPAdSenseEnhancedUltimateServer:
             if action == "list":
                 # 列出所有广告客户端
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
-                ad_clients = service.accounts().adclients().list(
-                    parent=f"accounts/{clean_account_id}"
-                ).execute()
+                ad_clients = Paginator(
+                    service.accounts().adclients().list, 'adClients',
+                    parent=f"accounts/{clean_account_id}",
+                    **(pagination or {})
+                )
                 
                 client_list = []
-                for client in ad_clients.get('adClients', []):
+                for client in ad_clients:
                     client_list.append({
                         "name": client.get('name'),
                         "adClientId": client.get('adClientId'),
@@ -1402,19 +2590,13 @@ class MCPAdSenseEnhancedUltimateServer:
                         "state": client.get('state')
                     })
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "list",
-                                "ad_clients": client_list,
-                                "total": len(client_list)
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "list",
+                    "ad_clients": client_list,
+                    "total": len(client_list),
+                    "truncated": ad_clients.truncated
+                })
             
             elif action == "get" and ad_client_id:
                 # 获取广告客户端详情
@@ -1423,49 +2605,29 @@ class MCPAdSenseEnhancedUltimateServer:
                     name=f"accounts/{clean_account_id}/adclients/{ad_client_id}"
                 ).execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "ad_client": {
-                                    "name": ad_client.get('name'),
-                                    "adClientId": ad_client.get('adClientId'),
-                                    "productCode": ad_client.get('productCode'),
-                                    "reportingDimensionId": ad_client.get('reportingDimensionId'),
-                                    "state": ad_client.get('state')
-                                }
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "get",
+                    "ad_client": {
+                        "name": ad_client.get('name'),
+                        "adClientId": ad_client.get('adClientId'),
+                        "productCode": ad_client.get('productCode'),
+                        "reportingDimensionId": ad_client.get('reportingDimensionId'),
+                        "state": ad_client.get('state')
+                    }
+                })
             
             else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": "缺少必需参数或操作不支持"
+                })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self._text_result({"success": False, "error": str(e)})
 
-    def manage_sites(self, action: str, account_id: str, site_url: str = None) -> Dict[str, Any]:
+    def manage_sites(self, action: str, account_id: str, site_url: str = None,
+                     pagination: Dict[str, Any] = None, site_urls: List[str] = None) -> Dict[str, Any]:
         """管理AdSense网站"""
         try:
             service = self._get_adsense_service()
@@ -1473,10 +2635,14 @@ class MCPAdSenseEnhancedUltimateServer:
             if action == "list":
                 # 列出所有网站
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
-                sites = service.accounts().sites().list(parent=f"accounts/{clean_account_id}").execute()
+                sites = Paginator(
+                    service.accounts().sites().list, 'sites',
+                    parent=f"accounts/{clean_account_id}",
+                    **(pagination or {})
+                )
                 
                 site_list = []
-                for site in sites.get('sites', []):
+                for site in sites:
                     site_list.append({
                         "name": site.get('name'),
                         "reportingDimensionId": site.get('reportingDimensionId'),
@@ -1484,106 +2650,79 @@ class MCPAdSenseEnhancedUltimateServer:
                         "state": site.get('state')
                     })
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "list",
-                                "sites": site_list,
-                                "total": len(site_list)
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "list",
+                    "sites": site_list,
+                    "total": len(site_list),
+                    "truncated": sites.truncated
+                })
+            
+            elif action == "get" and site_urls:
+                # 批量获取多个网站详情
+                clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
+                batch = batch_get(
+                    service, site_urls,
+                    lambda url: service.accounts().sites().get(name=f"accounts/{clean_account_id}/sites/{url}"),
+                    self._describe_site, "site_url", execute=self.call_guard.execute
+                )
+                
+                return self._text_result({
+                    "success": True,
+                    "action": "get",
+                    "sites": batch["items"],
+                    "errors": batch["errors"],
+                    "total": batch["total"],
+                    "batches": batch["batches"]
+                })
             
             elif action == "get" and site_url:
                 # 获取网站详情
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
                 site = service.accounts().sites().get(name=f"accounts/{clean_account_id}/sites/{site_url}").execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "site": {
-                                    "name": site.get('name'),
-                                    "reportingDimensionId": site.get('reportingDimensionId'),
-                                    "uriPattern": site.get('uriPattern'),
-                                    "state": site.get('state')
-                                }
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "get",
+                    "site": self._describe_site(site)
+                })
             
             elif action == "approve" and site_url:
                 # 批准网站
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
                 site = service.accounts().sites().approve(name=f"accounts/{clean_account_id}/sites/{site_url}").execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "approve",
-                                "site": {
-                                    "name": site.get('name'),
-                                    "state": site.get('state')
-                                }
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "approve",
+                    "site": {
+                        "name": site.get('name'),
+                        "state": site.get('state')
+                    }
+                })
             
             elif action == "token_oauth_domain" and site_url:
                 # 生成OAuth令牌
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
                 result = service.accounts().sites().tokenOauthDomain(name=f"accounts/{clean_account_id}/sites/{site_url}").execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "token_oauth_domain",
-                                "token": result.get('token', '')
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "token_oauth_domain",
+                    "token": result.get('token', '')
+                })
             
             else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": "缺少必需参数或操作不支持"
+                })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self._text_result({"success": False, "error": str(e)})
 
-    def manage_policy_issues(self, action: str, account_id: str, policy_issue_id: str = None) -> Dict[str, Any]:
+    def manage_policy_issues(self, action: str, account_id: str, policy_issue_id: str = None,
+                             pagination: Dict[str, Any] = None, policy_issue_ids: List[str] = None) -> Dict[str, Any]:
         """管理政策问题"""
         try:
             service = self._get_adsense_service()
@@ -1591,10 +2730,14 @@ class MCPAdSenseEnhancedUltimateServer:
             if action == "list":
                 # 列出所有政策问题
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
-                policy_issues = service.accounts().policyIssues().list(parent=f"accounts/{clean_account_id}").execute()
+                policy_issues = Paginator(
+                    service.accounts().policyIssues().list, 'policyIssues',
+                    parent=f"accounts/{clean_account_id}",
+                    **(pagination or {})
+                )
                 
                 issue_list = []
-                for issue in policy_issues.get('policyIssues', []):
+                for issue in policy_issues:
                     issue_list.append({
                         "name": issue.get('name'),
                         "reportingDimensionId": issue.get('reportingDimensionId'),
@@ -1603,19 +2746,33 @@ class MCPAdSenseEnhancedUltimateServer:
                         "issue": issue.get('issue')
                     })
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "list",
-                                "policy_issues": issue_list,
-                                "total": len(issue_list)
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "list",
+                    "policy_issues": issue_list,
+                    "total": len(issue_list),
+                    "truncated": policy_issues.truncated
+                })
+            
+            elif action == "get" and policy_issue_ids:
+                # 批量获取多个政策问题详情
+                clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
+                batch = batch_get(
+                    service, [issue_id.split("/")[-1] for issue_id in policy_issue_ids],
+                    lambda issue_id: service.accounts().policyIssues().get(
+                        name=f"accounts/{clean_account_id}/policyIssues/{issue_id}"
+                    ),
+                    self._describe_policy_issue, "policy_issue_id", execute=self.call_guard.execute
+                )
+                
+                return self._text_result({
+                    "success": True,
+                    "action": "get",
+                    "policy_issues": batch["items"],
+                    "errors": batch["errors"],
+                    "total": batch["total"],
+                    "batches": batch["batches"]
+                })
             
             elif action == "get" and policy_issue_id:
                 # 获取政策问题详情
@@ -1624,49 +2781,24 @@ class MCPAdSenseEnhancedUltimateServer:
                     name=f"accounts/{clean_account_id}/policyIssues/{policy_issue_id}"
                 ).execute()
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "policy_issue": {
-                                    "name": policy_issue.get('name'),
-                                    "reportingDimensionId": policy_issue.get('reportingDimensionId'),
-                                    "uriPattern": policy_issue.get('uriPattern'),
-                                    "actionable": policy_issue.get('actionable'),
-                                    "issue": policy_issue.get('issue')
-                                }
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "get",
+                    "policy_issue": self._describe_policy_issue(policy_issue)
+                })
             
             else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": "缺少必需参数或操作不支持"
+                })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self._text_result({"success": False, "error": str(e)})
 
-    def manage_saved_reports(self, action: str, account_id: str, saved_report_id: str = None) -> Dict[str, Any]:
+    def manage_saved_reports(self, action: str, account_id: str, saved_report_id: str = None,
+                             pagination: Dict[str, Any] = None, transport: str = "json",
+                             output_file: str = None, output_format: str = None) -> Dict[str, Any]:
         """管理已保存的报告"""
         try:
             service = self._get_adsense_service()
@@ -1674,130 +2806,115 @@ class MCPAdSenseEnhancedUltimateServer:
             if action == "list":
                 # 列出已保存的报告
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
-                saved_reports = service.accounts().reports().saved().list(parent=f"accounts/{clean_account_id}").execute()
+                saved_reports = Paginator(
+                    service.accounts().reports().saved().list, 'savedReports',
+                    parent=f"accounts/{clean_account_id}",
+                    **(pagination or {})
+                )
                 
                 report_list = []
-                for report in saved_reports.get('savedReports', []):
+                for report in saved_reports:
                     report_list.append({
                         "name": report.get('name'),
                         "title": report.get('title'),
                         "createTime": report.get('createTime')
                     })
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "list",
-                                "saved_reports": report_list,
-                                "total": len(report_list)
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": True,
+                    "action": "list",
+                    "saved_reports": report_list,
+                    "total": len(report_list),
+                    "truncated": saved_reports.truncated
+                })
             
             elif action == "generate" and saved_report_id:
                 # 生成已保存的报告
                 clean_account_id = account_id.replace("accounts/", "") if account_id.startswith("accounts/") else account_id
-                report = service.accounts().reports().saved().generate(
-                    name=f"accounts/{clean_account_id}/reports/saved/{saved_report_id}"
-                ).execute()
+                # 已保存报告的资源名为 accounts/{account}/reports/{report}，也接受list返回的完整name
+                name = saved_report_id if saved_report_id.startswith("accounts/") else \
+                    f"accounts/{clean_account_id}/reports/{saved_report_id}"
+                output_format = infer_format(output_file, output_format) if output_file else None
+                if transport == "csv" or output_format == "csv":
+                    # 通过generateCsv下载，CSV导出直接保存响应体，否则直接解析CSV
+                    chunks = fetch_csv(service.accounts().reports().saved().generateCsv(name=name))
+                    if output_format == "csv":
+                        return self._text_result({
+                            "success": True,
+                            "action": "generate",
+                            "saved_report_id": saved_report_id,
+                            "transport": "csv",
+                            "file": write_csv(chunks, output_file)
+                        })
+                    report_table = parse_csv(chunks)
+                else:
+                    report_table = ReportTable.from_response(service.accounts().reports().saved().generate(name=name).execute())
                 
-                # 处理报告数据
-                rows = []
-                for row in report.get('rows', []):
-                    row_data = {}
-                    for cell in row.get('cells', []):
-                        row_data[cell.get('columnName')] = cell.get('value')
-                    rows.append(row_data)
+                if output_file:
+                    return self._text_result({
+                        "success": True,
+                        "action": "generate",
+                        "saved_report_id": saved_report_id,
+                        "transport": transport,
+                        "file": export_table(report_table, output_file, output_format)
+                    })
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "generate",
-                                "saved_report_id": saved_report_id,
-                                "rows": rows
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                # 处理报告数据，单元格不带列名，列名取自响应headers
+                rows = list(report_table.iter_flat_rows())
+                
+                return self._text_result({
+                    "success": True,
+                    "action": "generate",
+                    "saved_report_id": saved_report_id,
+                    "rows": rows
+                })
             
             else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self._text_result({
+                    "success": False,
+                    "error": "缺少必需参数或操作不支持"
+                })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self._text_result({"success": False, "error": str(e)})
 
 def main():
     """主函数 - MCP协议服务器"""
+    parser = argparse.ArgumentParser(prog="mcp-adsense-ultimate", description="Google AdSense MCP服务器")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--async", dest="use_async", action="store_true",
+                      help="使用asyncio主循环：stdin/stdout为异步流，tools/call作为协程在专用线程池中执行API调用")
+    mode.add_argument("--http", action="store_true",
+                      help="长驻HTTP服务模式：通过Streamable HTTP（/mcp）和HTTP+SSE（/sse）同时服务多个MCP客户端，"
+                           "所有会话共享服务对象、报告缓存和库存索引")
+    parser.add_argument("--host", default=None, help="--http模式的监听地址（默认读取MCP_ADSENSE_HTTP_HOST，否则为127.0.0.1）")
+    parser.add_argument("--port", type=int, default=None, help="--http模式的监听端口（默认读取MCP_ADSENSE_HTTP_PORT，否则为8765）")
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help=f"并发执行tools/call的最大线程数（默认读取MCP_ADSENSE_MAX_WORKERS，"
+                             f"否则为{DEFAULT_MAX_WORKERS}，--async模式为{DEFAULT_ASYNC_MAX_WORKERS}）")
+    parser.add_argument("--max-queue", type=int, default=None,
+                        help=f"等待执行的最大请求数（默认读取MCP_ADSENSE_MAX_QUEUE，"
+                             f"否则为{DEFAULT_MAX_QUEUE}，--async模式为{DEFAULT_ASYNC_MAX_QUEUE}）")
+    args = parser.parse_args()
+
+    # 响应以UTF-8输出，不再转义非ASCII字符
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(encoding="utf-8")
+
     server = MCPAdSenseEnhancedUltimateServer()
+    if args.use_async:
+        # asyncio只在--async模式下导入
+        from .async_dispatcher import AsyncJSONRPCDispatcher
+        dispatcher = AsyncJSONRPCDispatcher(server, max_workers=args.max_workers, max_queue=args.max_queue)
+    elif args.http:
+        from .http_server import HTTPDispatcher
+        dispatcher = HTTPDispatcher(server, host=args.host, port=args.port,
+                                    max_workers=args.max_workers, max_queue=args.max_queue)
+    else:
+        dispatcher = JSONRPCDispatcher(server, max_workers=args.max_workers, max_queue=args.max_queue)
     
     try:
-        while True:
-            line = sys.stdin.readline()
-            if not line:
-                break
-            
-            try:
-                request = json.loads(line.strip())
-                method = request.get("method")
-                params = request.get("params", {})
-                request_id = request.get("id")
-                
-                if method == "initialize":
-                    result = server.handle_initialize(params)
-                elif method == "tools/list":
-                    result = server.handle_tools_list()
-                elif method == "tools/call":
-                    result = server.handle_tools_call(
-                        params.get("name"),
-                        params.get("arguments", {})
-                    )
-                else:
-                    result = {"error": f"Unknown method: {method}"}
-                
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": result
-                }
-                
-                print(json.dumps(response))
-                sys.stdout.flush()
-                
-            except json.JSONDecodeError:
-                continue
-            except Exception as e:
-                error_response = {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id") if "request" in locals() else None,
-                    "error": {"code": -32603, "message": str(e)}
-                }
-                print(json.dumps(error_response))
-                sys.stdout.flush()
-                
+        dispatcher.serve(sys.stdin)
     except KeyboardInterrupt:
         pass
 
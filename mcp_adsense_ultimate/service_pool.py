@@ -0,0 +1,153 @@
+"""
+AdSense API服务对象池 - 进程级复用认证凭据与服务对象
+
+每个凭据身份（凭证文件路径或Application Default Credentials）只加载一次凭据，
+在令牌即将过期前主动刷新，并在凭证文件被修改时自动失效重建。
+底层的httplib2连接不是线程安全的，因此服务对象默认按线程各构建一份，凭据在线程间共享；
+使用线程安全的HTTP传输（见 http_transport）时所有线程共享同一个服务对象。
+"""
+
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class AdSenseServicePool:
+    """按凭据身份缓存AdSense服务对象的进程级服务池"""
+
+    def __init__(self, credentials_loader: Callable[[], Tuple[Any, Optional[str]]],
+                 service_builder: Callable[[Any], Any],
+                 identity_resolver: Callable[[], Tuple[Hashable, Any]],
+                 refresh_margin: int = 300, shared: bool = False):
+        """
+        Args:
+            credentials_loader: 返回 (credentials, project) 的凭据加载函数
+            service_builder: 根据凭据构建AdSense服务对象的函数
+            identity_resolver: 返回 (凭据身份, 版本标识) 的函数，版本标识变化时缓存失效
+            refresh_margin: 令牌距过期少于该秒数时主动刷新
+            shared: 服务对象的HTTP客户端线程安全时为True，所有线程共享一个服务对象
+        """
+        self._credentials_loader = credentials_loader
+        self._service_builder = service_builder
+        self._identity_resolver = identity_resolver
+        self._refresh_margin = timedelta(seconds=refresh_margin)
+        self._shared = shared
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Dict[str, Any]] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "invalidations": 0,
+            "thread_builds": 0
+        }
+
+    def get_service(self) -> Any:
+        """获取当前凭据身份对应的服务对象，必要时构建或刷新
+
+        池锁只在查找和替换条目时持有；读取凭证文件、刷新令牌和构建服务对象在各身份自己的锁下进行，
+        一个身份的慢速刷新不会阻塞其他身份，也不会阻塞已有可用服务对象的线程。
+        """
+        identity, version = self._identity_resolver()
+        with self._lock:
+            entry = self._entries.get(identity)
+            if entry is not None and entry["version"] != version:
+                print(f"🔄 检测到凭证文件变更，重建AdSense服务: {identity}", file=sys.stderr)
+                self._entries.pop(identity, None)
+                self._stats["invalidations"] += 1
+                entry = None
+
+            if entry is None:
+                self._stats["misses"] += 1
+                entry = {
+                    "version": version,
+                    "lock": threading.Lock(),
+                    "refresh_lock": threading.Lock(),
+                    "credentials": None,
+                    "project": None,
+                    "local": threading.local(),
+                    "created_at": datetime.now().isoformat()
+                }
+                self._entries[identity] = entry
+            else:
+                self._stats["hits"] += 1
+
+        if entry["credentials"] is None:
+            # 同一身份只有一个线程加载凭据，其余线程等待其结果
+            with entry["lock"]:
+                if entry["credentials"] is None:
+                    try:
+                        entry["credentials"], entry["project"] = self._credentials_loader()
+                    except Exception:
+                        with self._lock:
+                            if self._entries.get(identity) is entry:
+                                del self._entries[identity]
+                        raise
+
+        self._refresh_if_expiring(entry)
+
+        if not self._shared:
+            service = getattr(entry["local"], "service", None)
+            if service is None:
+                service = entry["local"].service = self._service_builder(entry["credentials"])
+                self._count("thread_builds")
+            return service
+
+        service = entry.get("service")
+        if service is None:
+            with entry["lock"]:
+                service = entry.get("service")
+                if service is None:
+                    service = entry["service"] = self._service_builder(entry["credentials"])
+                    self._count("thread_builds")
+        return service
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _refresh_if_expiring(self, entry: Dict[str, Any]) -> None:
+        """令牌已获取且即将过期时主动刷新，避免在API调用过程中同步刷新
+
+        刷新时令牌仍在有效期内（距过期不足refresh_margin），因此只由一个线程刷新，
+        其他线程不等待，继续使用当前令牌。
+        """
+        credentials = entry["credentials"]
+        expiry = getattr(credentials, "expiry", None)
+        if not getattr(credentials, "token", None) or expiry is None:
+            return
+        # google-auth 使用不带时区的UTC时间
+        if expiry - datetime.now(timezone.utc).replace(tzinfo=None) > self._refresh_margin:
+            return
+        if not entry["refresh_lock"].acquire(blocking=False):
+            return
+
+        try:
+            from google.auth.transport.requests import Request
+            credentials.refresh(Request())
+            self._count("refreshes")
+        except Exception as e:
+            # 刷新失败时保留旧凭据，由API调用时的自动刷新兜底
+            self._count("refresh_failures")
+            print(f"⚠️ 主动刷新访问令牌失败: {str(e)}", file=sys.stderr)
+        finally:
+            entry["refresh_lock"].release()
+
+    def invalidate(self, identity: Hashable = None) -> None:
+        """使指定身份（默认全部）的缓存失效"""
+        with self._lock:
+            if identity is None:
+                self._stats["invalidations"] += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(identity, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中/未命中/刷新等计数器"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["shared"] = self._shared
+            return stats
@@ -0,0 +1,204 @@
+"""
+工具注册表 - 每个MCP工具只声明一次名称、说明、inputSchema和处理函数
+
+    分发     按工具名查字典（O(1)），不再逐个比较工具名
+    tools/list  工具列表在注册完成后构建一次，并预先序列化为JSON文本，
+             调度器直接拼接到JSON-RPC响应中
+    参数校验  注册时把inputSchema编译为检查函数：type、enum、items、oneOf和required，
+             缺少的必需参数在schema声明了default时补上默认值；null视为未提供；
+             整数/数字/布尔参数接受可无损转换的字符串（例如 "100"、"true"）
+    统计     每个工具的调用次数、参数校验失败次数和累计耗时
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 检查函数：返回 (转换后的值, 错误信息)，校验通过时错误信息为None
+Checker = Callable[[Any, str], Tuple[Any, Optional[str]]]
+
+
+def _check_type(expected: str) -> Checker:
+    def check(value: Any, path: str) -> Tuple[Any, Optional[str]]:
+        if expected == "string":
+            ok = isinstance(value, str)
+        elif expected == "integer":
+            if isinstance(value, str) and value.strip().lstrip("+-").isdigit():
+                value = int(value)
+            ok = isinstance(value, int) and not isinstance(value, bool)
+        elif expected == "number":
+            if isinstance(value, str):
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+            ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+        elif expected == "boolean":
+            if isinstance(value, str) and value.lower() in ("true", "false"):
+                value = value.lower() == "true"
+            ok = isinstance(value, bool)
+        elif expected == "array":
+            ok = isinstance(value, list)
+        elif expected == "object":
+            ok = isinstance(value, dict)
+        else:
+            ok = True
+        return value, None if ok else f"参数 {path} 应为{expected}类型，实际为: {value!r}"
+    return check
+
+
+def compile_schema(schema: Dict[str, Any]) -> Checker:
+    """将一个（子）schema编译为检查函数"""
+    checks: List[Checker] = []
+
+    alternatives = schema.get("oneOf") or schema.get("anyOf")
+    if alternatives:
+        compiled = [compile_schema(alternative) for alternative in alternatives]
+
+        def check_alternatives(value: Any, path: str) -> Tuple[Any, Optional[str]]:
+            errors = []
+            for check in compiled:
+                converted, error = check(value, path)
+                if error is None:
+                    return converted, None
+                errors.append(error)
+            return value, "；".join(errors)
+        checks.append(check_alternatives)
+
+    if isinstance(schema.get("type"), str):
+        checks.append(_check_type(schema["type"]))
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        allowed_set = set(allowed)
+
+        def check_enum(value: Any, path: str) -> Tuple[Any, Optional[str]]:
+            try:
+                if value in allowed_set:
+                    return value, None
+            except TypeError:  # 不可哈希的值（例如列表）
+                pass
+            return value, f"参数 {path} 的值 {value!r} 无效，可选: {', '.join(str(item) for item in allowed)}"
+        checks.append(check_enum)
+
+    if isinstance(schema.get("items"), dict):
+        item_check = compile_schema(schema["items"])
+
+        def check_items(value: Any, path: str) -> Tuple[Any, Optional[str]]:
+            if not isinstance(value, list):
+                return value, None
+            converted = []
+            for index, item in enumerate(value):
+                item, error = item_check(item, f"{path}[{index}]")
+                if error:
+                    return value, error
+                converted.append(item)
+            return converted, None
+        checks.append(check_items)
+
+    def check(value: Any, path: str) -> Tuple[Any, Optional[str]]:
+        for step in checks:
+            value, error = step(value, path)
+            if error:
+                return value, error
+        return value, None
+    return check
+
+
+class Tool:
+    """一个已注册的工具"""
+
+    __slots__ = ("name", "description", "input_schema", "handler", "_properties", "_required")
+
+    def __init__(self, name: str, description: str, input_schema: Dict[str, Any], handler: Callable[..., Any]):
+        self.name = name
+        self.description = description
+        self.input_schema = input_schema
+        self.handler = handler
+        properties = input_schema.get("properties") or {}
+        self._properties = {key: compile_schema(spec) for key, spec in properties.items()}
+        self._required = [
+            (key, (properties.get(key) or {}).get("default")) for key in input_schema.get("required") or []
+        ]
+
+    def bind(self, arguments: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """校验并转换参数，返回 (参数, 错误信息)；未声明的参数原样保留"""
+        bound = dict(arguments or {})
+        for key, default in self._required:
+            if bound.get(key) is None:
+                if default is None:
+                    return bound, f"缺少必需参数: {key}"
+                bound[key] = default
+        for key, value in bound.items():
+            check = self._properties.get(key)
+            if check is None or value is None:
+                continue
+            value, error = check(value, key)
+            if error:
+                return bound, error
+            bound[key] = value
+        return bound, None
+
+    def definition(self) -> Dict[str, Any]:
+        """tools/list 中的工具定义"""
+        return {"name": self.name, "description": self.description, "inputSchema": self.input_schema}
+
+
+class ToolRegistry:
+    """MCP工具注册表"""
+
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+        self._list_payload: Optional[Dict[str, Any]] = None
+        self._list_json: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, name: str, description: str, input_schema: Dict[str, Any],
+                 handler: Callable[..., Any]) -> Tool:
+        """注册工具；同名工具不能重复注册"""
+        if name in self._tools:
+            raise ValueError(f"工具已注册: {name}")
+        tool = Tool(name, description, input_schema, handler)
+        self._tools[name] = tool
+        self._list_payload = self._list_json = None
+        return tool
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def list_payload(self) -> Dict[str, Any]:
+        """tools/list 的结果（按注册顺序，构建一次后复用）"""
+        if self._list_payload is None:
+            self._list_payload = {"tools": [tool.definition() for tool in self._tools.values()]}
+        return self._list_payload
+
+    def list_json(self, dumps: Callable[[Any], str]) -> str:
+        """预先序列化的 tools/list 结果"""
+        if self._list_json is None:
+            self._list_json = dumps(self.list_payload())
+        return self._list_json
+
+    def record(self, name: str, seconds: float, invalid: bool = False) -> None:
+        """记录一次工具调用的耗时（参数校验失败时 invalid=True）"""
+        with self._lock:
+            stats = self._stats.setdefault(name, {"calls": 0, "invalid_arguments": 0, "total_ms": 0.0})
+            stats["calls"] += 1
+            stats["total_ms"] += seconds * 1000
+            if invalid:
+                stats["invalid_arguments"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各工具的调用次数、参数校验失败次数、累计和平均耗时"""
+        with self._lock:
+            stats = {name: dict(item) for name, item in self._stats.items()}
+        for item in stats.values():
+            item["avg_ms"] = round(item["total_ms"] / item["calls"], 2) if item["calls"] else None
+            item["total_ms"] = round(item["total_ms"], 1)
+        return stats
+
@@ -48,6 +48,9 @@ setup(
             "sphinx>=4.0",
             "sphinx-rtd-theme>=0.5",
         ],
+        "export": [
+            "pyarrow>=10.0",
+        ],
     },
     entry_points={
         "console_scripts": [
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+from googleapiclient.http import HttpMockSequence
+
+from mcp_adsense_ultimate.discovery import build_adsense_service
+from mcp_adsense_ultimate.server import MCPAdSenseEnhancedUltimateServer
+
+
+@pytest.fixture(autouse=True)
+def isolated_env(tmp_path, monkeypatch):
+    """每个测试使用独立的缓存目录，不预热，不读取本机凭据"""
+    monkeypatch.setenv("MCP_ADSENSE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("MCP_ADSENSE_PREWARM", "0")
+    monkeypatch.setenv("GOOGLE_ADSENSE_ACCOUNT_ID", "pub-1")
+    # 模拟的API响应按顺序消费，分片与多账户调用改为串行执行
+    monkeypatch.setenv("MCP_ADSENSE_SHARD_WORKERS", "1")
+    monkeypatch.setenv("MCP_ADSENSE_FAN_OUT_WORKERS", "1")
+    monkeypatch.delenv("MCP_ADSENSE_SYNC_DB", raising=False)
+    monkeypatch.delenv("MCP_ADSENSE_REPORT_CACHE_DB", raising=False)
+
+
+@pytest.fixture
+def make_server():
+    """构造服务器，API调用按顺序由 responses 应答（dict按JSON返回，(headers, body)元组原样返回）"""
+    def make(responses):
+        server = MCPAdSenseEnhancedUltimateServer()
+        http = HttpMockSequence([
+            response if isinstance(response, tuple) else ({"status": "200"}, json.dumps(response))
+            for response in responses
+        ])
+        service = build_adsense_service(http=http, request_builder=server.call_guard.request_builder)
+        server.service_pool.get_service = lambda *args, **kwargs: service
+        server.http_mock = http
+        return server
+    return make
+
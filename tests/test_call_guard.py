@@ -0,0 +1,120 @@
+import json
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from mcp_adsense_ultimate.call_guard import CallGuard, CircuitOpenError, account_key
+
+
+def _payload(result):
+    return json.loads(result["content"][0]["text"])
+
+
+def _error(status, content=b"{}", headers=None):
+    return HttpError(httplib2.Response(dict({"status": str(status)}, **(headers or {}))), content)
+
+
+def _failing(*errors, result="ok"):
+    """依次抛出errors中的异常，之后返回result"""
+    remaining = list(errors)
+
+    def call():
+        if remaining:
+            raise remaining.pop(0)
+        return result
+    return call
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+@pytest.fixture
+def guard(sleeps):
+    return CallGuard(qps=1000, max_retries=3, base_delay=1, max_delay=8,
+                     breaker_threshold=2, breaker_cooldown=60, sleep=sleeps.append)
+
+
+def test_account_key():
+    assert account_key("https://adsense.googleapis.com/v2/accounts/pub-1/sites?alt=json") == "pub-1"
+    assert account_key("https://adsense.googleapis.com/v2/accounts?alt=json") == "project"
+
+
+def test_retries_server_errors_then_succeeds(guard, sleeps):
+    assert guard.call(_failing(_error(503), OSError("连接重置"))) == "ok"
+    assert len(sleeps) == 2
+    assert sleeps[0] <= 1 and sleeps[1] <= 2
+    stats = guard.stats()
+    assert stats["retries"] == 2
+    assert stats["server_errors"] == 1
+    assert stats["transport_errors"] == 1
+    assert stats["breaker"]["state"] == "closed"
+
+
+def test_client_errors_are_not_retried(guard, sleeps):
+    with pytest.raises(HttpError):
+        guard.call(_failing(_error(404)))
+    assert sleeps == []
+    assert guard.stats()["failures"] == 0
+
+
+def test_retry_after_and_throttle_halve_rate(guard, sleeps):
+    assert guard.call(_failing(_error(429, headers={"retry-after": "5"})), key="pub-1") == "ok"
+    assert sleeps == [5.0]
+    assert guard.stats()["limiters"]["pub-1"]["qps"] < 1000
+
+
+def test_rate_limit_403_is_retried_but_permission_403_is_not(guard, sleeps):
+    assert guard.call(_failing(_error(403, b'{"reason": "rateLimitExceeded"}'))) == "ok"
+    with pytest.raises(HttpError):
+        guard.call(_failing(_error(403, b'{"reason": "forbidden"}')))
+    assert len(sleeps) == 1
+
+
+def test_num_retries_overrides_default(guard, sleeps):
+    with pytest.raises(HttpError):
+        guard.call(_failing(_error(500), _error(500)), num_retries=1)
+    assert len(sleeps) == 1
+
+
+def test_breaker_opens_after_consecutive_failures(guard):
+    for _ in range(2):
+        with pytest.raises(HttpError):
+            guard.call(_failing(*[_error(500)] * 4))
+    assert guard.stats()["breaker"]["state"] == "open"
+    with pytest.raises(CircuitOpenError):
+        guard.call(_failing())
+    assert guard.stats()["short_circuited"] == 1
+
+
+def test_breaker_lets_one_trial_through_after_cooldown(guard, monkeypatch):
+    for _ in range(2):
+        with pytest.raises(HttpError):
+            guard.call(_failing(*[_error(500)] * 4))
+    monkeypatch.setattr(guard, "breaker_cooldown", 0)
+    assert guard.stats()["breaker"]["state"] == "half_open"
+    assert guard.call(_failing()) == "ok"
+    assert guard.stats()["breaker"] == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_failed_trial_reopens_breaker(guard, monkeypatch):
+    for _ in range(2):
+        with pytest.raises(HttpError):
+            guard.call(_failing(*[_error(500)] * 4))
+    monkeypatch.setattr(guard, "breaker_cooldown", 0)
+    with pytest.raises(HttpError):
+        guard.call(_failing(*[_error(500)] * 4))
+    assert guard.stats()["breaker_opens"] == 2
+
+
+def test_managed_requests_retry_through_service(make_server, monkeypatch):
+    monkeypatch.setenv("MCP_ADSENSE_RETRY_BASE_DELAY", "0")
+    server = make_server([
+        ({"status": "503"}, b"{}"),
+        {"name": "accounts/pub-1", "displayName": "测试账户"},
+    ])
+    payload = _payload(server.handle_tools_call("manage_accounts", {"action": "get"}))
+    assert payload["account"]["displayName"] == "测试账户"
+    assert server.call_guard.stats()["retries"] == 1
@@ -0,0 +1,85 @@
+import io
+import json
+import threading
+
+import pytest
+
+from mcp_adsense_ultimate.async_dispatcher import AsyncJSONRPCDispatcher
+from mcp_adsense_ultimate.dispatcher import DEFAULT_ASYNC_MAX_WORKERS, JSONRPCDispatcher, parse_message
+from mcp_adsense_ultimate.serialization import ResponseSerializer
+
+
+class StubServer:
+    """只实现调度器用到的接口；tools/call 按参数阻塞或立即返回"""
+
+    def __init__(self):
+        self.serializer = ResponseSerializer("compact")
+        self.dispatcher = None
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def handle_initialize(self, params):
+        return {"protocolVersion": "2024-11-05"}
+
+    def handle_tools_list(self):
+        return {"tools": []}
+
+    def handle_tools_call(self, name, arguments):
+        if arguments.get("block"):
+            self.started.release()
+            self.release.wait(5)
+        return {"content": [{"type": "text", "text": name}]}
+
+
+def _lines(*messages):
+    return io.StringIO("".join(json.dumps(message) + "\n" for message in messages))
+
+
+def _call(request_id, name, **arguments):
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+
+
+def test_parse_message_ignores_invalid_lines():
+    assert parse_message("not json") is None
+    assert parse_message("[1, 2]") is None
+    assert parse_message('{"id": 1}') == {"id": 1}
+
+
+@pytest.mark.parametrize("dispatcher_class", [JSONRPCDispatcher, AsyncJSONRPCDispatcher])
+def test_responses_and_notifications(dispatcher_class):
+    server, output = StubServer(), io.StringIO()
+    dispatcher = dispatcher_class(server, max_workers=2, max_queue=4, output=output)
+    dispatcher.serve(_lines(
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        _call(2, "a"),
+        _call(3, "b"),
+    ))
+    responses = {message["id"]: message for message in map(json.loads, output.getvalue().splitlines())}
+    assert set(responses) == {1, 2, 3}
+    assert responses[3]["result"]["content"][0]["text"] == "b"
+    assert dispatcher.stats()["completed"] == 2
+
+
+def test_async_dispatcher_runs_calls_concurrently():
+    server, output = StubServer(), io.StringIO()
+    dispatcher = AsyncJSONRPCDispatcher(server, max_workers=8, max_queue=8, output=output)
+
+    def release_when_all_started():
+        for _ in range(5):
+            server.started.acquire(timeout=5)
+        server.release.set()
+
+    releaser = threading.Thread(target=release_when_all_started)
+    releaser.start()
+    dispatcher.serve(_lines(*[_call(i, f"t{i}", block=True) for i in range(5)]))
+    releaser.join()
+    assert server.release.is_set()
+    assert len(output.getvalue().splitlines()) == 5
+
+
+def test_async_defaults_allow_hundreds_in_flight(monkeypatch):
+    monkeypatch.delenv("MCP_ADSENSE_MAX_WORKERS", raising=False)
+    dispatcher = AsyncJSONRPCDispatcher(StubServer(), output=io.StringIO())
+    assert dispatcher.max_workers == DEFAULT_ASYNC_MAX_WORKERS >= 256
+    dispatcher._executor.shutdown()
@@ -0,0 +1,98 @@
+import json
+import os
+from datetime import date, timedelta
+
+import pytest
+
+from mcp_adsense_ultimate.earnings_sync import EarningsStore
+
+HEADERS = [{"name": "DATE", "type": "DIMENSION"}, {"name": "CLICKS", "type": "METRIC_TALLY"}]
+
+
+def _daily(span, clicks=1):
+    rows = []
+    day = span[0]
+    while day <= span[1]:
+        rows.append({"cells": [{"value": day.isoformat()}, {"value": str(clicks)}]})
+        day += timedelta(days=1)
+    return {"headers": HEADERS, "rows": rows}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EarningsStore(db_path=str(tmp_path / "earnings.sqlite3"), restatement_days=3, backfill_days=9)
+
+
+def test_no_database_is_created_before_first_sync(store):
+    assert store.query("pub-1", ["DATE"], ["CLICKS"], date(2024, 1, 1), date(2024, 1, 2)) is None
+    assert store.status() == []
+    assert not os.path.exists(store.db_path)
+
+
+def test_sync_watermarks_and_incremental_refetch(store):
+    spans = []
+
+    def fetch(span):
+        spans.append(span)
+        return _daily(span)
+
+    spec = store.sync("pub-1", ["DATE"], ["CLICKS"], fetch, today=date(2024, 1, 10))
+    assert spec["first_date"] == "2024-01-01"
+    assert spec["synced_through"] == "2024-01-10"
+    assert spec["finalized_through"] == "2024-01-07"
+    assert spec["rows_written"] == 10
+
+    spec = store.sync("pub-1", ["DATE"], ["CLICKS"], fetch, today=date(2024, 1, 12))
+    assert spans[-1] == (date(2024, 1, 8), date(2024, 1, 12))
+    assert spec["finalized_through"] == "2024-01-09"
+
+
+def test_query_final_only_stops_at_finalized_watermark(store):
+    store.sync("pub-1", ["DATE"], ["CLICKS"], _daily, today=date(2024, 1, 10))
+    start, end = date(2024, 1, 5), date(2024, 1, 10)
+
+    everything = store.query("pub-1", ["DATE"], ["CLICKS"], start, end, limit=2)
+    assert everything["syncSpec"]["local_through"] == "2024-01-10"
+    assert len(everything["rows"]) == 2
+
+    final = store.query("pub-1", ["DATE"], ["CLICKS"], start, end, limit=2, final_only=True)
+    assert final["syncSpec"]["local_through"] == "2024-01-07"
+    # 未覆盖到end时不截断，由调用方与API数据归并后再应用limit
+    assert [row["cells"][0]["value"] for row in final["rows"]] == ["2024-01-05", "2024-01-06", "2024-01-07"]
+
+    assert store.query("pub-1", ["DATE"], ["CLICKS"], date(2024, 1, 9), end, final_only=True) is None
+
+
+def test_delete_is_scoped_to_account(store):
+    spec = store.sync("pub-1", ["DATE"], ["CLICKS"], _daily, today=date(2024, 1, 10))
+    assert not store.delete(spec["spec_id"], "pub-2")
+    assert store.delete(spec["spec_id"], "pub-1")
+    assert store.status() == []
+
+
+def test_auto_source_fetches_days_after_finalized_from_api(make_server):
+    today = date.today()
+    server = make_server([
+        {"name": "accounts/pub-1", "timeZone": {"id": "UTC"}},
+        _daily((today - timedelta(days=9), today)),
+        _daily((today - timedelta(days=2), today), clicks=7),
+    ])
+    server.earnings_store.restatement_days = 3
+    synced = json.loads(server.sync_earnings("sync", "pub-1", ["DATE"], ["CLICKS"],
+                                             (today - timedelta(days=9)).isoformat())["content"][0]["text"])
+    assert synced["success"], synced
+
+    start = today - timedelta(days=5)
+    result = json.loads(server.get_reports(
+        "pub-1", start.isoformat(), today.isoformat(), ["CLICKS"], ["DATE"]
+    )["content"][0]["text"])
+    assert result["success"], result
+    assert result["source"] == "mixed"
+    assert result["sync"]["api_range"] == [(today - timedelta(days=2)).isoformat(), today.isoformat()]
+    assert [row["CLICKS"]["value"] for row in result["rows"]] == ["1", "1", "1", "7", "7", "7"]
+
+    local = json.loads(server.get_reports(
+        "pub-1", start.isoformat(), today.isoformat(), ["CLICKS"], ["DATE"], source="local"
+    )["content"][0]["text"])
+    assert local["source"] == "local"
+    assert [row["CLICKS"]["value"] for row in local["rows"]] == ["1"] * 6
@@ -0,0 +1,63 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from mcp_adsense_ultimate.fan_out import add_account_column, merge_list_payloads, run_fan_out
+
+
+def _payload(result):
+    return json.loads(result["content"][0]["text"])
+
+
+def test_run_fan_out_keeps_account_order_and_collects_errors():
+    def call(account):
+        if account == "pub-2":
+            raise RuntimeError("拒绝访问")
+        return account.upper()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results, errors = run_fan_out(executor, ["pub-1", "pub-2", "pub-3"], call)
+    assert results == [("pub-1", "PUB-1"), ("pub-3", "PUB-3")]
+    assert errors == [{"account": "pub-2", "error": "拒绝访问"}]
+
+
+def test_add_account_column_reorders_to_names():
+    response = {
+        "headers": [{"name": "CLICKS", "type": "METRIC_TALLY"}, {"name": "DATE", "type": "DIMENSION"}],
+        "rows": [{"cells": [{"value": "3"}, {"value": "2024-01-01"}]}]
+    }
+    merged = add_account_column("pub-1", response, ["DATE", "CLICKS"])
+    assert [header["name"] for header in merged["headers"]] == ["account", "DATE", "CLICKS"]
+    assert [cell["value"] for cell in merged["rows"][0]["cells"]] == ["pub-1", "2024-01-01", "3"]
+
+
+def test_merge_list_payloads():
+    merged = merge_list_payloads("ad_units", [
+        ("pub-1", {"ad_units": [{"name": "a"}]}),
+        ("pub-2", {"ad_units": [{"name": "b"}], "truncated": True}),
+    ])
+    assert merged == {
+        "ad_units": [{"account": "pub-1", "name": "a"}, {"account": "pub-2", "name": "b"}],
+        "total": 2,
+        "truncated": True
+    }
+
+
+def test_missing_default_client_is_a_text_result(make_server):
+    server = make_server([{"adClients": []}])
+    result = server.handle_tools_call("manage_ad_units", {"action": "list"})
+    payload = _payload(result)
+    assert payload["success"] is False
+    assert "默认客户端ID" in payload["error"]
+
+
+def test_fan_out_reports_missing_default_client_per_account(make_server):
+    server = make_server([
+        {"adClients": [{"name": "accounts/pub-1/adclients/ca-pub-1", "productCode": "AFC"}]},
+        {"adUnits": [{"name": "accounts/pub-1/adclients/ca-pub-1/adunits/1", "displayName": "首页"}]},
+        {"adClients": []},
+    ])
+    payload = _payload(server.handle_tools_call("manage_ad_units", {"action": "list", "account_ids": ["pub-1", "pub-2"]}))
+    assert payload["success"], payload
+    assert [unit["account"] for unit in payload["ad_units"]] == ["pub-1"]
+    assert payload["errors"][0]["account"] == "pub-2"
+    assert "默认客户端ID" in payload["errors"][0]["error"]
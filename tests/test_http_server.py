@@ -0,0 +1,115 @@
+import http.client
+import json
+
+import pytest
+
+from mcp_adsense_ultimate.http_server import HTTPDispatcher, Session, confine_paths
+
+
+@pytest.fixture
+def dispatcher(make_server):
+    dispatchers = []
+
+    def start(responses=(), **kwargs):
+        dispatcher = HTTPDispatcher(make_server(list(responses)), host="127.0.0.1", port=0, **kwargs)
+        dispatcher.start()
+        dispatchers.append(dispatcher)
+        return dispatcher
+    yield start
+    for dispatcher in dispatchers:
+        dispatcher.shutdown()
+
+
+def _request(dispatcher, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(dispatcher.host, dispatcher.port, timeout=10)
+    connection.request(method, path, json.dumps(body) if body is not None else None,
+                       {"Content-Type": "application/json", **(headers or {})})
+    response = connection.getresponse()
+    data = response.read().decode("utf-8")
+    connection.close()
+    return response.status, dict(response.getheaders()), data
+
+
+def _initialize(dispatcher, headers=None, path="/mcp"):
+    return _request(dispatcher, "POST", path, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}, headers)
+
+
+def _call(dispatcher, session_id, name, arguments, headers=None):
+    status, _, body = _request(dispatcher, "POST", "/mcp", {
+        "jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": name, "arguments": arguments}
+    }, {"Mcp-Session-Id": session_id, **(headers or {})})
+    assert status == 200, body
+    return json.loads(json.loads(body)["result"]["content"][0]["text"])
+
+
+def test_session_scope_rejects_other_accounts():
+    session = Session("s", ["pub-1"])
+    arguments, error = session.scope("manage_ad_units", {"action": "list"})
+    assert error is None and arguments["account_id"] == "pub-1"
+    assert session.scope("manage_ad_units", {"account_id": "accounts/pub-2"})[1]
+    assert session.scope("manage_ad_units", {"account_ids": ["pub-1", "pub-2"]})[1]
+    assert session.scope("get_reports", {"saved_report_id": "accounts/pub-2/reports/r1"})[1]
+    assert session.scope("manage_report_cache", {"action": "clear"})[1]
+    assert session.scope("manage_report_cache", {"action": "stats"})[1] is None
+    assert Session("s", []).scope("get_server_stats", {})[1] is None
+
+
+def test_confine_paths(tmp_path):
+    root = str(tmp_path)
+    assert confine_paths({"output_file": "a.csv"}, None)[1]
+    arguments, error = confine_paths({"output_file": "/out/a.csv"}, root)
+    assert error is None and arguments["output_file"] == str(tmp_path / "out" / "a.csv")
+    assert confine_paths({"output_file": "../a.csv"}, root)[1]
+    assert confine_paths({"specs_file": "."}, root)[1]
+
+
+def test_healthz_does_not_expose_sessions(dispatcher):
+    server = dispatcher(token="secret")
+    status, headers, _ = _initialize(server, {"Authorization": "Bearer secret", "X-AdSense-Account": "pub-1"})
+    assert status == 200
+    status, _, body = _request(server, "GET", "/healthz")
+    health = json.loads(body)
+    assert status == 200 and health["status"] == "ok" and health["active_sessions"] == 1
+    assert "pub-1" not in body and "sessions" not in health and "file_root" not in health
+
+
+def test_foreign_origin_is_rejected(dispatcher):
+    server = dispatcher(allowed_origins=["https://console.example.com", "tools.example.org"])
+    assert _initialize(server, {"Origin": "http://evil.example"})[0] == 403
+    assert _initialize(server, {"Origin": "null"})[0] == 403
+    assert _request(server, "GET", "/healthz", headers={"Origin": "http://evil.example"})[0] == 403
+    assert _initialize(server)[0] == 200
+    assert _initialize(server, {"Origin": "http://localhost:3000"})[0] == 200
+    assert _initialize(server, {"Origin": "https://console.example.com/"})[0] == 200
+    assert _initialize(server, {"Origin": "https://tools.example.org"})[0] == 200
+    assert server.stats()["forbidden_origins"] == 3
+
+
+def test_tokens_bind_sessions_to_accounts(dispatcher):
+    server = dispatcher([{"name": "accounts/pub-1", "displayName": "一"}],
+                        tokens={"tenant": ["pub-1", "accounts/pub-2"], "admin": "*"})
+    tenant = {"Authorization": "Bearer tenant"}
+
+    # 省略账户请求头也不能得到不限账户的会话
+    status, headers, _ = _initialize(server, tenant)
+    assert status == 200
+    session_id = headers["Mcp-Session-Id"]
+    assert server.get_session(session_id, "tenant").accounts == ["pub-1", "pub-2"]
+    assert _call(server, session_id, "get_server_stats", {}, tenant)["success"] is False
+    assert _call(server, session_id, "manage_accounts", {"action": "get", "account_id": "pub-3"}, tenant)["success"] is False
+    assert _call(server, session_id, "manage_accounts", {"action": "get"}, tenant)["success"]
+
+    # 请求头只能在令牌范围内缩小账户
+    assert _initialize(server, {**tenant, "X-AdSense-Account": "pub-2"})[0] == 200
+    assert _initialize(server, {**tenant, "X-AdSense-Account": "pub-3"})[0] == 403
+
+    # 会话只能由创建它的令牌使用
+    status, _, _ = _request(server, "POST", "/mcp", {"jsonrpc": "2.0", "id": 3, "method": "tools/list"},
+                            {"Authorization": "Bearer admin", "Mcp-Session-Id": session_id})
+    assert status == 404
+    assert _request(server, "DELETE", "/mcp", headers={"Authorization": "Bearer admin", "Mcp-Session-Id": session_id})[0] == 404
+
+    status, headers, _ = _initialize(server, {"Authorization": "Bearer admin"})
+    assert server.get_session(headers["Mcp-Session-Id"], "admin").accounts == []
+    assert _initialize(server, {"Authorization": "Bearer wrong"})[0] == 401
+    assert server.stats()["scoped_tokens"] == 1
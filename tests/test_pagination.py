@@ -0,0 +1,76 @@
+import json
+
+from mcp_adsense_ultimate.pagination import MAX_PAGE_SIZE, Paginator
+
+
+def _payload(result):
+    return json.loads(result["content"][0]["text"])
+
+
+class _Request:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+def _list_method(pages, calls):
+    """按pageToken返回对应页的list方法，记录每次调用的参数"""
+    def list_method(**params):
+        calls.append(params)
+        return _Request(pages[params.get("pageToken")])
+    return list_method
+
+
+PAGES = {
+    None: {"sites": [{"name": "a"}, {"name": "b"}], "nextPageToken": "p2"},
+    "p2": {"sites": [{"name": "c"}], "nextPageToken": "p3"},
+    "p3": {"sites": [{"name": "d"}]},
+}
+
+
+def test_follows_page_tokens_and_passes_params():
+    calls = []
+    paginator = Paginator(_list_method(PAGES, calls), "sites", page_size=2, parent="accounts/pub-1")
+    assert [item["name"] for item in paginator] == ["a", "b", "c", "d"]
+    assert calls == [
+        {"parent": "accounts/pub-1", "pageSize": 2},
+        {"parent": "accounts/pub-1", "pageSize": 2, "pageToken": "p2"},
+        {"parent": "accounts/pub-1", "pageSize": 2, "pageToken": "p3"},
+    ]
+    assert paginator.pages_fetched == 3
+    assert not paginator.truncated
+
+
+def test_max_items_stops_without_fetching_more_pages():
+    calls = []
+    paginator = Paginator(_list_method(PAGES, calls), "sites", max_items=2)
+    assert [item["name"] for item in paginator] == ["a", "b"]
+    assert len(calls) == 1
+    assert paginator.truncated
+
+
+def test_max_items_equal_to_total_is_not_truncated():
+    paginator = Paginator(_list_method(PAGES, []), "sites", max_items=4)
+    assert len(list(paginator)) == 4
+    assert not paginator.truncated
+
+
+def test_prefetch_yields_same_items():
+    paginator = Paginator(_list_method(PAGES, []), "sites", prefetch=True)
+    assert [item["name"] for item in paginator] == ["a", "b", "c", "d"]
+
+
+def test_page_size_is_capped():
+    assert Paginator(_list_method(PAGES, []), "sites", page_size=MAX_PAGE_SIZE * 2).page_size == MAX_PAGE_SIZE
+
+
+def test_list_accounts_pages_through_api(make_server):
+    server = make_server([
+        {"accounts": [{"name": "accounts/pub-1"}], "nextPageToken": "next"},
+        {"accounts": [{"name": "accounts/pub-2"}]},
+    ])
+    payload = _payload(server.handle_tools_call("manage_accounts", {"action": "list", "page_size": 1}))
+    assert [account["name"] for account in payload["accounts"]] == ["accounts/pub-1", "accounts/pub-2"]
+    assert payload["truncated"] is False
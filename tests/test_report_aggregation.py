@@ -0,0 +1,115 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from mcp_adsense_ultimate.report_aggregation import aggregate, base_metrics, comparison_span
+from mcp_adsense_ultimate.report_table import ReportTable
+
+HEADERS = [
+    {"name": "DATE", "type": "DIMENSION"},
+    {"name": "COUNTRY_CODE", "type": "DIMENSION"},
+    {"name": "ESTIMATED_EARNINGS", "type": "METRIC_CURRENCY"},
+    {"name": "CLICKS", "type": "METRIC_TALLY"},
+    {"name": "PAGE_VIEWS", "type": "METRIC_TALLY"},
+]
+ROWS = [
+    ("2024-01-01", "US", "1.10", "2", "100"),
+    ("2024-01-01", "DE", "0.50", "1", "50"),
+    ("2024-01-02", "US", "2.20", "3", "200"),
+    ("2024-01-08", "US", "4.00", "4", "300"),
+]
+
+
+def _response(rows=ROWS):
+    return {
+        "headers": HEADERS,
+        "rows": [{"cells": [{"value": value} for value in row]} for row in rows],
+        "totalMatchedRows": str(len(rows))
+    }
+
+
+def _payload(result):
+    return json.loads(result["content"][0]["text"])
+
+
+def test_group_sum_and_derived_metrics():
+    table = ReportTable.from_response(_response())
+    result = aggregate(table, ["COUNTRY_CODE"], ["ESTIMATED_EARNINGS", "CLICKS", "PAGE_VIEWS_RPM"], sort="-CLICKS")
+    us, de = result["rows"]
+    assert us["COUNTRY_CODE"] == "US" and us["ESTIMATED_EARNINGS"] == Decimal("7.30") and us["CLICKS"] == 9
+    assert us["PAGE_VIEWS_RPM"] == pytest.approx(7.30 / 600 * 1000)
+    assert de["CLICKS"] == 1
+    assert result["totals"]["CLICKS"] == 10
+    assert result["total_groups"] == 2
+
+
+def test_week_buckets_and_top_n():
+    table = ReportTable.from_response(_response())
+    result = aggregate(table, ["WEEK"], ["CLICKS"], sort="-CLICKS", top_n=1)
+    assert result["rows"] == [{"WEEK": "2024-01-01", "CLICKS": 6}]
+    assert result["truncated"]
+
+
+def test_totals_only_and_comparison():
+    table = ReportTable.from_response(_response(ROWS[2:]))
+    previous = ReportTable.from_response(_response(ROWS[:2]))
+    result = aggregate(table, [], ["CLICKS"], previous=previous)
+    assert result["rows"] == []
+    assert result["totals"]["CLICKS"] == 7
+    assert result["totals"]["CLICKS_previous"] == 3
+    assert result["totals"]["CLICKS_delta_pct"] == pytest.approx(400 / 3)
+
+
+def test_non_additive_metric_is_rejected():
+    response = {"headers": [{"name": "PAGE_VIEWS_CTR", "type": "METRIC_RATIO"}], "rows": [{"cells": [{"value": "0.1"}]}]}
+    with pytest.raises(ValueError):
+        aggregate(ReportTable.from_response(response), [], ["PAGE_VIEWS_CTR"])
+
+
+def test_helpers():
+    assert base_metrics(["PAGE_VIEWS_RPM", "CLICKS"]) == ["ESTIMATED_EARNINGS", "PAGE_VIEWS", "CLICKS"]
+    assert comparison_span("previous_period", date(2024, 1, 8), date(2024, 1, 14)) == (date(2024, 1, 1), date(2024, 1, 7))
+    assert comparison_span("previous_year", date(2024, 2, 29), date(2024, 3, 1)) == (date(2023, 2, 28), date(2023, 3, 1))
+
+
+def test_table_take_and_rows_where():
+    table = ReportTable.from_response(_response())
+    indices = table.rows_where("DATE", lambda value: value <= "2024-01-02")
+    assert indices == [0, 1, 2]
+    part = table.take(indices)
+    assert len(part) == 3
+    assert part.column("DATE").dictionary == ["2024-01-01", "2024-01-02"]
+    assert list(part.column("CLICKS").values) == [2, 1, 3]
+
+
+def test_aggregation_reuses_cached_get_reports_result(make_server):
+    # 只提供get_reports需要的响应：之后的聚合若再请求API会因模拟响应耗尽而失败
+    server = make_server([_response(), {"name": "accounts/pub-1", "timeZone": {"id": "UTC"}}])
+    fetched = _payload(server.get_reports(
+        "pub-1", "2024-01-01", "2024-01-31", ["ESTIMATED_EARNINGS", "CLICKS", "PAGE_VIEWS"], ["DATE", "COUNTRY_CODE"]
+    ))
+    assert fetched["success"], fetched
+
+    result = _payload(server.aggregate_report(
+        "pub-1", group_by=["COUNTRY_CODE"], metrics=["CLICKS", "PAGE_VIEWS_RPM"],
+        dimensions=["COUNTRY_CODE", "DATE"], start_date="2024-01-01", end_date="2024-01-07"
+    ))
+    assert result["success"], result
+    assert result["base"]["cached"] and result["base"]["covering_range"] == ["2024-01-01", "2024-01-31"]
+    assert result["base_rows"] == 3
+    assert {row["COUNTRY_CODE"]: row["CLICKS"] for row in result["rows"]} == {"US": 5, "DE": 1}
+
+
+def test_truncated_cached_report_is_not_reused(make_server):
+    truncated = dict(_response(), totalMatchedRows="500")
+    server = make_server([truncated, {"name": "accounts/pub-1", "timeZone": {"id": "UTC"}}, _response(ROWS[:1])])
+    server.get_reports("pub-1", "2024-01-01", "2024-01-31", ["CLICKS"], ["DATE", "COUNTRY_CODE"], limit=4)
+    result = _payload(server.aggregate_report(
+        "pub-1", group_by=["COUNTRY_CODE"], metrics=["CLICKS"],
+        dimensions=["DATE", "COUNTRY_CODE"], start_date="2024-01-01", end_date="2024-01-31"
+    ))
+    assert result["success"], result
+    assert not result["base"]["cached"]
+    assert result["base_rows"] == 1
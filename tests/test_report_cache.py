@@ -0,0 +1,102 @@
+import json
+import time
+
+from mcp_adsense_ultimate.report_cache import ReportCache
+
+
+def _payload(result):
+    return json.loads(result["content"][0]["text"])
+
+
+def _report(names, rows):
+    return {
+        "headers": [{"name": name, "type": "METRIC_TALLY" if name == "CLICKS" else "DIMENSION"} for name in names],
+        "rows": [{"cells": [{"value": value} for value in row]} for row in rows],
+        "totalMatchedRows": str(len(rows))
+    }
+
+
+def test_get_put_and_expiry():
+    cache = ReportCache(max_bytes=1024 * 1024)
+    cache.put("a", {"rows": [1]}, ttl=60)
+    cache.put("b", {"rows": [2]}, ttl=-1)
+    assert cache.get("a") == {"rows": [1]}
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1 and stats["expired"] == 1
+
+
+def test_lru_eviction_by_size():
+    cache = ReportCache(max_bytes=200)
+    cache.put("old", {"data": "x" * 100})
+    cache.put("new", {"data": "y" * 100})
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+
+
+def test_sqlite_layer_survives_new_instance(tmp_path):
+    db_path = str(tmp_path / "reports.sqlite3")
+    ReportCache(db_path=db_path).put("k", {"rows": []}, ttl=None)
+    cache = ReportCache(db_path=db_path)
+    assert cache.get("k") == {"rows": []}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_ttl_for_range():
+    from datetime import date
+    cache = ReportCache(ttl_today=5, ttl_recent=50, recent_days=3)
+    today = date(2024, 3, 10)
+    assert cache.ttl_for_range(date(2024, 3, 10), today) == 5
+    assert cache.ttl_for_range(date(2024, 3, 8), today) == 50
+    assert cache.ttl_for_range(date(2024, 1, 1), today) is None
+
+
+def test_cache_hit_returns_requested_column_order(make_server):
+    server = make_server([
+        _report(["DATE", "COUNTRY_CODE", "CLICKS"], [["2024-01-31", "US", "1"]]),
+        {"name": "accounts/pub-1", "timeZone": {"id": "UTC"}},
+        _report(["DATE", "COUNTRY_CODE", "CLICKS"], [["2024-02-29", "US", "2"]]),
+        _report(["COUNTRY_CODE", "DATE", "CLICKS"], [["US", "2024-03-31", "3"]]),
+    ])
+    first = _payload(server.get_reports(
+        "pub-1", "2024-01-01", "2024-02-29", ["CLICKS"], ["DATE", "COUNTRY_CODE"], shard="month"
+    ))
+    assert first["success"], first
+    second = _payload(server.get_reports(
+        "pub-1", "2024-01-01", "2024-03-31", ["CLICKS"], ["COUNTRY_CODE", "DATE"], shard="month"
+    ))
+    assert second["success"], second
+    assert second["shards"]["cached"] == 2
+    assert [(row["COUNTRY_CODE"]["value"], row["DATE"]["value"]) for row in second["rows"]] == [
+        ("US", "2024-01-31"), ("US", "2024-02-29"), ("US", "2024-03-31")
+    ]
+
+
+def test_fetch_report_reorders_cached_columns(make_server):
+    from datetime import date
+    server = make_server([
+        _report(["DATE", "COUNTRY_CODE", "CLICKS"], [["2024-01-31", "US", "1"]]),
+        {"name": "accounts/pub-1", "timeZone": {"id": "UTC"}},
+    ])
+    span = (date(2024, 1, 1), date(2024, 1, 31))
+    server._fetch_report("pub-1", {"metrics": ["CLICKS"], "dimensions": ["DATE", "COUNTRY_CODE"]}, span)
+    reports, cached = server._fetch_report(
+        "pub-1", {"metrics": ["CLICKS"], "dimensions": ["COUNTRY_CODE", "DATE"]}, span
+    )
+    assert cached
+    assert [header["name"] for header in reports["headers"]] == ["COUNTRY_CODE", "DATE", "CLICKS"]
+    assert [cell["value"] for cell in reports["rows"][0]["cells"]] == ["US", "2024-01-31", "1"]
+
+
+def test_find_covering_reads_requests_from_old_database(tmp_path):
+    import sqlite3
+    db_path = str(tmp_path / "reports.sqlite3")
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE report_cache (key TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL, created_at REAL NOT NULL)")
+    db.commit()
+    db.close()
+
+    ReportCache(db_path=db_path).put("k", {"rows": []}, request={"account": "pub-1"})
+    cache = ReportCache(db_path=db_path)
+    assert list(cache.find_covering(lambda request: request["account"] == "pub-1")) == [({"account": "pub-1"}, {"rows": []})]
+    assert list(cache.find_covering(lambda request: request["account"] == "pub-2")) == []
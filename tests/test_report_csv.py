@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from mcp_adsense_ultimate.report_csv import _iter_lines, parse_csv, resolve_transport, write_csv
+
+
+def _payload(result):
+    return json.loads(result["content"][0]["text"])
+
+
+CSV = 'DATE,AD_UNIT_NAME,CLICKS\n2024-01-01,"首页, 顶部",3\n2024-01-02,"多行\n名称",5\n'.encode("utf-8")
+
+
+def _split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_resolve_transport():
+    assert resolve_transport("auto", 100, row_threshold=1000) == "json"
+    assert resolve_transport("auto", 1000, row_threshold=1000) == "csv"
+    assert resolve_transport("auto", None, row_threshold=1000) == "csv"
+    assert resolve_transport("json", None) == "json"
+    with pytest.raises(ValueError):
+        resolve_transport("xml", None)
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1024])
+def test_iter_lines_reassembles_split_utf8(size):
+    data = b"\xef\xbb\xbf" + CSV
+    assert "".join(_iter_lines(_split(data, size))) == CSV.decode("utf-8")
+
+
+@pytest.mark.parametrize("size", [1, 5, 1024])
+def test_parse_csv_keeps_quoted_fields(size):
+    table = parse_csv(_split(CSV, size), ["DATE", "AD_UNIT_NAME"])
+    assert len(table) == 2
+    assert table.column("AD_UNIT_NAME").texts() == ["首页, 顶部", "多行\n名称"]
+    assert table.column("CLICKS").type == "METRIC_TALLY"
+    assert table.column("CLICKS").texts() == ["3", "5"]
+
+
+@pytest.mark.parametrize("size", [1, 3, 1024])
+def test_write_csv_counts_records_outside_quotes(tmp_path, size):
+    path = tmp_path / "out" / "report.csv"
+    info = write_csv(_split(CSV, size), str(path))
+    assert path.read_bytes() == CSV
+    assert info["rows"] == 2
+    assert info["bytes"] == len(CSV)
+    assert list((tmp_path / "out").iterdir()) == [path]
+
+
+def test_write_csv_counts_last_line_without_newline(tmp_path):
+    assert write_csv([b"DATE\n2024-01-01\n2024-01-02"], str(tmp_path / "a.csv"))["rows"] == 2
+
+
+def test_write_csv_removes_temp_file_on_error(tmp_path):
+    def chunks():
+        yield b"DATE\n"
+        raise OSError("连接中断")
+
+    with pytest.raises(OSError):
+        write_csv(chunks(), str(tmp_path / "a.csv"))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_get_reports_parses_generate_csv(make_server):
+    server = make_server([({"status": "200", "content-type": "text/csv"}, CSV)])
+    payload = _payload(server.get_reports(
+        "pub-1", "2024-01-01", "2024-01-02", ["CLICKS"], ["DATE", "AD_UNIT_NAME"], transport="csv"
+    ))
+    assert payload["success"], payload
+    assert payload["transport"] == "csv"
+    assert [row["AD_UNIT_NAME"]["value"] for row in payload["rows"]] == ["首页, 顶部", "多行\n名称"]
+
+
+def test_get_reports_saves_generate_csv_body(make_server, tmp_path):
+    server = make_server([({"status": "200", "content-type": "text/csv"}, CSV)])
+    path = tmp_path / "report.csv"
+    payload = _payload(server.get_reports(
+        "pub-1", "2024-01-01", "2024-01-02", ["CLICKS"], ["DATE", "AD_UNIT_NAME"], output_file=str(path)
+    ))
+    assert payload["file"]["rows"] == 2
+    assert path.read_bytes() == CSV
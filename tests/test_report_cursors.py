@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from mcp_adsense_ultimate.report_cursors import CursorExpiredError, CursorStore
+from mcp_adsense_ultimate.report_table import ReportTable
+
+
+def _payload(result):
+    return json.loads(result["content"][0]["text"])
+
+
+def _report(count):
+    return {
+        "headers": [{"name": "DATE", "type": "DIMENSION"}, {"name": "CLICKS", "type": "METRIC_TALLY"}],
+        "rows": [{"cells": [{"value": f"2024-01-{day:02d}"}, {"value": str(day)}]} for day in range(1, count + 1)],
+        "totalMatchedRows": str(count)
+    }
+
+
+def _dates(table):
+    return [row["DATE"]["value"] for row in table.to_rows()]
+
+
+def test_chunks_cover_table_and_release_cursor():
+    store = CursorStore(ttl=60, max_cursors=4)
+    chunk, info = store.open(ReportTable.from_response(_report(5)), 2, {"format": "rows"})
+    assert _dates(chunk) == ["2024-01-01", "2024-01-02"]
+    assert info["has_more"] and info["total_rows"] == 5
+    seen = _dates(chunk)
+    cursor_id = info["next_cursor"]
+    while cursor_id:
+        chunk, info, context = store.next(cursor_id)
+        assert context == {"format": "rows"}
+        seen += _dates(chunk)
+        cursor_id = info["next_cursor"]
+    assert seen == [f"2024-01-{day:02d}" for day in range(1, 6)]
+    assert store.stats()["open"] == 0
+    assert store.stats()["completed"] == 1
+    with pytest.raises(CursorExpiredError):
+        store.next("unknown")
+
+
+def test_small_table_does_not_open_cursor():
+    store = CursorStore(ttl=60)
+    chunk, info = store.open(ReportTable.from_response(_report(2)), 2)
+    assert len(chunk) == 2
+    assert info["next_cursor"] is None
+    assert store.stats()["opened"] == 0
+
+
+def test_idle_cursors_expire():
+    store = CursorStore(ttl=0)
+    _, info = store.open(ReportTable.from_response(_report(3)), 1)
+    with pytest.raises(CursorExpiredError):
+        store.next(info["next_cursor"])
+    assert store.stats()["expired"] == 1
+
+
+def test_oldest_cursor_is_evicted_over_limit():
+    store = CursorStore(ttl=60, max_cursors=1)
+    _, first = store.open(ReportTable.from_response(_report(3)), 1)
+    _, second = store.open(ReportTable.from_response(_report(3)), 1)
+    with pytest.raises(CursorExpiredError):
+        store.next(first["next_cursor"])
+    assert store.next(second["next_cursor"])[1]["offset"] == 1
+    assert store.stats()["evicted"] == 1
+
+
+def test_rejects_non_positive_chunk_rows():
+    with pytest.raises(ValueError):
+        CursorStore().open(ReportTable.from_response(_report(1)), 0)
+
+
+def test_get_reports_returns_chunks_through_cursor(make_server):
+    server = make_server([
+        _report(3),
+        {"name": "accounts/pub-1", "timeZone": {"id": "UTC"}},
+    ])
+    first = _payload(server.get_reports(
+        "pub-1", "2024-01-01", "2024-01-03", ["CLICKS"], ["DATE"], chunk_rows=2
+    ))
+    assert first["success"], first
+    assert [row["DATE"]["value"] for row in first["rows"]] == ["2024-01-01", "2024-01-02"]
+    second = _payload(server.handle_tools_call("get_reports", {"cursor": first["chunk"]["next_cursor"]}))
+    assert second["dimensions"] == ["DATE"]
+    assert [row["DATE"]["value"] for row in second["rows"]] == ["2024-01-03"]
+    assert second["chunk"]["has_more"] is False
+    expired = _payload(server.handle_tools_call("get_reports", {"cursor": first["chunk"]["next_cursor"]}))
+    assert expired["success"] is False
@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from mcp_adsense_ultimate.report_sharding import (
+    check_shardable, merge_shard_reports, plan_shards, reorder_columns
+)
+
+
+def _report(names, rows, types=None):
+    types = types or {}
+    return {
+        "headers": [{"name": name, "type": types.get(name, "DIMENSION")} for name in names],
+        "rows": [{"cells": [{"value": value} for value in row]} for row in rows],
+        "totalMatchedRows": str(len(rows))
+    }
+
+
+def _values(report):
+    return [[cell["value"] for cell in row["cells"]] for row in report["rows"]]
+
+
+def test_plan_shards_month_aligned():
+    assert plan_shards(date(2024, 1, 15), date(2024, 3, 2), "month") == [
+        (date(2024, 1, 15), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 2, 29)),
+        (date(2024, 3, 1), date(2024, 3, 2)),
+    ]
+
+
+def test_plan_shards_week_starts_on_monday():
+    shards = plan_shards(date(2024, 1, 3), date(2024, 1, 15), "week")
+    assert shards[0] == (date(2024, 1, 3), date(2024, 1, 7))
+    assert shards[-1] == (date(2024, 1, 15), date(2024, 1, 15))
+
+
+def test_plan_shards_rejects_reversed_range():
+    with pytest.raises(ValueError):
+        plan_shards(date(2024, 2, 1), date(2024, 1, 1), "day")
+
+
+def test_check_shardable():
+    assert check_shardable(["DATE", "COUNTRY_CODE"], "week") is None
+    assert check_shardable(["MONTH"], "month") is None
+    assert check_shardable(["MONTH"], "week") is not None
+    assert check_shardable(["COUNTRY_CODE"], "day") is not None
+
+
+def test_merge_orders_rows_across_shards():
+    first = _report(["DATE", "CLICKS"], [["2024-01-01", "3"], ["2024-01-02", "1"]], {"CLICKS": "METRIC_TALLY"})
+    second = _report(["DATE", "CLICKS"], [["2024-02-01", "5"]], {"CLICKS": "METRIC_TALLY"})
+    merged = merge_shard_reports([first, second], ["-CLICKS"], limit=2)
+    assert _values(merged) == [["2024-02-01", "5"], ["2024-01-01", "3"]]
+    assert merged["totalMatchedRows"] == "3"
+
+
+def test_merge_aligns_shards_with_mixed_column_orders():
+    # 第二个分片来自按另一种维度顺序写入的缓存
+    first = _report(["COUNTRY_CODE", "DATE"], [["US", "2024-01-31"], ["DE", "2024-02-29"]])
+    second = _report(["DATE", "COUNTRY_CODE"], [["2024-03-31", "US"]])
+    merged = merge_shard_reports([first, second], ["+DATE"])
+    assert [header["name"] for header in merged["headers"]] == ["COUNTRY_CODE", "DATE"]
+    assert _values(merged) == [["US", "2024-01-31"], ["DE", "2024-02-29"], ["US", "2024-03-31"]]
+
+
+def test_reorder_columns_moves_totals_and_keeps_input():
+    report = _report(["DATE", "CLICKS"], [["2024-01-01", "3"]], {"CLICKS": "METRIC_TALLY"})
+    report["totals"] = {"cells": [{}, {"value": "3"}]}
+    reordered = reorder_columns(report, ["CLICKS", "DATE"])
+    assert _values(reordered) == [["3", "2024-01-01"]]
+    assert reordered["totals"]["cells"] == [{"value": "3"}, {}]
+    assert _values(report) == [["2024-01-01", "3"]]
+
+
+def test_reorder_columns_rejects_different_columns():
+    with pytest.raises(ValueError):
+        reorder_columns(_report(["DATE"], []), ["MONTH"])
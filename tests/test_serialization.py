@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from mcp_adsense_ultimate import serialization
+from mcp_adsense_ultimate.serialization import ResponseSerializer
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson未安装")
+    return request.param
+
+
+def test_dumps_message_is_compact_utf8(encoder):
+    serializer = ResponseSerializer("compact")
+    text = serializer.dumps_message({"jsonrpc": "2.0", "result": {"error": "账户不存在"}})
+    assert "账户不存在" in text
+    assert "\\u" not in text
+    assert ": " not in text and ", " not in text
+    assert json.loads(text)["result"]["error"] == "账户不存在"
+
+
+def test_dumps_modes(encoder):
+    payload = {"a": [1, 2], "名称": "值"}
+    assert "\n" in ResponseSerializer("pretty").dumps(payload)
+    compact = ResponseSerializer("compact").dumps(payload)
+    assert "\n" not in compact and "名称" in compact
+    assert json.loads(compact) == payload
+
+
+def test_text_result_capture_and_stats():
+    serializer = ResponseSerializer("compact")
+    with serializer.capture():
+        assert serializer.text_result({"ok": True}, "a,b") == {"payload": {"ok": True}, "extra_texts": ["a,b"]}
+    with serializer.measure("tool"):
+        result = serializer.text_result({"ok": True})
+    assert result["content"][0]["text"] == '{"ok":true}'
+    assert serializer.stats()["tools"]["tool"]["calls"] == 1
+
+
+def test_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        ResponseSerializer("yaml")
@@ -0,0 +1,112 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from mcp_adsense_ultimate.service_pool import AdSenseServicePool
+
+
+class _Credentials:
+    def __init__(self, expiry=None):
+        self.token = "token"
+        self.expiry = expiry
+
+
+@pytest.fixture
+def pool_parts():
+    """可控的凭据加载、服务构建和身份解析函数"""
+    state = {"identity": ("file", "/creds.json"), "version": 1, "loads": 0, "builds": 0}
+
+    def load():
+        state["loads"] += 1
+        return _Credentials(), "project"
+
+    def build(credentials):
+        state["builds"] += 1
+        return object()
+
+    def resolve():
+        return state["identity"], state["version"]
+
+    return state, load, build, resolve
+
+
+def test_reuses_service_within_thread(pool_parts):
+    state, load, build, resolve = pool_parts
+    pool = AdSenseServicePool(load, build, resolve)
+    assert pool.get_service() is pool.get_service()
+    assert state["loads"] == 1
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 1
+
+
+def test_builds_one_service_per_thread_sharing_credentials(pool_parts):
+    state, load, build, resolve = pool_parts
+    pool = AdSenseServicePool(load, build, resolve)
+    services = [pool.get_service()]
+    thread = threading.Thread(target=lambda: services.append(pool.get_service()))
+    thread.start()
+    thread.join()
+    assert services[0] is not services[1]
+    assert state["loads"] == 1
+    assert state["builds"] == 2
+
+
+def test_shared_pool_returns_one_service_for_all_threads(pool_parts):
+    state, load, build, resolve = pool_parts
+    pool = AdSenseServicePool(load, build, resolve, shared=True)
+    services = [pool.get_service()]
+    thread = threading.Thread(target=lambda: services.append(pool.get_service()))
+    thread.start()
+    thread.join()
+    assert services[0] is services[1]
+    assert state["builds"] == 1
+
+
+def test_credentials_file_change_invalidates_entry(pool_parts):
+    state, load, build, resolve = pool_parts
+    pool = AdSenseServicePool(load, build, resolve)
+    first = pool.get_service()
+    state["version"] = 2
+    assert pool.get_service() is not first
+    assert state["loads"] == 2
+    assert pool.stats()["invalidations"] == 1
+
+
+def test_explicit_invalidate(pool_parts):
+    state, load, build, resolve = pool_parts
+    pool = AdSenseServicePool(load, build, resolve)
+    pool.get_service()
+    pool.invalidate(("file", "/other.json"))
+    assert pool.stats()["entries"] == 1
+    pool.invalidate()
+    assert pool.stats()["entries"] == 0
+    pool.get_service()
+    assert state["loads"] == 2
+
+
+def test_failed_load_is_not_cached(pool_parts):
+    state, _, build, resolve = pool_parts
+    attempts = []
+
+    def load():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("凭证文件不可读")
+        return _Credentials(), None
+
+    pool = AdSenseServicePool(load, build, resolve)
+    with pytest.raises(OSError):
+        pool.get_service()
+    assert pool.stats()["entries"] == 0
+    pool.get_service()
+    assert len(attempts) == 2
+
+
+def test_fresh_token_is_not_refreshed(pool_parts):
+    _, _, build, resolve = pool_parts
+    credentials = _Credentials(expiry=datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1))
+    pool = AdSenseServicePool(lambda: (credentials, None), build, resolve, refresh_margin=300)
+    pool.get_service()
+    assert pool.stats()["refreshes"] == 0
+    assert pool.stats()["refresh_failures"] == 0
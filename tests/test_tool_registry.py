@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from mcp_adsense_ultimate.tool_registry import ToolRegistry, compile_schema
+
+
+def _payload(result):
+    return json.loads(result["content"][0]["text"])
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["list", "get"], "default": "list"},
+        "limit": {"type": "integer"},
+        "compact": {"type": "boolean"},
+        "ids": {"type": "array", "items": {"type": "string"}},
+        "range": {"oneOf": [{"type": "string"}, {"type": "object"}]},
+    },
+    "required": ["action"]
+}
+
+
+@pytest.fixture
+def tool():
+    return ToolRegistry().register("demo", "示例工具", SCHEMA, lambda arguments: arguments)
+
+
+def test_bind_converts_lossless_strings(tool):
+    bound, error = tool.bind({"action": "get", "limit": "100", "compact": "true", "extra": 1})
+    assert error is None
+    assert bound == {"action": "get", "limit": 100, "compact": True, "extra": 1}
+
+
+def test_bind_fills_required_default_and_treats_null_as_missing(tool):
+    assert tool.bind({"action": None}) == ({"action": "list"}, None)
+    assert tool.bind(None) == ({"action": "list"}, None)
+
+
+def test_bind_reports_first_error(tool):
+    assert tool.bind({"action": "delete"})[1].startswith("参数 action 的值 'delete' 无效")
+    assert "limit" in tool.bind({"limit": "ten"})[1]
+    assert "ids[1]" in tool.bind({"ids": ["a", 2]})[1]
+    assert tool.bind({"range": ["2024-01-01"]})[1] is not None
+    assert tool.bind({"range": {"start": "2024-01-01"}})[1] is None
+
+
+def test_required_without_default_is_rejected():
+    registry = ToolRegistry()
+    tool = registry.register("demo", "", {"properties": {"name": {"type": "string"}}, "required": ["name"]}, None)
+    assert tool.bind({})[1] == "缺少必需参数: name"
+
+
+def test_compile_schema_rejects_booleans_as_integers():
+    assert compile_schema({"type": "integer"})(True, "limit")[1] is not None
+
+
+def test_duplicate_registration_is_rejected():
+    registry = ToolRegistry()
+    registry.register("demo", "", {}, None)
+    with pytest.raises(ValueError):
+        registry.register("demo", "", {}, None)
+
+
+def test_list_payload_is_built_once_and_reset_on_register():
+    registry = ToolRegistry()
+    registry.register("a", "A", {"type": "object"}, None)
+    payload = registry.list_payload()
+    assert registry.list_payload() is payload
+    assert json.loads(registry.list_json(json.dumps)) == payload
+    registry.register("b", "B", {"type": "object"}, None)
+    assert [tool["name"] for tool in registry.list_payload()["tools"]] == ["a", "b"]
+    assert json.loads(registry.list_json(json.dumps)) == registry.list_payload()
+
+
+def test_server_rejects_invalid_arguments_before_calling_api(make_server):
+    server = make_server([])
+    payload = _payload(server.handle_tools_call("manage_accounts", {"action": "delete"}))
+    assert payload["success"] is False
+    assert "action" in payload["error"]
+    assert server.tools.stats()["manage_accounts"]["invalid_arguments"] == 1
+
+
+def test_server_tools_list_matches_registry(make_server):
+    server = make_server([])
+    names = [tool["name"] for tool in server.handle_tools_list()["tools"]]
+    assert names == server.tools.names()
+    assert json.loads(server.tools_list_json()) == server.handle_tools_list()
+    assert server.handle_tools_call("no_such_tool", {}) == {"error": "Unknown tool: no_such_tool"}